@@ -0,0 +1,211 @@
+"""
+Benchmark del algoritmo de Dijkstra: recorrido lineal vs. montículo binario
+
+Genera grafos dispersos aleatorios (de 1k a 1M aristas) directamente como
+instantáneas compactas (GraphSnapshot) y compara el tiempo de la búsqueda
+original, que recorre todos los nodos de un diccionario de adyacencia para
+elegir el siguiente, con el núcleo actual basado en heapq
+(core.algorithms.dijkstra_search).
+
+Con ``--parallel`` compara además la enumeración de caminos y la matriz de
+distancias secuenciales con las repartidas entre procesos (core.parallel)
+sobre una malla, con el pool ya creado. Los caminos se miden hasta
+``max_paths=500``, el máximo que admite /api/all-paths/find_paths/: con
+pocos caminos por página domina el coste de enviar los subárboles al pool,
+así que el reparto solo compensa cuando encontrarlos exige recorrer mucho.
+
+Uso:
+    python benchmark_dijkstra.py [--sizes 1000 10000 100000 1000000]
+    python benchmark_dijkstra.py --parallel [--workers 4]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from itertools import islice
+
+import django
+
+# Configurar Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dijkstra_api.settings')
+django.setup()
+
+from core import parallel
+from core.algorithms import (
+    dijkstra_search, distances_to_target, iter_simple_paths, parallel_simple_paths
+)
+from core.distance_matrix import dijkstra_matrix
+from core.graph_snapshot import GraphSnapshot
+
+# Por encima de este número de nodos el recorrido lineal (O(V²)) tarda demasiado
+LINEAR_SCAN_MAX_NODES = 30000
+
+
+def generate_graph(edges_count, avg_degree=4, seed=42):
+    """Generar un grafo disperso dirigido con pesos enteros"""
+    rnd = random.Random(seed)
+    nodes_count = max(2, edges_count // avg_degree)
+    nodes = [(i, str(i), None, None) for i in range(nodes_count)]
+
+    # Un camino base garantiza que todos los nodos sean alcanzables desde 0
+    edges = [
+        (i, i + 1, float(rnd.randint(1, 100)), True)
+        for i in range(nodes_count - 1)
+    ]
+
+    for _ in range(max(0, edges_count - (nodes_count - 1))):
+        a = rnd.randrange(nodes_count)
+        b = rnd.randrange(nodes_count)
+        if a != b:
+            edges.append((a, b, float(rnd.randint(1, 100)), True))
+
+    return GraphSnapshot.build(None, 0, nodes, edges)
+
+
+def generate_mesh(side, seed=42):
+    """Malla no dirigida de ``side`` × ``side`` nodos con pesos enteros"""
+    rnd = random.Random(seed)
+    nodes = [(i, str(i), float(i % side), float(i // side)) for i in range(side * side)]
+    edges = []
+    for i in range(side * side):
+        if i % side < side - 1:
+            edges.append((i, i + 1, float(rnd.randint(1, 10)), False))
+        if i // side < side - 1:
+            edges.append((i, i + side, float(rnd.randint(1, 10)), False))
+    return GraphSnapshot.build(None, 0, nodes, edges)
+
+
+def linear_scan_dijkstra(graph_dict, start_id):
+    """Implementación original: búsqueda lineal del mínimo en cada iteración"""
+    distances = {node_id: math.inf for node_id in graph_dict}
+    previous = {node_id: None for node_id in graph_dict}
+    distances[start_id] = 0.0
+    visited = set()
+
+    while len(visited) < len(graph_dict):
+        current_node = None
+        min_distance = math.inf
+        for node_id in graph_dict:
+            if node_id not in visited and distances[node_id] < min_distance:
+                current_node = node_id
+                min_distance = distances[node_id]
+
+        if current_node is None:
+            break
+
+        visited.add(current_node)
+        for neighbor_id, weight in graph_dict[current_node]:
+            if neighbor_id in visited:
+                continue
+            new_distance = distances[current_node] + weight
+            if new_distance < distances[neighbor_id]:
+                distances[neighbor_id] = new_distance
+                previous[neighbor_id] = current_node
+
+    return distances, previous
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run_benchmark(sizes):
+    print("🚀 Benchmark de Dijkstra (todas las distancias desde el nodo 0)")
+    print("=" * 72)
+    print(f"{'Aristas':>10} {'Nodos':>9} {'Lineal (s)':>12} {'Heap (s)':>10} {'Aceleración':>12}")
+
+    for edges_count in sizes:
+        snapshot = generate_graph(edges_count)
+        nodes_count = snapshot.nodes_count
+
+        (heap_distances, _, _), heap_time = timed(dijkstra_search, snapshot, 0)
+
+        if nodes_count <= LINEAR_SCAN_MAX_NODES:
+            graph_dict = snapshot.to_graph_dict()
+            (linear_distances, _), linear_time = timed(linear_scan_dijkstra, graph_dict, '0')
+            if [linear_distances[str(i)] for i in range(nodes_count)] != heap_distances:
+                print(f"❌ Las distancias no coinciden para {edges_count} aristas")
+                return
+            linear_str = f"{linear_time:.4f}"
+            speedup_str = f"{linear_time / heap_time:.1f}x" if heap_time > 0 else "-"
+        else:
+            linear_str = "omitido"
+            speedup_str = "-"
+
+        print(f"{edges_count:>10} {nodes_count:>9} {linear_str:>12} {heap_time:>10.4f} {speedup_str:>12}")
+
+    print("=" * 72)
+    print(f"ℹ️ El recorrido lineal se omite por encima de {LINEAR_SCAN_MAX_NODES} nodos")
+
+
+def run_parallel_benchmark(workers, side=12):
+    snapshot = generate_mesh(side)
+    start, end = 0, snapshot.nodes_count - 1
+    max_depth = 3 * side
+    bounds = distances_to_target(snapshot, end)
+
+    def sequential_paths(max_paths):
+        paths = iter_simple_paths(snapshot, start, end, max_depth, math.inf, bounds, [])
+        return list(islice(paths, max_paths))
+
+    def parallel_paths(max_paths):
+        return list(parallel_simple_paths(
+            snapshot, start, end, max_depth, math.inf, bounds, [], max_paths, workers
+        ))
+
+    print(f"🚀 Secuencial vs. {workers} procesos (malla {side}×{side}, pool ya creado)")
+    print("=" * 72)
+    # Crear el pool fuera de las mediciones
+    parallel_paths(1)
+
+    print(f"{'Caminos':>10} {'Secuencial (s)':>15} {'Paralelo (s)':>13} {'Aceleración':>12}")
+    for max_paths in (10, 100, 500):
+        sequential, sequential_time = timed(sequential_paths, max_paths)
+        in_parallel, parallel_time = timed(parallel_paths, max_paths)
+        if in_parallel != sequential:
+            print(f"❌ Los caminos no coinciden para max_paths={max_paths}")
+            return
+        print(f"{max_paths:>10} {sequential_time:>15.4f} {parallel_time:>13.4f} "
+              f"{sequential_time / parallel_time:>11.1f}x")
+
+    print(f"{'Orígenes':>10} {'Secuencial (s)':>15} {'Paralelo (s)':>13} {'Aceleración':>12}")
+    targets = list(range(snapshot.nodes_count))
+    for sources_count in (64, snapshot.nodes_count):
+        sources = targets[:sources_count]
+        sequential, sequential_time = timed(dijkstra_matrix, snapshot, sources, targets, 1)
+        in_parallel, parallel_time = timed(dijkstra_matrix, snapshot, sources, targets, workers)
+        if in_parallel != sequential:
+            print(f"❌ Las matrices no coinciden para {sources_count} orígenes")
+            return
+        print(f"{sources_count:>10} {sequential_time:>15.4f} {parallel_time:>13.4f} "
+              f"{sequential_time / parallel_time:>11.1f}x")
+
+    print("=" * 72)
+    parallel.shutdown_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        '--sizes', type=int, nargs='+',
+        default=[1000, 10000, 100000, 1000000],
+        help='Número de aristas de cada grafo generado'
+    )
+    parser.add_argument(
+        '--parallel', action='store_true',
+        help='Comparar la búsqueda secuencial con la repartida entre procesos'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help='Procesos para --parallel (por defecto PARALLEL_WORKERS o todos los núcleos)'
+    )
+    args = parser.parse_args()
+    if args.parallel:
+        run_parallel_benchmark(args.workers or max(2, parallel.default_workers()))
+    else:
+        run_benchmark(args.sizes)
@@ -1,12 +1,29 @@
 """
 Implementación del algoritmo de Dijkstra
 Adaptado del proyecto Django original para la API REST
+
+Los algoritmos trabajan sobre la instantánea compacta del grafo
+(ver graph_snapshot.GraphSnapshot), con los nodos identificados por su
+índice entero denso.
 """
 
+import heapq
 import math
+import threading
 import time
-from typing import Dict, List, Tuple, Optional
+from collections import OrderedDict
+from itertools import islice, takewhile
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Optional
+from django.conf import settings
+from django.db.models import Q
 from .models import Graph, Node, Edge
+from .graph_snapshot import GraphSnapshot, get_graph_snapshot
+from .parallel import (
+    default_workers, get_worker_snapshot, imap_on_snapshot, is_cancelled, progress_before,
+    report_progress
+)
+from .path_cursor import cursor_query, encode_cursor
+from .result_cache import get_result_cache
 
 
 def build_graph_dict(graph: Graph) -> Dict[str, List[Tuple[str, float]]]:
@@ -14,168 +31,530 @@ def build_graph_dict(graph: Graph) -> Dict[str, List[Tuple[str, float]]]:
     Construye un diccionario de adyacencia desde el modelo Graph
     Retorna: {nodo_id: [(nodo_destino_id, peso), ...]}
     """
-    graph_dict = {}
+    return get_graph_snapshot(graph).to_graph_dict()
+
+
+def dijkstra_search(
+    snapshot: GraphSnapshot,
+    start: int,
+    end: Optional[int] = None,
+    distances: Optional[List[float]] = None,
+    previous: Optional[List[int]] = None,
+    visited: Optional[bytearray] = None,
+    on_visit: Optional[Callable[[int], None]] = None,
+    on_relax: Optional[Callable[[int, int, float, float], None]] = None,
+) -> Tuple[List[float], List[int], bytearray]:
+    """
+    Núcleo de Dijkstra con cola de prioridad (montículo binario) y borrado perezoso
+    
+    Las entradas obsoletas del montículo no se eliminan: se descartan al
+    extraerlas si el nodo ya fue visitado o si su distancia quedó desactualizada.
+    Los empates se resuelven por índice (orden por nombre), igual que el
+    antiguo recorrido lineal, así que el orden de visita no cambia.
+    
+    Si se indica ``end`` la búsqueda se detiene al visitarlo. ``distances``,
+    ``previous`` (-1 = sin predecesor) y ``visited`` pueden pasarse ya
+    inicializados para que los callbacks observen el estado mientras se modifica.
+    Retorna: (distances, previous, visited)
+    """
+    nodes_count = snapshot.nodes_count
+    if distances is None:
+        distances = [math.inf] * nodes_count
+        distances[start] = 0.0
+    if previous is None:
+        previous = [-1] * nodes_count
+    if visited is None:
+        visited = bytearray(nodes_count)
     
-    # Inicializar todos los nodos
-    for node in graph.nodes.all():
-        graph_dict[str(node.id)] = []
+    offsets = snapshot.offsets
+    targets = snapshot.targets
+    weights = snapshot.weights
+    heap = [(distances[start], start)]
     
-    # Agregar las aristas
-    for edge in graph.edges.all():
-        from_id = str(edge.from_node.id)
-        to_id = str(edge.to_node.id)
-        weight = float(edge.weight)
+    while heap:
+        current_distance, current_node = heapq.heappop(heap)
+        
+        # Borrado perezoso: ignorar entradas obsoletas
+        if visited[current_node] or current_distance > distances[current_node]:
+            continue
+        
+        visited[current_node] = 1
+        if on_visit is not None:
+            on_visit(current_node)
         
-        # Agregar arista dirigida
-        if from_id in graph_dict:
-            graph_dict[from_id].append((to_id, weight))
+        # Si llegamos al nodo destino, podemos terminar
+        if current_node == end:
+            break
         
-        # Si la arista no es dirigida, agregar la arista inversa
-        if not edge.directed:
-            if to_id in graph_dict:
-                graph_dict[to_id].append((from_id, weight))
+        # Actualizar distancias de nodos vecinos
+        for position in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = targets[position]
+            if visited[neighbor]:
+                continue
+            
+            new_distance = current_distance + weights[position]
+            old_distance = distances[neighbor]
+            
+            if new_distance < old_distance:
+                distances[neighbor] = new_distance
+                previous[neighbor] = current_node
+                heapq.heappush(heap, (new_distance, neighbor))
+                
+                if on_relax is not None:
+                    on_relax(current_node, neighbor, old_distance, new_distance)
     
-    return graph_dict
+    return distances, previous, visited
+
+
+def iter_dijkstra_events(
+    snapshot: GraphSnapshot,
+    start: int,
+    end: Optional[int],
+    distances: List[float],
+    previous: List[int],
+    visited: bytearray
+) -> Iterator[Tuple]:
+    """
+    dijkstra_search como generador: emite ``('v', nodo, distancia)`` al
+    visitar un nodo y ``('r', desde, hasta, anterior, nueva)`` al relajar una
+    arista (``anterior`` es None si era infinita), en el mismo orden que los
+    callbacks de dijkstra_search
+    
+    La búsqueda avanza solo cuando se pide el siguiente evento, así que quien
+    consume marca el ritmo y puede abandonarla cerrando el generador.
+    ``distances``, ``previous`` y ``visited`` deben venir inicializados y
+    quedan con el estado final al agotarse.
+    """
+    offsets = snapshot.offsets
+    targets = snapshot.targets
+    weights = snapshot.weights
+    heap = [(distances[start], start)]
+    
+    while heap:
+        current_distance, current_node = heapq.heappop(heap)
+        
+        if visited[current_node] or current_distance > distances[current_node]:
+            continue
+        
+        visited[current_node] = 1
+        yield ('v', current_node, current_distance)
+        
+        if current_node == end:
+            return
+        
+        for position in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = targets[position]
+            if visited[neighbor]:
+                continue
+            
+            new_distance = current_distance + weights[position]
+            old_distance = distances[neighbor]
+            
+            if new_distance < old_distance:
+                distances[neighbor] = new_distance
+                previous[neighbor] = current_node
+                heapq.heappush(heap, (new_distance, neighbor))
+                yield (
+                    'r', current_node, neighbor,
+                    None if old_distance == math.inf else old_distance, new_distance
+                )
+
+
+def reconstruct_path(previous: List[int], start: int, end: int) -> List[int]:
+    """Reconstruye el camino (lista de índices) siguiendo los predecesores"""
+    if previous[end] == -1 and start != end:
+        return []
+    path = []
+    current = end
+    while current != -1:
+        path.append(current)
+        current = previous[current]
+    path.reverse()
+    return path
+
+
+def point_to_point_dijkstra(snapshot: GraphSnapshot, start: int, end: int) -> Tuple[float, List[int], int]:
+    """
+    Dijkstra clásico con salida anticipada en ``end``
+    Retorna: (distancia, camino en índices, nodos asentados)
+    """
+    distances, previous, visited = dijkstra_search(snapshot, start, end)
+    return distances[end], reconstruct_path(previous, start, end), visited.count(1)
+
+
+def bidirectional_dijkstra(snapshot: GraphSnapshot, start: int, end: int) -> Tuple[float, List[int], int]:
+    """
+    Dijkstra bidireccional para consultas punto a punto
+    
+    Avanza alternando una búsqueda hacia adelante desde ``start`` y otra hacia
+    atrás desde ``end`` sobre la adyacencia invertida de la instantánea (que
+    ya incluye ambos sentidos de las aristas no dirigidas). Se expande siempre
+    el lado con menor clave y se detiene cuando la suma de ambos mínimos
+    alcanza la mejor distancia de encuentro ``mu``, lo que garantiza que el
+    camino es óptimo. Con varios caminos óptimos puede elegir otro distinto
+    del de Dijkstra clásico, siempre con la misma distancia.
+    Retorna: (distancia, camino en índices, nodos asentados)
+    """
+    if start == end:
+        return 0.0, [start], 0
+    
+    nodes_count = snapshot.nodes_count
+    graphs = (snapshot, snapshot.reversed())
+    distances = ([math.inf] * nodes_count, [math.inf] * nodes_count)
+    previous = ([-1] * nodes_count, [-1] * nodes_count)
+    settled = (bytearray(nodes_count), bytearray(nodes_count))
+    heaps = ([(0.0, start)], [(0.0, end)])
+    distances[0][start] = 0.0
+    distances[1][end] = 0.0
+    
+    best_distance = math.inf
+    meeting_node = -1
+    settled_count = 0
+    
+    while heaps[0] and heaps[1]:
+        # Criterio de parada: ningún camino por explorar puede mejorar mu
+        if heaps[0][0][0] + heaps[1][0][0] >= best_distance:
+            break
+        
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        current_distance, current_node = heapq.heappop(heaps[side])
+        
+        side_distances = distances[side]
+        other_distances = distances[1 - side]
+        if settled[side][current_node] or current_distance > side_distances[current_node]:
+            continue
+        settled[side][current_node] = 1
+        settled_count += 1
+        
+        graph = graphs[side]
+        targets = graph.targets
+        weights = graph.weights
+        side_previous = previous[side]
+        heap = heaps[side]
+        for position in range(graph.offsets[current_node], graph.offsets[current_node + 1]):
+            neighbor = targets[position]
+            new_distance = current_distance + weights[position]
+            if new_distance < side_distances[neighbor]:
+                side_distances[neighbor] = new_distance
+                side_previous[neighbor] = current_node
+                heapq.heappush(heap, (new_distance, neighbor))
+                
+                # Actualizar el mejor punto de encuentro
+                candidate = new_distance + other_distances[neighbor]
+                if candidate < best_distance:
+                    best_distance = candidate
+                    meeting_node = neighbor
+    
+    if meeting_node == -1:
+        return math.inf, [], settled_count
+    
+    # Mitad hacia adelante (start → encuentro) + mitad hacia atrás (encuentro → end)
+    path = reconstruct_path(previous[0], start, meeting_node)
+    current = previous[1][meeting_node]
+    while current != -1:
+        path.append(current)
+        current = previous[1][current]
+    
+    return best_distance, path, settled_count
+
+
+def astar_search(snapshot: GraphSnapshot, start: int, end: int) -> Tuple[float, List[int], int]:
+    """
+    A* usando las coordenadas de los nodos como heurística
+    
+    h(v) = escala * distancia_euclidiana(v, end), con la escala de
+    GraphSnapshot.heuristic_scale (mínimo peso/longitud del grafo), que es
+    admisible y consistente. Un nodo cerrado se reabre si aparece un camino
+    mejor, por robustez frente al redondeo. Con escala 0 equivale a Dijkstra.
+    Retorna: (distancia, camino en índices, nodos asentados)
+    """
+    scale = snapshot.heuristic_scale()
+    nodes_count = snapshot.nodes_count
+    xs = snapshot.xs
+    ys = snapshot.ys
+    target_x = xs[end]
+    target_y = ys[end]
+    
+    estimates = [-1.0] * nodes_count
+    
+    def heuristic(index: int) -> float:
+        estimate = estimates[index]
+        if estimate < 0:
+            estimate = scale * math.hypot(xs[index] - target_x, ys[index] - target_y) if scale else 0.0
+            estimates[index] = estimate
+        return estimate
+    
+    distances = [math.inf] * nodes_count
+    previous = [-1] * nodes_count
+    closed = bytearray(nodes_count)
+    distances[start] = 0.0
+    heap = [(heuristic(start), start)]
+    offsets = snapshot.offsets
+    targets = snapshot.targets
+    weights = snapshot.weights
+    settled_count = 0
+    
+    while heap:
+        priority, current_node = heapq.heappop(heap)
+        current_distance = distances[current_node]
+        
+        # Borrado perezoso: la prioridad ya no corresponde a la distancia actual
+        if closed[current_node] or priority > current_distance + estimates[current_node]:
+            continue
+        
+        closed[current_node] = 1
+        settled_count += 1
+        if current_node == end:
+            break
+        
+        for position in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = targets[position]
+            new_distance = current_distance + weights[position]
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                previous[neighbor] = current_node
+                closed[neighbor] = 0
+                heapq.heappush(heap, (new_distance + heuristic(neighbor), neighbor))
+    
+    return distances[end], reconstruct_path(previous, start, end), settled_count
+
+
+# Algoritmos punto a punto disponibles (parámetro ``algorithm`` de la API)
+POINT_TO_POINT_SEARCHES = {
+    'dijkstra': point_to_point_dijkstra,
+    'bidirectional': bidirectional_dijkstra,
+    'astar': astar_search,
+}
+
+
+def resolve_algorithm(snapshot: GraphSnapshot, algorithm: str) -> str:
+    """Algoritmo que se usará realmente (A* cae a Dijkstra sin coordenadas)"""
+    if algorithm == 'astar' and not snapshot.heuristic_scale():
+        return 'dijkstra'
+    return algorithm
+
+
+def cached_shortest_path(
+    snapshot: GraphSnapshot,
+    start: int,
+    end: int,
+    algorithm: str = 'dijkstra'
+) -> Tuple[float, List[int], Optional[int]]:
+    """
+    Distancia y camino (índices) entre dos nodos pasando por la caché de resultados
+    
+    Si hay un árbol completo cacheado para ``start`` se recorren sus
+    predecesores; si no, se usa el resultado puntual cacheado para ese
+    algoritmo o se ejecuta la búsqueda y se guarda.
+    Retorna: (distancia, camino, nodos asentados o None si vino de la caché)
+    """
+    cache = get_result_cache()
+    tree, point = cache.get_path(snapshot.graph_id, snapshot.version, start, end, algorithm)
+    if tree is not None:
+        distances, previous = tree
+        return distances[end], reconstruct_path(previous, start, end), None
+    if point is not None:
+        total_distance, path = point
+        return total_distance, path, None
+    
+    total_distance, path, settled_count = POINT_TO_POINT_SEARCHES[algorithm](snapshot, start, end)
+    cache.set_point(
+        snapshot.graph_id, snapshot.version, start, end, total_distance, path, algorithm
+    )
+    return total_distance, path, settled_count
+
+
+def cached_shortest_path_tree(snapshot: GraphSnapshot, start: int) -> Tuple[List[float], List[int]]:
+    """Árbol completo (distances, previous) desde ``start``, cacheado por versión"""
+    cache = get_result_cache()
+    tree = cache.get_tree(snapshot.graph_id, snapshot.version, start)
+    if tree is not None:
+        return tree
+    
+    distances, previous, _ = dijkstra_search(snapshot, start)
+    cache.set_tree(snapshot.graph_id, snapshot.version, start, distances, previous)
+    return distances, previous
+
+
+# Formatos del registro de pasos de dijkstra_algorithm
+TRACE_FORMATS = ('auto', 'full', 'compact')
+
+# Nodos máximos para el formato 'full' (una copia del estado por paso)
+DEFAULT_FULL_TRACE_MAX_NODES = 200
+
+
+def full_trace_max_nodes() -> int:
+    """Tamaño máximo del grafo para el que se generan pasos completos"""
+    return getattr(settings, 'DIJKSTRA_FULL_TRACE_MAX_NODES', DEFAULT_FULL_TRACE_MAX_NODES)
 
 
 def dijkstra_algorithm(
     graph: Graph, 
     start_node: Node, 
     end_node: Node, 
-    include_steps: bool = False
+    include_steps: bool = False,
+    algorithm: str = 'dijkstra',
+    trace_format: str = 'full',
+    snapshot: Optional[GraphSnapshot] = None
 ) -> Dict:
     """
     Implementa el algoritmo de Dijkstra
     Retorna un diccionario con el resultado completo
+    
+    ``algorithm`` elige la búsqueda punto a punto (ver POINT_TO_POINT_SEARCHES);
+    los pasos detallados solo se generan con el Dijkstra clásico. El campo
+    ``algorithm`` del resultado indica el algoritmo usado realmente.
+    
+    Con ``include_steps`` el registro de pasos depende de ``trace_format``:
+    
+    * ``'full'``: ``steps`` con una copia completa de distancias, previos y
+      visitados en cada paso (O(V) por paso; solo para grafos pequeños);
+    * ``'compact'``: ``trace`` con la tabla de nombres una sola vez y un
+      evento por visita ``['v', nodo, distancia]`` y por relajación
+      ``['r', desde, hasta, anterior, nueva]``, con los nodos por índice.
+      El estado inicial es implícito (todo infinito salvo el origen, a 0)
+      y se reconstruye cualquier paso reproduciendo los eventos;
+    * ``'auto'``: ``'full'`` hasta full_trace_max_nodes() nodos y
+      ``'compact'`` a partir de ahí.
+    
+    ``snapshot`` permite reutilizar una instantánea ya obtenida (ver
+    ComputationContext).
     """
     start_time = time.time()
     
-    # Construir el grafo como diccionario de adyacencia
-    graph_dict = build_graph_dict(graph)
+    # Obtener la instantánea compacta del grafo (cacheada por versión)
+    if snapshot is None:
+        snapshot = get_graph_snapshot(graph)
+    
+    start = snapshot.index(start_node.id)
+    end = snapshot.index(end_node.id)
     
-    start_id = str(start_node.id)
-    end_id = str(end_node.id)
+    algorithm = resolve_algorithm(snapshot, algorithm)
     
     # Verificar que los nodos existen en el grafo
-    if start_id not in graph_dict or end_id not in graph_dict:
+    if start is None or end is None:
         return {
             'start_node': start_node.name,
             'end_node': end_node.name,
             'shortest_path': [],
             'total_distance': math.inf,
             'steps': [],
+            'trace': None,
             'success': False,
             'message': 'Nodos no encontrados en el grafo',
-            'execution_time': time.time() - start_time
+            'execution_time': time.time() - start_time,
+            'algorithm': algorithm,
+            'settled_nodes': 0
         }
     
-    # Inicialización del algoritmo
-    distances = {node_id: math.inf for node_id in graph_dict}
-    previous = {node_id: None for node_id in graph_dict}
-    distances[start_id] = 0.0
-    visited = set()
+    nodes_count = snapshot.nodes_count
+    names = snapshot.names
     steps = []
+    trace = None
+    
+    if trace_format == 'auto':
+        trace_format = 'full' if nodes_count <= full_trace_max_nodes() else 'compact'
+    compact = include_steps and trace_format == 'compact'
     
-    # Crear mapeo de IDs a nombres para mejor visualización
-    id_to_name = {str(node.id): node.name for node in graph.nodes.all()}
+    # Estado observable por los pasos (solo se registra con include_steps)
+    if include_steps:
+        distances = [math.inf] * nodes_count
+        previous = [-1] * nodes_count
+        distances[start] = 0.0
+        visited = bytearray(nodes_count)
+        visit_order = []
     
-    def add_step(current_node_id: str, description: str):
-        """Agregar un paso al registro si se requiere"""
-        if include_steps:
+    if compact:
+        events = []
+        trace = {
+            'format': 'compact',
+            'names': list(names),
+            'node_ids': list(snapshot.node_ids),
+            'start': start,
+            'end': end,
+            'events': events
+        }
+    
+    def add_step(current_node: int, description: str):
+        """Agregar un paso completo al registro si se requiere"""
+        if include_steps and not compact:
             steps.append({
-                'current_node': id_to_name.get(current_node_id, current_node_id),
+                'current_node': names[current_node],
                 'distances': {
-                    id_to_name.get(nid, nid): dist 
-                    for nid, dist in distances.items()
+                    names[index]: None if dist == math.inf else dist
+                    for index, dist in enumerate(distances)
                 },
                 'previous': {
-                    id_to_name.get(nid, nid): id_to_name.get(prev, prev) if prev else None
-                    for nid, prev in previous.items()
+                    names[index]: names[prev] if prev != -1 else None
+                    for index, prev in enumerate(previous)
                 },
-                'visited': [id_to_name.get(nid, nid) for nid in visited],
+                'visited': [names[index] for index in visit_order],
                 'unvisited': [
-                    id_to_name.get(nid, nid) 
-                    for nid in graph_dict.keys() if nid not in visited
+                    names[index] for index in range(nodes_count) if not visited[index]
                 ],
                 'description': description
             })
     
-    add_step(start_id, f"Iniciando algoritmo desde el nodo {start_node.name}")
-    
-    # Algoritmo principal de Dijkstra
-    while len(visited) < len(graph_dict):
-        # Encontrar el nodo no visitado con la menor distancia
-        current_node = None
-        min_distance = math.inf
-        
-        for node_id in graph_dict:
-            if node_id not in visited and distances[node_id] < min_distance:
-                current_node = node_id
-                min_distance = distances[node_id]
-        
-        # Si no hay nodo alcanzable, terminar
-        if current_node is None or distances[current_node] == math.inf:
-            break
-        
-        # Marcar como visitado
-        visited.add(current_node)
-        current_name = id_to_name.get(current_node, current_node)
-        
+    def on_visit(current_node: int):
+        """Registrar la visita de un nodo (y la llegada al destino)"""
+        visit_order.append(current_node)
+        if compact:
+            events.append(['v', current_node, distances[current_node]])
+            return
         add_step(
             current_node, 
-            f"Visitando nodo {current_name} con distancia {distances[current_node]}"
+            f"Visitando nodo {names[current_node]} con distancia {distances[current_node]}"
         )
-        
-        # Si llegamos al nodo destino, podemos terminar
-        if current_node == end_id:
+        if current_node == end:
             add_step(current_node, f"¡Llegamos al nodo destino {end_node.name}!")
-            break
-        
-        # Actualizar distancias de nodos vecinos
-        for neighbor_id, weight in graph_dict[current_node]:
-            if neighbor_id in visited:
-                continue
-            
-            new_distance = distances[current_node] + weight
-            
-            if new_distance < distances[neighbor_id]:
-                old_distance = distances[neighbor_id]
-                distances[neighbor_id] = new_distance
-                previous[neighbor_id] = current_node
-                
-                neighbor_name = id_to_name.get(neighbor_id, neighbor_id)
-                old_dist_str = "infinito" if old_distance == math.inf else str(old_distance)
-                
-                add_step(
-                    current_node,
-                    f"Actualizando distancia a {neighbor_name}: {new_distance} "
-                    f"(anterior: {old_dist_str})"
-                )
     
-    # Reconstruir el camino más corto
-    path_ids = []
-    current = end_id
+    def on_relax(current_node: int, neighbor: int, old_distance: float, new_distance: float):
+        """Registrar la actualización de la distancia de un vecino"""
+        if compact:
+            events.append([
+                'r', current_node, neighbor,
+                None if old_distance == math.inf else old_distance, new_distance
+            ])
+            return
+        old_dist_str = "infinito" if old_distance == math.inf else str(old_distance)
+        add_step(
+            current_node,
+            f"Actualizando distancia a {names[neighbor]}: {new_distance} "
+            f"(anterior: {old_dist_str})"
+        )
     
-    # Si no hay camino al nodo final
-    if previous[end_id] is None and start_id != end_id:
-        path_ids = []
+    if include_steps:
+        add_step(start, f"Iniciando algoritmo desde el nodo {start_node.name}")
+        
+        # Algoritmo principal de Dijkstra
+        dijkstra_search(
+            snapshot,
+            start,
+            end,
+            distances=distances,
+            previous=previous,
+            visited=visited,
+            on_visit=on_visit,
+            on_relax=on_relax,
+        )
+        path = reconstruct_path(previous, start, end)
+        total_distance = distances[end]
+        settled_count = len(visit_order)
     else:
-        # Reconstruir el camino hacia atrás
-        while current is not None:
-            path_ids.append(current)
-            current = previous[current]
-        path_ids.reverse()
+        # Sin pasos el resultado puede venir de la caché
+        total_distance, path, settled_count = cached_shortest_path(
+            snapshot, start, end, algorithm
+        )
     
-    # Convertir IDs a nombres para el resultado final
-    shortest_path = [id_to_name.get(nid, nid) for nid in path_ids]
-    total_distance = distances[end_id]
+    # Convertir índices a nombres
+    shortest_path = [names[index] for index in path]
     
     # Verificar si se encontró un camino
     success = total_distance != math.inf
     if success:
         message = f"Camino más corto encontrado con distancia total: {total_distance}"
         add_step(
-            end_id, 
+            end, 
             f"Camino reconstruido: {' → '.join(shortest_path)}"
         )
     else:
@@ -183,32 +562,7 @@ def dijkstra_algorithm(
     
     execution_time = time.time() - start_time
 
-    # Sanitizar steps y valores infinitos para que sean JSON-serializables
-    def sanitize_value(v):
-        if isinstance(v, float) and math.isinf(v):
-            return None
-        return v
-
-    sanitized_steps = []
-    for s in steps:
-        sanitized_distances = {
-            k: (None if (isinstance(v, float) and math.isinf(v)) else v)
-            for k, v in s.get('distances', {}).items()
-        }
-        sanitized_previous = {
-            k: (v if v is not None else None)
-            for k, v in s.get('previous', {}).items()
-        }
-        sanitized_step = {
-            'current_node': s.get('current_node'),
-            'distances': sanitized_distances,
-            'previous': sanitized_previous,
-            'visited': s.get('visited', []),
-            'unvisited': s.get('unvisited', []),
-            'description': s.get('description')
-        }
-        sanitized_steps.append(sanitized_step)
-
+    # Los pasos ya se generan sin infinitos; solo queda la distancia total
     sanitized_total_distance = (
         None
         if (isinstance(total_distance, float) and math.isinf(total_distance))
@@ -220,102 +574,901 @@ def dijkstra_algorithm(
         'end_node': end_node.name,
         'shortest_path': shortest_path,
         'total_distance': sanitized_total_distance,
-        'steps': sanitized_steps,
+        'steps': steps,
+        'trace': trace,
         'success': success,
         'message': message,
-        'execution_time': execution_time
+        'execution_time': execution_time,
+        'algorithm': algorithm,
+        'settled_nodes': settled_count
     }
 
 
-def find_all_paths(
-    graph: Graph, 
-    start_node: Node, 
-    end_node: Node,
-    max_paths: int = 100,
-    max_depth: int = 20
-) -> Dict:
+def iter_dijkstra_trace(graph: Graph, start_node: Node, end_node: Node) -> Iterator[Tuple[str, object]]:
     """
-    Encuentra todos los caminos posibles entre dos nodos usando DFS
-    Incluye información sobre distancias y comparación con Dijkstra
+    Traza compacta de dijkstra_algorithm generada bajo demanda
     
-    Args:
-        graph: Grafo donde buscar
-        start_node: Nodo inicial
-        end_node: Nodo destino  
-        max_paths: Máximo número de caminos a encontrar (prevenir explosión)
-        max_depth: Máxima profundidad de búsqueda (prevenir ciclos infinitos)
+    Emite ``('init', {...})`` con la tabla de nombres e índices, luego
+    ``('event', evento)`` por cada evento de iter_dijkstra_events (mismo
+    formato que ``trace['events']``) y por último ``('summary', {...})`` con
+    el resultado. Nunca se guarda la traza completa en memoria.
     """
     start_time = time.time()
+    snapshot = get_graph_snapshot(graph)
+    start = snapshot.index(start_node.id)
+    end = snapshot.index(end_node.id)
+    summary = {
+        'start_node': start_node.name,
+        'end_node': end_node.name,
+        'shortest_path': [],
+        'total_distance': None,
+        'success': False,
+        'algorithm': 'dijkstra',
+    }
     
-    # Construir el grafo como diccionario de adyacencia
-    graph_dict = build_graph_dict(graph)
+    if start is None or end is None:
+        yield 'summary', {
+            **summary,
+            'message': 'Nodos no encontrados en el grafo',
+            'execution_time': time.time() - start_time,
+            'settled_nodes': 0
+        }
+        return
     
-    start_id = str(start_node.id)
-    end_id = str(end_node.id)
+    names = snapshot.names
+    nodes_count = snapshot.nodes_count
+    yield 'init', {
+        'format': 'compact',
+        'names': list(names),
+        'node_ids': list(snapshot.node_ids),
+        'start': start,
+        'end': end
+    }
     
-    # Verificar que los nodos existen
-    if start_id not in graph_dict or end_id not in graph_dict:
+    distances = [math.inf] * nodes_count
+    distances[start] = 0.0
+    previous = [-1] * nodes_count
+    visited = bytearray(nodes_count)
+    settled_count = 0
+    
+    for event in iter_dijkstra_events(snapshot, start, end, distances, previous, visited):
+        if event[0] == 'v':
+            settled_count += 1
+        yield 'event', list(event)
+    
+    total_distance = distances[end]
+    success = total_distance != math.inf
+    if success:
+        summary['shortest_path'] = [names[index] for index in reconstruct_path(previous, start, end)]
+        summary['total_distance'] = total_distance
+        message = f"Camino más corto encontrado con distancia total: {total_distance}"
+    else:
+        message = f"No existe un camino desde {start_node.name} hasta {end_node.name}"
+    
+    yield 'summary', {
+        **summary,
+        'success': success,
+        'message': message,
+        'execution_time': time.time() - start_time,
+        'settled_nodes': settled_count
+    }
+
+
+def shortest_path_tree(
+    graph: Graph,
+    start_node: Node,
+    target_nodes: Optional[List[Node]] = None
+) -> Dict:
+    """
+    Calcula el árbol de caminos más cortos desde un nodo (una sola búsqueda)
+    
+    Ejecuta Dijkstra sin salida anticipada y retorna, para cada nodo
+    alcanzable, su distancia y su predecesor en arreglos paralelos. Los
+    caminos completos solo se expanden para ``target_nodes``.
+    """
+    start_time = time.time()
+    
+    snapshot = get_graph_snapshot(graph)
+    start = snapshot.index(start_node.id)
+    
+    if start is None:
         return {
             'start_node': start_node.name,
-            'end_node': end_node.name,
-            'all_paths': [],
-            'shortest_path': [],
-            'paths_count': 0,
+            'start_node_id': start_node.id,
+            'node_ids': [],
+            'node_names': [],
+            'distances': [],
+            'predecessors': [],
+            'paths': [],
+            'reachable_count': 0,
             'success': False,
-            'message': 'Nodos no encontrados en el grafo',
+            'message': 'Nodo no encontrado en el grafo',
             'execution_time': time.time() - start_time
         }
     
-    # Crear mapeo de IDs a nombres
-    id_to_name = {str(node.id): node.name for node in graph.nodes.all()}
+    distances, previous = cached_shortest_path_tree(snapshot, start)
     
-    all_paths = []
+    names = snapshot.names
+    node_ids = snapshot.node_ids
+    reachable = [
+        index for index in range(snapshot.nodes_count)
+        if distances[index] != math.inf
+    ]
+    
+    paths = []
+    for target_node in target_nodes or []:
+        end = snapshot.index(target_node.id)
+        path = reconstruct_path(previous, start, end) if end is not None else []
+        reached = bool(path)
+        paths.append({
+            'end_node': target_node.name,
+            'end_node_id': target_node.id,
+            'shortest_path': [names[index] for index in path],
+            'path_ids': [node_ids[index] for index in path],
+            'total_distance': distances[end] if reached else None,
+            'success': reached
+        })
     
-    def dfs_all_paths(current_path: List[str], current_distance: float, visited_in_path: set):
-        """Búsqueda DFS para encontrar todos los caminos"""
+    return {
+        'start_node': start_node.name,
+        'start_node_id': start_node.id,
+        'node_ids': [node_ids[index] for index in reachable],
+        'node_names': [names[index] for index in reachable],
+        'distances': [distances[index] for index in reachable],
+        'predecessors': [
+            node_ids[previous[index]] if previous[index] != -1 else None
+            for index in reachable
+        ],
+        'paths': paths,
+        'reachable_count': len(reachable),
+        'success': True,
+        'message': (
+            f"Árbol de caminos más cortos desde {start_node.name}: "
+            f"{len(reachable)} nodos alcanzables"
+        ),
+        'execution_time': time.time() - start_time
+    }
+
+
+def batch_shortest_paths(
+    graph: Graph,
+    pairs: List[Tuple[int, int]],
+    algorithm: str = 'dijkstra'
+) -> Dict:
+    """
+    Resuelve muchas consultas (inicio, destino) de un mismo grafo
+    
+    El grafo se carga una vez y las consultas se agrupan por nodo de inicio:
+    un inicio con un solo destino usa la búsqueda punto a punto ``algorithm``;
+    con varios destinos se calcula (o se toma de la caché) su árbol completo
+    y cada destino se responde recorriendo predecesores. Los errores de un
+    par (nodo ajeno al grafo, inicio igual a destino) no afectan a los demás.
+    Los resultados conservan el orden de ``pairs``.
+    """
+    start_time = time.time()
+    
+    snapshot = get_graph_snapshot(graph)
+    algorithm = resolve_algorithm(snapshot, algorithm)
+    names = snapshot.names
+    
+    # Agrupar los pares válidos por nodo de inicio
+    results: List[Optional[Dict]] = [None] * len(pairs)
+    pairs_by_source: Dict[int, List[Tuple[int, int]]] = {}
+    for position, (start_node_id, end_node_id) in enumerate(pairs):
+        start = snapshot.index(start_node_id)
+        end = snapshot.index(end_node_id)
+        error = None
+        if start is None:
+            error = 'El nodo de inicio no pertenece al grafo especificado'
+        elif end is None:
+            error = 'El nodo de destino no pertenece al grafo especificado'
+        elif start == end:
+            error = 'El nodo de inicio y destino deben ser diferentes'
         
-        # Límites de seguridad
-        if len(all_paths) >= max_paths:
+        if error:
+            results[position] = {
+                'start_node_id': start_node_id,
+                'end_node_id': end_node_id,
+                'start_node': names[start] if start is not None else None,
+                'end_node': names[end] if end is not None else None,
+                'shortest_path': [],
+                'total_distance': None,
+                'success': False,
+                'message': error
+            }
+        else:
+            pairs_by_source.setdefault(start, []).append((position, end))
+    
+    for start, targets in pairs_by_source.items():
+        if len(targets) == 1:
+            position, end = targets[0]
+            total_distance, path, _ = cached_shortest_path(snapshot, start, end, algorithm)
+            solved = [(position, end, total_distance, path)]
+        else:
+            distances, previous = cached_shortest_path_tree(snapshot, start)
+            solved = [
+                (position, end, distances[end], reconstruct_path(previous, start, end))
+                for position, end in targets
+            ]
+        
+        for position, end, total_distance, path in solved:
+            start_node_id, end_node_id = pairs[position]
+            success = total_distance != math.inf
+            results[position] = {
+                'start_node_id': start_node_id,
+                'end_node_id': end_node_id,
+                'start_node': names[start],
+                'end_node': names[end],
+                'shortest_path': [names[index] for index in path],
+                'total_distance': total_distance if success else None,
+                'success': success,
+                'message': (
+                    f"Camino más corto encontrado con distancia total: {total_distance}"
+                    if success else
+                    f"No existe un camino desde {names[start]} hasta {names[end]}"
+                )
+            }
+    
+    return {
+        'graph_id': graph.id,
+        'algorithm': algorithm,
+        'pairs_count': len(pairs),
+        'sources_count': len(pairs_by_source),
+        'results': results,
+        'execution_time': time.time() - start_time
+    }
+
+
+# Número de saltos de los nodos que no pueden llegar al destino
+UNREACHABLE_HOPS = 1 << 30
+
+# Tolerancia relativa al comparar distancias con ``max_distance``
+DISTANCE_TOLERANCE = 1e-9
+
+
+def distances_to_target(snapshot: GraphSnapshot, end: int) -> Tuple[List[float], List[int]]:
+    """
+    Cotas hacia ``end`` para podar búsquedas de caminos
+    
+    Recorre la adyacencia invertida desde ``end``: un Dijkstra da la distancia
+    mínima exacta de cada nodo al destino y un BFS el mínimo número de saltos.
+    Los nodos que no pueden llegar al destino quedan con ``inf`` y
+    ``UNREACHABLE_HOPS``.
+    Retorna: (distancias, saltos)
+    """
+    reverse = snapshot.reversed()
+    distances, _, _ = dijkstra_search(reverse, end)
+    
+    offsets = reverse.offsets
+    targets = reverse.targets
+    hops = [UNREACHABLE_HOPS] * snapshot.nodes_count
+    hops[end] = 0
+    frontier = [end]
+    level = 0
+    while frontier:
+        level += 1
+        next_frontier = []
+        for node in frontier:
+            for position in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[position]
+                if hops[neighbor] == UNREACHABLE_HOPS:
+                    hops[neighbor] = level
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+    
+    return distances, hops
+
+
+def _tolerant_limit(max_distance: float) -> float:
+    """``max_distance`` con margen para errores de redondeo al sumar pesos"""
+    return max_distance + DISTANCE_TOLERANCE * max(1.0, abs(max_distance))
+
+
+def distance_limit(
+    shortest_distance: float,
+    max_distance: Optional[float] = None,
+    max_stretch: Optional[float] = None
+) -> float:
+    """Distancia máxima admitida según ``max_distance`` y ``max_stretch`` (× óptimo)"""
+    limit = math.inf
+    if max_distance is not None:
+        limit = max_distance
+    if max_stretch is not None and shortest_distance < math.inf:
+        limit = min(limit, shortest_distance * max_stretch)
+    return limit
+
+
+def iter_simple_paths(
+    snapshot: GraphSnapshot,
+    start: int,
+    end: int,
+    max_depth: int,
+    max_distance: float = math.inf,
+    bounds: Optional[Tuple[List[float], List[int]]] = None,
+    stack: Optional[List[int]] = None,
+    floor: int = 0
+) -> Iterator[Tuple[float, List[int]]]:
+    """
+    Caminos simples de ``start`` a ``end`` con como mucho ``max_depth`` nodos
+    y distancia no mayor que ``max_distance``, en orden DFS (vecinos en el
+    orden de la adyacencia)
+    
+    Backtracking iterativo con pila explícita: el camino, las distancias
+    acumuladas y la posición en la adyacencia de cada nivel se apilan y
+    desapilan en el sitio, y los nodos del camino se marcan en una máscara
+    ``bytearray``. No hay recursión ni copias por arista; solo se copia el
+    camino al emitirlo.
+    
+    Antes de bajar a un vecino se consultan las cotas de
+    distances_to_target (``bounds``, se calculan si no se pasan): se descarta
+    si no puede llegar al destino, si necesita más saltos de los que permite
+    ``max_depth`` o si su distancia mínima restante supera ``max_distance``.
+    Esas ramas no contienen ningún camino válido, así que la poda no cambia
+    los caminos emitidos ni su orden.
+    
+    ``stack`` es la pila de posiciones de adyacencia (una por nivel; la
+    arista usada para bajar del nivel ``i`` es ``stack[i] - 1``). Si se pasa
+    vacía se rellena y se actualiza en el sitio, así que tras consumir
+    caminos contiene el estado para continuar; si se pasa con contenido, la
+    búsqueda continúa justo después del último camino emitido. Vacía al
+    terminar. Con ``floor`` la búsqueda se detiene al retroceder por debajo
+    de ese nivel, es decir, solo recorre el subárbol de la pila dada.
+    
+    Retorna un generador de (distancia, camino en índices).
+    """
+    if stack is None:
+        stack = []
+    
+    offsets = snapshot.offsets
+    targets = snapshot.targets
+    weights = snapshot.weights
+    
+    remaining, hops = bounds if bounds is not None else distances_to_target(snapshot, end)
+    limit = _tolerant_limit(max_distance)
+    
+    on_path = bytearray(snapshot.nodes_count)
+    path = [start]
+    distances = [0.0]
+    positions = stack
+    
+    if positions:
+        # Reanudar: reconstruir el camino y sus distancias desde la pila
+        for position in positions[:-1]:
+            path.append(targets[position - 1])
+            distances.append(distances[-1] + weights[position - 1])
+        for node in path:
+            on_path[node] = 1
+    else:
+        if max_depth < 1:
+            return
+        if start == end:
+            yield 0.0, [start]
             return
-        if len(current_path) > max_depth:
+        if 1 + hops[start] > max_depth or remaining[start] > limit:
             return
+        on_path[start] = 1
+        positions.append(offsets[start])
+    
+    while len(positions) > floor:
+        current_node = path[-1]
+        position = positions[-1]
+        
+        # Vecinos agotados: retroceder
+        if position == offsets[current_node + 1]:
+            positions.pop()
+            path.pop()
+            distances.pop()
+            on_path[current_node] = 0
+            continue
+        positions[-1] = position + 1
+        
+        neighbor = targets[position]
+        # Evitar ciclos en el camino actual
+        if on_path[neighbor]:
+            continue
+        
+        new_distance = distances[-1] + weights[position]
+        depth = len(path) + 1
+        
+        # Si llegamos al destino, emitir el camino
+        if neighbor == end:
+            if depth <= max_depth and new_distance <= limit:
+                yield new_distance, path + [end]
+            continue
+        
+        # Podar ramas sin salida, demasiado profundas o demasiado largas
+        if depth + hops[neighbor] > max_depth or new_distance + remaining[neighbor] > limit:
+            continue
+        
+        on_path[neighbor] = 1
+        path.append(neighbor)
+        distances.append(new_distance)
+        positions.append(offsets[neighbor])
+
+
+# Subárboles por proceso por debajo de los cuales se divide un nivel más
+PARALLEL_SUBTREES_PER_WORKER = 4
+
+# Caminos entre comprobaciones del presupuesto compartido en los procesos del pool
+PARALLEL_CANCEL_CHECK_INTERVAL = 256
+
+# Cotas hacia el destino en cada proceso del pool, por (grafo, versión, destino);
+# el pool se reutiliza entre peticiones, así que se guardan solo las últimas
+_worker_bounds: Dict[Tuple, Tuple[List[float], List[int]]] = {}
+PARALLEL_WORKER_BOUNDS_CACHE = 8
+
+
+def _stack_path(snapshot: GraphSnapshot, start: int, stack: List[int]) -> List[int]:
+    """Camino (índices) de una pila de posiciones de adyacencia (ver iter_simple_paths)"""
+    targets = snapshot.targets
+    return [start] + [targets[position - 1] for position in stack]
+
+
+def split_search_tree(
+    snapshot: GraphSnapshot,
+    start: int,
+    end: int,
+    max_depth: int,
+    max_distance: float,
+    bounds: Tuple[List[float], List[int]],
+    levels: int = 1
+) -> List[Tuple[str, float, List[int]]]:
+    """
+    Divide el árbol de búsqueda de iter_simple_paths por sus primeros
+    ``levels`` saltos, con las mismas podas
+    
+    Retorna, en orden DFS, ``('path', distancia, pila)`` para los caminos que
+    terminan antes de ese nivel y ``('subtree', distancia, pila)`` para cada
+    subárbol, cuya pila permite recorrerlo con iter_simple_paths(stack=...,
+    floor=len(pila) - 1). Concatenar los resultados en este orden reproduce
+    exactamente la enumeración secuencial.
+    """
+    offsets = snapshot.offsets
+    targets = snapshot.targets
+    weights = snapshot.weights
+    remaining, hops = bounds
+    limit = _tolerant_limit(max_distance)
+    items = []
+    
+    if max_depth < 2 or start == end or 1 + hops[start] > max_depth or remaining[start] > limit:
+        return items
+    
+    def expand(path: List[int], distance: float, stack: List[int], level: int):
+        current_node = path[-1]
+        for position in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = targets[position]
+            if neighbor in path:
+                continue
+            
+            new_distance = distance + weights[position]
+            depth = len(path) + 1
+            new_stack = stack + [position + 1]
+            
+            if neighbor == end:
+                if depth <= max_depth and new_distance <= limit:
+                    items.append(('path', new_distance, new_stack))
+                continue
+            
+            if depth + hops[neighbor] > max_depth or new_distance + remaining[neighbor] > limit:
+                continue
+            
+            if level < levels:
+                expand(path + [neighbor], new_distance, new_stack, level + 1)
+            else:
+                items.append(('subtree', new_distance, new_stack + [offsets[neighbor]]))
+    
+    expand([start], 0.0, [], 1)
+    return items
+
+
+def _subtree_paths_task(block: Tuple) -> List[Tuple[float, List[int]]]:
+    """
+    Tarea del pool: caminos (distancia, pila) de un subárbol
+    
+    Los subárboles anteriores se emiten antes, así que este solo necesita
+    ``max_paths`` menos los que ya hayan encontrado ellos (progress_before);
+    el presupuesto se vuelve a consultar cada PARALLEL_CANCEL_CHECK_INTERVAL
+    caminos.
+    """
+    start, end, max_depth, max_distance, stack, max_paths = block
+    snapshot = get_worker_snapshot()
+    
+    key = (snapshot.graph_id, snapshot.version, end)
+    if key not in _worker_bounds:
+        if len(_worker_bounds) >= PARALLEL_WORKER_BOUNDS_CACHE:
+            _worker_bounds.pop(next(iter(_worker_bounds)))
+        _worker_bounds[key] = distances_to_target(snapshot, end)
+    
+    budget = max_paths - progress_before()
+    found = []
+    if budget <= 0 or is_cancelled():
+        return found
+    for distance, _ in iter_simple_paths(
+        snapshot, start, end, max_depth, max_distance, _worker_bounds[key],
+        stack=stack, floor=len(stack) - 1
+    ):
+        found.append((distance, list(stack)))
+        if len(found) >= budget:
+            break
+        if len(found) % PARALLEL_CANCEL_CHECK_INTERVAL == 0:
+            report_progress(len(found))
+            budget = max_paths - progress_before()
+            if len(found) >= budget or is_cancelled():
+                break
+    report_progress(len(found))
+    return found
+
+
+def parallel_simple_paths(
+    snapshot: GraphSnapshot,
+    start: int,
+    end: int,
+    max_depth: int,
+    max_distance: float,
+    bounds: Tuple[List[float], List[int]],
+    stack: List[int],
+    max_paths: int,
+    workers: Optional[int] = None
+) -> Iterator[Tuple[float, List[int]]]:
+    """
+    iter_simple_paths repartido entre procesos por subárboles
+    
+    El árbol de búsqueda se divide por el primer salto (o los dos primeros si
+    hay pocos subárboles por proceso) y cada subárbol se enumera en el pool
+    compartido de core.parallel. Cada subárbol se detiene en cuanto los
+    anteriores y él reúnen ``max_paths`` caminos, de modo que el trabajo
+    total queda cerca de ``max_paths`` y no de uno por subárbol. Los
+    resultados se concatenan en orden DFS, así que se emiten los mismos
+    caminos en el mismo orden que la versión secuencial; al reunir
+    ``max_paths`` se cancelan los subárboles pendientes.
+    
+    ``stack`` se actualiza tras cada camino emitido con la pila que tendría
+    la búsqueda secuencial en ese punto (para los cursores), y queda vacía
+    si se recorrió todo el árbol.
+    """
+    workers = workers or default_workers()
+    items = split_search_tree(snapshot, start, end, max_depth, max_distance, bounds, 1)
+    subtrees_count = sum(1 for kind, _, _ in items if kind == 'subtree')
+    if subtrees_count < workers * PARALLEL_SUBTREES_PER_WORKER:
+        items = split_search_tree(snapshot, start, end, max_depth, max_distance, bounds, 2)
+    
+    blocks = [
+        (start, end, max_depth, max_distance, item_stack, max_paths)
+        for kind, _, item_stack in items
+        if kind == 'subtree'
+    ]
+    results = imap_on_snapshot(snapshot, _subtree_paths_task, blocks, workers)
+    emitted = 0
+    
+    try:
+        for kind, distance, item_stack in items:
+            found = [(distance, item_stack)] if kind == 'path' else next(results)
+            if emitted + len(found) >= max_paths:
+                # Ya hay suficientes caminos: cancelar los subárboles restantes
+                results.close()
+                found = found[:max_paths - emitted]
             
-        current_node = current_path[-1]
+            for path_distance, path_stack in found:
+                emitted += 1
+                stack[:] = path_stack
+                yield path_distance, _stack_path(snapshot, start, path_stack)
+            
+            if emitted >= max_paths:
+                return
+        stack.clear()
+    finally:
+        results.close()
+
+
+def _spur_search(
+    snapshot: GraphSnapshot,
+    spur: int,
+    end: int,
+    blocked_nodes: bytearray,
+    blocked_next: set
+) -> Optional[Tuple[List[int], List[float]]]:
+    """
+    Camino más corto de ``spur`` a ``end`` sin pasar por ``blocked_nodes``
+    ni usar aristas ``spur -> v`` con ``v`` en ``blocked_next``
+    Retorna: (nodos, pesos de cada tramo) o None si no hay camino
+    """
+    nodes_count = snapshot.nodes_count
+    offsets = snapshot.offsets
+    targets = snapshot.targets
+    weights = snapshot.weights
+    
+    distances = [math.inf] * nodes_count
+    previous = [-1] * nodes_count
+    step_weights = [0.0] * nodes_count
+    visited = bytearray(blocked_nodes)
+    distances[spur] = 0.0
+    heap = [(0.0, spur)]
+    
+    while heap:
+        current_distance, current_node = heapq.heappop(heap)
+        if visited[current_node] or current_distance > distances[current_node]:
+            continue
+        visited[current_node] = 1
         
-        # Si llegamos al destino, guardar el camino
-        if current_node == end_id:
-            path_names = [id_to_name.get(nid, nid) for nid in current_path]
-            all_paths.append({
-                'path': path_names,
-                'path_ids': current_path.copy(),
-                'total_distance': current_distance,
-                'nodes_count': len(current_path)
-            })
+        if current_node == end:
+            path = []
+            steps = []
+            while current_node != spur:
+                path.append(current_node)
+                steps.append(step_weights[current_node])
+                current_node = previous[current_node]
+            path.append(spur)
+            path.reverse()
+            steps.reverse()
+            return path, steps
+        
+        for position in range(offsets[current_node], offsets[current_node + 1]):
+            neighbor = targets[position]
+            if visited[neighbor]:
+                continue
+            if current_node == spur and neighbor in blocked_next:
+                continue
+            
+            new_distance = current_distance + weights[position]
+            if new_distance < distances[neighbor]:
+                distances[neighbor] = new_distance
+                previous[neighbor] = current_node
+                step_weights[neighbor] = weights[position]
+                heapq.heappush(heap, (new_distance, neighbor))
+    
+    return None
+
+
+def _step_weight(snapshot: GraphSnapshot, a: int, b: int) -> float:
+    """Peso de la arista más ligera de ``a`` a ``b``"""
+    return min(
+        snapshot.weights[position]
+        for position in range(snapshot.offsets[a], snapshot.offsets[a + 1])
+        if snapshot.targets[position] == b
+    )
+
+
+def iter_k_shortest_paths(
+    snapshot: GraphSnapshot,
+    start: int,
+    end: int,
+    state: Optional[Dict] = None
+) -> Iterator[Tuple[float, List[int]]]:
+    """
+    Caminos simples de ``start`` a ``end`` en orden creciente de distancia
+    (Yen, en la variante de Lawler que particiona el espacio de caminos)
+    
+    Cada candidato es el mejor camino de un subconjunto "caminos que empiezan
+    por este prefijo y no siguen por estos nodos". Al emitir un candidato su
+    subconjunto se divide en el mismo con un nodo excluido más y uno por cada
+    nodo posterior del camino, y el mejor camino de cada parte se obtiene
+    con un Dijkstra desde el final del prefijo ("spur"). Así obtener k
+    caminos cuesta del orden de k × L búsquedas de Dijkstra (L = longitud de
+    los caminos) en lugar de recorrer todo el espacio de caminos, y no hace
+    falta recordar los caminos ya emitidos: los subconjuntos son disjuntos.
+    Los caminos se identifican por su secuencia de nodos: entre aristas
+    paralelas se usa la más ligera. Los empates se resuelven por número de
+    nodos y después por índices.
+    
+    ``state`` (``{'candidates': [...]}``) guarda el montículo de candidatos;
+    se actualiza en el sitio y las partes de cada camino se generan antes de
+    emitirlo, así que en cualquier pausa del generador el estado permite
+    continuar. Con un estado vacío se empieza desde el principio.
+    
+    Retorna un generador de (distancia, camino en índices); se detiene
+    cuando no quedan más caminos.
+    """
+    if state is None:
+        state = {}
+    resuming = 'candidates' in state
+    candidates = state.setdefault('candidates', [])
+    
+    def push_best(root: Sequence[int], root_steps: Sequence[float], excluded: List[int]):
+        # Mejor camino que empieza por ``root`` y no sigue por ``excluded``
+        blocked_nodes = bytearray(snapshot.nodes_count)
+        for node in root[:-1]:
+            blocked_nodes[node] = 1
+        spur_result = _spur_search(snapshot, root[-1], end, blocked_nodes, set(excluded))
+        if spur_result is None:
             return
         
-        # Explorar vecinos
-        for neighbor_id, weight in graph_dict[current_node]:
-            # Evitar ciclos en el camino actual
-            if neighbor_id not in visited_in_path:
-                new_path = current_path + [neighbor_id]
-                new_distance = current_distance + weight
-                new_visited = visited_in_path | {neighbor_id}
-                
-                dfs_all_paths(new_path, new_distance, new_visited)
+        spur_path, spur_steps = spur_result
+        path = tuple(root) + tuple(spur_path[1:])
+        # Suma en el mismo orden que el recorrido DFS para que las distancias coincidan
+        distance = 0.0
+        for weight in root_steps:
+            distance += weight
+        for weight in spur_steps:
+            distance += weight
+        heapq.heappush(candidates, (distance, len(path), path, len(root) - 1, excluded))
+    
+    if resuming:
+        # Reanudar (p. ej. desde un cursor en JSON): normalizar a tuplas
+        candidates[:] = [
+            (distance, length, tuple(path), deviation, list(excluded))
+            for distance, length, path, deviation, excluded in candidates
+        ]
+    else:
+        push_best([start], [], [])
+    
+    while candidates:
+        distance, _, path, deviation, excluded = heapq.heappop(candidates)
+        # Los pesos de cada tramo no se guardan en el candidato (ni en el cursor)
+        steps = [_step_weight(snapshot, a, b) for a, b in zip(path, path[1:])]
+        
+        # El resto del subconjunto: el mismo prefijo sin el siguiente nodo de
+        # este camino, y cada prefijo más largo sin el nodo que lo sigue
+        push_best(path[:deviation + 1], steps[:deviation], [*excluded, path[deviation + 1]])
+        for spur_position in range(deviation + 1, len(path) - 1):
+            push_best(path[:spur_position + 1], steps[:spur_position], [path[spur_position + 1]])
+        
+        yield distance, list(path)
+
+
+# Modos de búsqueda de find_all_paths
+PATH_SEARCH_MODES = ('all', 'k_shortest')
+
+
+class ComputationContext:
+    """
+    Cálculos compartidos entre algoritmos sobre el mismo par de nodos
+    durante una petición
+    
+    Fija una instantánea del grafo y memoriza el resultado de Dijkstra y las
+    cotas hacia el destino, para que p. ej. compare_with_dijkstra ejecute
+    una sola búsqueda con pasos que también aprovechan la enumeración de
+    caminos y el análisis. No se comparte entre peticiones.
+    """
     
-    # Iniciar búsqueda DFS
-    dfs_all_paths([start_id], 0.0, {start_id})
+    def __init__(self, graph: Graph, start_node: Node, end_node: Node):
+        self.graph = graph
+        self.start_node = start_node
+        self.end_node = end_node
+        self.snapshot = get_graph_snapshot(graph)
+        self.start = self.snapshot.index(start_node.id)
+        self.end = self.snapshot.index(end_node.id)
+        # Resultados por (include_steps, trace_format); sin pasos, el formato no importa
+        self._dijkstra_results = {}
+        self._bounds = None
+    
+    def dijkstra(self, include_steps: bool = False, trace_format: str = 'auto') -> Dict:
+        """
+        Resultado de dijkstra_algorithm entre los nodos del contexto, uno
+        por combinación de ``include_steps`` y ``trace_format``. Cualquier
+        resultado ya calculado sirve cuando no se piden pasos, así que
+        conviene pedir primero el trazado.
+        """
+        key = (True, trace_format) if include_steps else (False, None)
+        result = self._dijkstra_results.get(key)
+        if result is None and not include_steps and self._dijkstra_results:
+            result = next(iter(self._dijkstra_results.values()))
+        if result is None:
+            result = self._dijkstra_results[key] = dijkstra_algorithm(
+                self.graph, self.start_node, self.end_node,
+                include_steps=include_steps,
+                trace_format=trace_format,
+                snapshot=self.snapshot
+            )
+        return result
+    
+    def bounds(self) -> Tuple[List[float], List[int]]:
+        """Cotas hacia el destino (ver distances_to_target)"""
+        if self._bounds is None:
+            self._bounds = distances_to_target(self.snapshot, self.end)
+        return self._bounds
+
+
+def iter_all_paths(
+    graph: Graph, 
+    start_node: Node, 
+    end_node: Node,
+    max_paths: int = 100,
+    max_depth: int = 20,
+    mode: str = 'all',
+    max_distance: Optional[float] = None,
+    max_stretch: Optional[float] = None,
+    cursor: Optional[Dict] = None,
+    parallel: bool = False,
+    context: Optional[ComputationContext] = None
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Versión incremental de find_all_paths (mismos parámetros)
+    
+    Genera ``('path', info)`` por cada camino en cuanto se encuentra (en
+    modo ``'all'`` en orden DFS, sin ordenar) y termina con
+    ``('summary', resumen)``: el resultado de find_all_paths sin
+    ``all_paths``. La memoria no depende del número de caminos.
+    """
+    start_time = time.time()
+    
+    # Instantánea y búsquedas compartidas (ver ComputationContext)
+    if context is None:
+        context = ComputationContext(graph, start_node, end_node)
+    snapshot = context.snapshot
+    
+    start = context.start
+    end = context.end
+    
+    # Verificar que los nodos existen
+    if start is None or end is None:
+        yield 'summary', {
+            'start_node': start_node.name,
+            'end_node': end_node.name,
+            'shortest_path': [],
+            'paths_count': 0,
+            'success': False,
+            'message': 'Nodos no encontrados en el grafo',
+            'execution_time': time.time() - start_time
+        }
+        return
     
-    # Ordenar caminos por distancia total (más corto primero)
-    all_paths.sort(key=lambda p: p['total_distance'])
+    names = snapshot.names
+    node_ids = snapshot.node_ids
     
     # Obtener el camino más corto usando Dijkstra para comparación
-    dijkstra_result = dijkstra_algorithm(graph, start_node, end_node, include_steps=False)
+    dijkstra_result = context.dijkstra()
     shortest_path = dijkstra_result.get('shortest_path', [])
     shortest_distance = dijkstra_result.get('total_distance')
     
-    # Estadísticas adicionales
-    paths_count = len(all_paths)
+    # Cotas hacia el destino (una búsqueda inversa) para podar la enumeración
+    bounds = context.bounds()
+    limit = distance_limit(bounds[0][start], max_distance, max_stretch)
+    
+    # Estado de la enumeración: vacío o el de la página anterior (cursor)
+    offset = cursor['n'] if cursor else 0
+    tolerance = DISTANCE_TOLERANCE * max(1.0, abs(limit))
+    if mode == 'k_shortest':
+        # Caminos en orden creciente de distancia (Yen)
+        state = cursor['s'] if cursor else {}
+        paths = takewhile(
+            lambda item: item[0] <= limit + tolerance,
+            iter_k_shortest_paths(snapshot, start, end, state)
+        )
+    else:
+        # Búsqueda DFS (en paralelo por subárboles si se pide y no se reanuda)
+        state = list(cursor['s']) if cursor else []
+        if parallel and not state:
+            # Un camino más que la página, para saber si hay página siguiente
+            paths = parallel_simple_paths(
+                snapshot, start, end, max_depth, limit, bounds, state, max_paths + 1
+            )
+        else:
+            paths = iter_simple_paths(snapshot, start, end, max_depth, limit, bounds, state)
+    
+    # Estadísticas acumuladas mientras se emiten los caminos
+    paths_count = 0
+    best_distance = None
+    optimal_count = 0
+    
+    # Los nombres solo se generan para los caminos emitidos
+    paths = iter(paths)
+    for distance, path in islice(paths, max_paths):
+        paths_count += 1
+        if best_distance is None or distance < best_distance:
+            best_distance = distance
+        if shortest_distance is not None and abs(distance - shortest_distance) < 1e-10:
+            optimal_count += 1
+        
+        yield 'path', {
+            'path': [names[index] for index in path],
+            'path_ids': [str(node_ids[index]) for index in path],
+            'total_distance': distance,
+            'nodes_count': len(path)
+        }
+    
+    # ¿Quedan caminos tras la página? Así ningún cursor lleva a una página vacía
+    has_more = False
+    if paths_count >= max_paths:
+        if mode == 'k_shortest':
+            # El primer candidato es exactamente el camino siguiente
+            has_more = bool(state['candidates']) and state['candidates'][0][0] <= limit + tolerance
+        else:
+            # Buscar un camino más y reanudar desde antes de él
+            resume_state = list(state)
+            has_more = next(paths, None) is not None
+            paths.close()
+            state = resume_state
+    
     success = paths_count > 0
     
     if success:
@@ -324,7 +1477,7 @@ def find_all_paths(
         else:
             message = f"Se encontraron {paths_count} caminos entre {start_node.name} y {end_node.name}"
             
-        if paths_count >= max_paths:
+        if has_more:
             message += f" (limitado a {max_paths} caminos)"
     else:
         message = f"No se encontraron caminos entre {start_node.name} y {end_node.name}"
@@ -335,60 +1488,151 @@ def find_all_paths(
         comparison_info = {
             'dijkstra_distance': shortest_distance,
             'dijkstra_path': shortest_path,
-            'all_paths_shortest_distance': all_paths[0]['total_distance'] if all_paths else None,
-            'paths_with_optimal_distance': len([p for p in all_paths if abs(p['total_distance'] - shortest_distance) < 1e-10])
+            'all_paths_shortest_distance': best_distance,
+            'paths_with_optimal_distance': optimal_count
         }
     
+    # Cursor para la página siguiente si se alcanzó el límite y quedan caminos
+    next_cursor = None
+    if has_more:
+        query = cursor_query(
+            graph.id, snapshot.version, start_node.id, end_node.id,
+            mode, max_depth, max_distance, max_stretch
+        )
+        next_cursor = encode_cursor(query, offset + paths_count, state)
+    
     execution_time = time.time() - start_time
     
-    return {
+    yield 'summary', {
         'start_node': start_node.name,
         'end_node': end_node.name,
-        'all_paths': all_paths,
         'shortest_path': shortest_path,
         'paths_count': paths_count,
         'success': success,
         'message': message,
         'comparison': comparison_info,
         'execution_time': execution_time,
+        'mode': mode,
+        'next_cursor': next_cursor,
         'search_limits': {
             'max_paths': max_paths,
             'max_depth': max_depth,
-            'paths_limited': len(all_paths) >= max_paths
+            'max_distance': limit if limit < math.inf else None,
+            'paths_limited': has_more
         }
     }
 
 
+def find_all_paths(
+    graph: Graph, 
+    start_node: Node, 
+    end_node: Node,
+    max_paths: int = 100,
+    max_depth: int = 20,
+    mode: str = 'all',
+    max_distance: Optional[float] = None,
+    max_stretch: Optional[float] = None,
+    cursor: Optional[Dict] = None,
+    parallel: bool = False,
+    context: Optional[ComputationContext] = None
+) -> Dict:
+    """
+    Encuentra todos los caminos posibles entre dos nodos usando DFS
+    Incluye información sobre distancias y comparación con Dijkstra
+    
+    Args:
+        graph: Grafo donde buscar
+        start_node: Nodo inicial
+        end_node: Nodo destino  
+        max_paths: Máximo número de caminos a encontrar (prevenir explosión)
+        max_depth: Máxima profundidad de búsqueda (prevenir ciclos infinitos)
+        mode: ``'all'`` (DFS exhaustivo) o ``'k_shortest'`` (los ``max_paths``
+            caminos más cortos con el algoritmo de Yen; ``max_depth`` no se aplica)
+        max_distance: Distancia total máxima de los caminos (opcional)
+        max_stretch: Distancia máxima como múltiplo de la óptima, p. ej. 1.5 (opcional)
+        cursor: Contenido de ``next_cursor`` de una llamada anterior con los
+            mismos parámetros (ver path_cursor); continúa la enumeración
+            donde se quedó. Cada página se ordena por separado.
+        parallel: En modo ``'all'``, repartir la búsqueda entre procesos por
+            subárboles (mismo resultado que la búsqueda secuencial)
+        context: ComputationContext de la petición, para reutilizar la
+            instantánea y el resultado de Dijkstra (opcional)
+    """
+    all_paths = []
+    summary = {}
+    
+    for kind, record in iter_all_paths(
+        graph, start_node, end_node, max_paths, max_depth, mode,
+        max_distance, max_stretch, cursor, parallel, context
+    ):
+        if kind == 'path':
+            all_paths.append(record)
+        else:
+            summary = record
+    
+    if mode == 'all':
+        # Ordenar caminos por distancia total (más corto primero)
+        all_paths.sort(key=lambda p: p['total_distance'])
+    
+    return {**summary, 'all_paths': all_paths}
+
+
+# Veredictos de validate_graph_for_dijkstra por grafo: (versión, válido, errores)
+_validation_cache: 'OrderedDict[int, Tuple[int, bool, List[str]]]' = OrderedDict()
+_validation_lock = threading.Lock()
+VALIDATION_CACHE_SIZE = 256
+
+
 def validate_graph_for_dijkstra(graph: Graph) -> Tuple[bool, List[str]]:
     """
     Valida que un grafo sea válido para ejecutar Dijkstra
     Retorna: (es_válido, lista_de_errores)
+    
+    Usa un número fijo de consultas, independiente del tamaño del grafo, y
+    memoriza el veredicto por ``Graph.version``: mientras el grafo no
+    cambie no se vuelve a consultar la base de datos.
     """
+    with _validation_lock:
+        cached = _validation_cache.get(graph.id)
+        if cached is not None and cached[0] == graph.version:
+            _validation_cache.move_to_end(graph.id)
+            return cached[1], list(cached[2])
+    
     errors = []
     
     # Verificar que hay nodos
-    if graph.nodes.count() == 0:
+    if not graph.nodes.exists():
         errors.append('El grafo debe tener al menos un nodo')
     
     # Verificar que no hay pesos negativos
-    negative_edges = graph.edges.filter(weight__lt=0)
-    if negative_edges.exists():
-        edge_names = [str(edge) for edge in negative_edges[:5]]
+    negative_edges = list(
+        graph.edges.filter(weight__lt=0).select_related('from_node', 'to_node')[:5]
+    )
+    if negative_edges:
+        edge_names = [str(edge) for edge in negative_edges]
         errors.append(
             "El algoritmo de Dijkstra no funciona con pesos negativos. "
             f"Aristas con peso negativo: {', '.join(edge_names)}"
         )
     
     # Verificar que todas las aristas referencian nodos válidos del mismo grafo
-    invalid_edges = []
-    for edge in graph.edges.all():
-        if edge.from_node.graph != graph or edge.to_node.graph != graph:
-            invalid_edges.append(str(edge))
+    invalid_edges = list(
+        graph.edges
+        .filter(~Q(from_node__graph_id=graph.id) | ~Q(to_node__graph_id=graph.id))
+        .select_related('from_node', 'to_node')[:5]
+    )
     
     if invalid_edges:
         errors.append(
             f"Algunas aristas referencian nodos de otros grafos: "
-            f"{', '.join(invalid_edges[:5])}"
+            f"{', '.join(str(edge) for edge in invalid_edges)}"
         )
     
-    return len(errors) == 0, errors
+    is_valid = len(errors) == 0
+    with _validation_lock:
+        _validation_cache[graph.id] = (graph.version, is_valid, list(errors))
+        _validation_cache.move_to_end(graph.id)
+        while len(_validation_cache) > VALIDATION_CACHE_SIZE:
+            _validation_cache.popitem(last=False)
+    
+    return is_valid, errors
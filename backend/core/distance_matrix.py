@@ -0,0 +1,212 @@
+"""
+Matriz de distancias entre todos los pares (o orígenes × destinos)
+
+Dos estrategias, elegidas automáticamente:
+
+* ``dijkstra``: un Dijkstra con montículo por origen, repartido entre
+  procesos (core.parallel) cuando hay suficientes orígenes. Adecuada para
+  grafos dispersos.
+* ``floyd_warshall``: Floyd–Warshall vectorizado con NumPy, para grafos
+  pequeños y densos. NumPy es opcional; sin él siempre se usa Dijkstra.
+
+Las filas se devuelven como ``array('d')`` (float64 contiguo), con ``inf``
+donde no hay camino.
+"""
+
+import math
+import struct
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from .algorithms import dijkstra_search
+from .graph_snapshot import GraphSnapshot, get_graph_snapshot
+from .models import Graph
+from .parallel import chunked, default_workers, get_worker_snapshot, map_on_snapshot
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy es opcional
+    np = None
+
+METHODS = ('auto', 'dijkstra', 'floyd_warshall')
+
+# Floyd–Warshall solo compensa en grafos pequeños y densos
+FLOYD_WARSHALL_MAX_NODES = 600
+FLOYD_WARSHALL_MIN_DENSITY = 0.05
+
+# Por debajo de este número de orígenes no merece la pena arrancar procesos
+PARALLEL_MIN_SOURCES = 64
+
+# Cabecera del formato binario: magia, filas, columnas
+BINARY_MAGIC = b'DJKM'
+BINARY_HEADER = struct.Struct('<4sqq')
+
+
+def _distance_rows(snapshot: GraphSnapshot, sources: Sequence[int], targets: Sequence[int]) -> List[bytes]:
+    """Filas de distancias (float64 empaquetado) para los orígenes dados"""
+    rows = []
+    for source in sources:
+        distances, _, _ = dijkstra_search(snapshot, source)
+        rows.append(array('d', [distances[target] for target in targets]).tobytes())
+    return rows
+
+
+def _distance_rows_task(block: Tuple[List[int], List[int]]) -> List[bytes]:
+    """Tarea del pool: filas de un bloque de orígenes"""
+    sources, targets = block
+    return _distance_rows(get_worker_snapshot(), sources, targets)
+
+
+def choose_method(snapshot: GraphSnapshot, sources_count: int) -> str:
+    """Estrategia automática según tamaño, densidad y número de orígenes"""
+    nodes_count = snapshot.nodes_count
+    if np is None or nodes_count == 0 or nodes_count > FLOYD_WARSHALL_MAX_NODES:
+        return 'dijkstra'
+    density = snapshot.arcs_count / (nodes_count * nodes_count)
+    # Con pocos orígenes, V búsquedas completas no hacen falta
+    if density >= FLOYD_WARSHALL_MIN_DENSITY and sources_count * 4 >= nodes_count:
+        return 'floyd_warshall'
+    return 'dijkstra'
+
+
+def dijkstra_matrix(
+    snapshot: GraphSnapshot,
+    sources: List[int],
+    targets: List[int],
+    workers: Optional[int] = None
+) -> List[array]:
+    """Matriz por Dijkstra repetido; en paralelo si hay suficientes orígenes"""
+    workers = workers or default_workers()
+    if workers > 1 and len(sources) >= PARALLEL_MIN_SOURCES:
+        # Varios bloques por proceso para equilibrar la carga
+        blocks = [(block, targets) for block in chunked(sources, workers * 4)]
+        packed_rows = [
+            row
+            for rows in map_on_snapshot(snapshot, _distance_rows_task, blocks, workers)
+            for row in rows
+        ]
+    else:
+        packed_rows = _distance_rows(snapshot, sources, targets)
+
+    matrix = []
+    for packed in packed_rows:
+        row = array('d')
+        row.frombytes(packed)
+        matrix.append(row)
+    return matrix
+
+
+def floyd_warshall_matrix(snapshot: GraphSnapshot, sources: List[int], targets: List[int]) -> List[array]:
+    """Matriz por Floyd–Warshall vectorizado (requiere NumPy)"""
+    nodes_count = snapshot.nodes_count
+    offsets = np.frombuffer(snapshot.offsets, dtype=np.int64)
+    heads = np.repeat(np.arange(nodes_count), np.diff(offsets))
+    tails = np.frombuffer(snapshot.targets, dtype=np.int32)
+    weights = np.frombuffer(snapshot.weights, dtype=np.float64)
+
+    distances = np.full((nodes_count, nodes_count), np.inf)
+    # Con aristas paralelas (p. ej. dirigida + no dirigida) gana la más ligera
+    np.minimum.at(distances, (heads, tails), weights)
+    np.fill_diagonal(distances, 0.0)
+
+    for k in range(nodes_count):
+        np.minimum(distances, distances[:, k, None] + distances[None, k, :], out=distances)
+
+    selected = distances[np.ix_(sources, targets)]
+    return [array('d', row.tobytes()) for row in selected]
+
+
+def distance_matrix(
+    snapshot: GraphSnapshot,
+    sources: List[int],
+    targets: List[int],
+    method: str = 'auto',
+    workers: Optional[int] = None
+) -> Tuple[List[array], str]:
+    """
+    Matriz de distancias entre índices de ``sources`` y ``targets``
+    Retorna: (filas float64, método usado)
+    """
+    if method == 'auto':
+        method = choose_method(snapshot, len(sources))
+    if method == 'floyd_warshall' and np is None:
+        method = 'dijkstra'
+
+    if method == 'floyd_warshall':
+        return floyd_warshall_matrix(snapshot, sources, targets), method
+    return dijkstra_matrix(snapshot, sources, targets, workers), method
+
+
+def compute_distance_matrix(
+    graph: Graph,
+    source_node_ids: Optional[List[int]] = None,
+    target_node_ids: Optional[List[int]] = None,
+    method: str = 'auto',
+    workers: Optional[int] = None
+) -> Dict:
+    """
+    Matriz de distancias de un grafo por IDs de nodo
+
+    Sin ``source_node_ids``/``target_node_ids`` se usan todos los nodos (en
+    orden por nombre). Lanza ValueError si algún ID no pertenece al grafo.
+    """
+    start_time = time.time()
+    snapshot = get_graph_snapshot(graph)
+
+    if source_node_ids is None:
+        source_node_ids = list(snapshot.node_ids)
+    if target_node_ids is None:
+        target_node_ids = list(snapshot.node_ids)
+
+    unknown = [
+        node_id for node_id in {*source_node_ids, *target_node_ids}
+        if snapshot.index(node_id) is None
+    ]
+    if unknown:
+        raise ValueError(f"Nodos que no pertenecen al grafo: {sorted(unknown)}")
+
+    max_cells = getattr(settings, 'DISTANCE_MATRIX_MAX_CELLS', 4_000_000)
+    if len(source_node_ids) * len(target_node_ids) > max_cells:
+        raise ValueError(
+            f"La matriz solicitada supera el máximo de {max_cells} celdas"
+        )
+
+    sources = [snapshot.index(node_id) for node_id in source_node_ids]
+    targets = [snapshot.index(node_id) for node_id in target_node_ids]
+    matrix, method_used = distance_matrix(snapshot, sources, targets, method, workers)
+
+    return {
+        'graph_id': graph.id,
+        'method': method_used,
+        'source_node_ids': source_node_ids,
+        'target_node_ids': target_node_ids,
+        'matrix': matrix,
+        'execution_time': time.time() - start_time
+    }
+
+
+def matrix_to_json(matrix: List[array]) -> List[List[Optional[float]]]:
+    """Listas anidadas JSON-serializables (None donde no hay camino)"""
+    return [
+        [None if math.isinf(value) else value for value in row]
+        for row in matrix
+    ]
+
+
+def matrix_to_binary(source_node_ids: List[int], target_node_ids: List[int], matrix: List[array]) -> bytes:
+    """
+    Formato binario: cabecera ``'DJKM', filas (int64), columnas (int64)``
+    en little-endian, IDs de origen (int64[filas]), IDs de destino
+    (int64[columnas]) y la matriz float64 por filas (``inf`` = sin camino).
+    Los arreglos van en el orden de bytes nativo (little-endian en x86/ARM).
+    """
+    parts = [
+        BINARY_HEADER.pack(BINARY_MAGIC, len(source_node_ids), len(target_node_ids)),
+        array('q', source_node_ids).tobytes(),
+        array('q', target_node_ids).tobytes(),
+    ]
+    parts.extend(row.tobytes() for row in matrix)
+    return b''.join(parts)
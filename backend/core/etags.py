@@ -0,0 +1,86 @@
+"""
+ETag y GET condicional para los endpoints de grafos
+
+Las ETag se derivan de ``Graph.version``, que cambia con cualquier alta,
+modificación o baja de nodos y aristas, así que comprobar ``If-None-Match``
+solo lee la fila del grafo: un 304 no toca nodos ni aristas.
+"""
+
+import hashlib
+from functools import wraps
+from typing import Optional
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Graph
+
+
+def _query_hash(request) -> str:
+    """Resumen de la query string (filtros y paginación forman parte del recurso)"""
+    return hashlib.md5(request.GET.urlencode().encode()).hexdigest()[:12]
+
+
+def _graph_etag(row) -> Optional[str]:
+    """ETag de un grafo: versión de su contenido más los campos propios"""
+    if row is None:
+        return None
+    graph_id, version, updated_at, is_active = row
+    # is_active cambia con update() al activar otro grafo, sin tocar updated_at
+    return f"graph-{graph_id}-v{version}-{updated_at.timestamp()}-{int(is_active)}"
+
+
+GRAPH_ETAG_FIELDS = ('id', 'version', 'updated_at', 'is_active')
+
+
+def graph_detail_etag(request, pk=None, **kwargs) -> Optional[str]:
+    """ETag de /api/graphs/{id}/"""
+    return _graph_etag(
+        Graph.objects.filter(pk=pk).values_list(*GRAPH_ETAG_FIELDS).first()
+    )
+
+
+def graph_export_etag(request, pk=None, **kwargs) -> Optional[str]:
+    """ETag de /api/graphs/{id}/export/ (una por formato)"""
+    etag = graph_detail_etag(request, pk)
+    return f"export-{etag}-{_query_hash(request)}" if etag else None
+
+
+def active_graph_etag(request, **kwargs) -> Optional[str]:
+    """ETag de /api/graphs/active/"""
+    return _graph_etag(
+        Graph.objects.filter(is_active=True).values_list(*GRAPH_ETAG_FIELDS).first()
+    )
+
+
+def graph_items_etag(prefix: str):
+    """ETag de los listados de nodos o aristas filtrados por ``graph_id``"""
+    def etag_func(request, **kwargs) -> Optional[str]:
+        graph_id = request.GET.get('graph_id')
+        if not graph_id or not graph_id.isdigit():
+            return None
+        version = Graph.objects.filter(pk=graph_id).values_list('version', flat=True).first()
+        if version is None:
+            return None
+        return f"{prefix}-{graph_id}-v{version}-{_query_hash(request)}"
+    return etag_func
+
+
+def conditional_on_version(etag_func):
+    """
+    Decorador para acciones de ViewSet: condition(etag_func=...) de Django
+    (ETag en la respuesta y 304 si coincide ``If-None-Match``) más
+    ``Cache-Control: no-cache`` para que el navegador revalide siempre
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapped(self, request, *args, **kwargs):
+            @condition(etag_func=etag_func)
+            def view(request, *args, **kwargs):
+                return view_method(self, request, *args, **kwargs)
+
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapped
+    return decorator
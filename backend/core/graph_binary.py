@@ -0,0 +1,299 @@
+"""
+Formato binario compacto de grafos (``.djkg``)
+
+Cabecera ``BINARY_HEADER`` en little-endian: magia ``'DJKG'``, versión del
+formato, versión del grafo, nodos (N), aristas (E), arcos dirigidos de la
+adyacencia (A, las aristas no dirigidas cuentan doble), bytes de los
+nombres y posición del nodo origen (-1 si no hay). Le siguen estas
+secciones, cada una rellenada hasta múltiplo de 8 bytes:
+
+* Nodos, en orden por nombre: ``node_ids`` (int64[N]), ``xs`` e ``ys``
+  (float64[N], NaN sin coordenada), ``name_offsets`` (int64[N + 1]) y
+  ``names`` (UTF-8 concatenado).
+* Adyacencia CSR, la misma de GraphSnapshot: ``offsets`` (int64[N + 1]),
+  ``targets`` (int32[A]) y ``weights`` (float64[A]).
+* Aristas originales para reimportar: ``edge_sources`` y ``edge_targets``
+  (posiciones de nodo, int32[E]), ``edge_weights`` (float64[E]) y
+  ``edge_directed`` (uint8[E]).
+
+Los arreglos van en el orden de bytes nativo (little-endian en x86/ARM),
+igual que la matriz binaria de core.distance_matrix. Al leer, cada sección
+es un ``memoryview.cast`` sobre el buffer original: no se copia nada salvo
+los nombres.
+
+Con ``GRAPH_SNAPSHOT_DIR`` configurado, get_graph_snapshot guarda cada
+grafo en ese directorio en este formato y las siguientes cargas (otros
+procesos o tras reiniciar) lo leen con ``mmap`` en lugar de consultar la
+base de datos (ver stored_snapshot).
+"""
+
+import glob
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+from .graph_snapshot import GraphSnapshot, _loader_chunk_size, iter_edge_rows, load_graph_snapshot
+from .models import Graph, Node
+
+BINARY_MAGIC = b'DJKG'
+BINARY_FORMAT_VERSION = 1
+
+# Magia, versión del formato, versión del grafo, N, E, A, bytes de nombres, origen
+BINARY_HEADER = struct.Struct('<4sHxxqqqqqq')
+
+# (sección, tipo de array, longitud en función de N, E, A y bytes de nombres)
+BINARY_SECTIONS = (
+    ('node_ids', 'q', lambda n, e, a, s: n),
+    ('xs', 'd', lambda n, e, a, s: n),
+    ('ys', 'd', lambda n, e, a, s: n),
+    ('name_offsets', 'q', lambda n, e, a, s: n + 1),
+    ('names', 'B', lambda n, e, a, s: s),
+    ('offsets', 'q', lambda n, e, a, s: n + 1),
+    ('targets', 'i', lambda n, e, a, s: a),
+    ('weights', 'd', lambda n, e, a, s: a),
+    ('edge_sources', 'i', lambda n, e, a, s: e),
+    ('edge_targets', 'i', lambda n, e, a, s: e),
+    ('edge_weights', 'd', lambda n, e, a, s: e),
+    ('edge_directed', 'B', lambda n, e, a, s: e),
+)
+
+# Bytes por trozo al emitir una sección grande
+BINARY_CHUNK_SIZE = 1 << 20
+
+
+class BinaryGraph:
+    """Secciones de un grafo binario como vistas de solo lectura sobre el buffer"""
+
+    __slots__ = ('graph_version', 'source_index') + tuple(name for name, _, _ in BINARY_SECTIONS)
+
+    @property
+    def nodes_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edges_count(self) -> int:
+        return len(self.edge_sources)
+
+    def node_names(self) -> List[str]:
+        """Nombres decodificados (la única sección que se copia)"""
+        names = self.names
+        offsets = self.name_offsets
+        return [
+            str(names[offsets[index]:offsets[index + 1]], 'utf-8')
+            for index in range(self.nodes_count)
+        ]
+
+
+def read_graph_binary(buffer) -> BinaryGraph:
+    """
+    Interpreta ``buffer`` (bytes, bytearray, mmap...) sin copiarlo
+
+    Lanza ValueError si la cabecera no es válida o el tamaño no cuadra.
+    """
+    view = memoryview(buffer).cast('B')
+    if len(view) < BINARY_HEADER.size:
+        raise ValueError("El fichero binario está truncado (sin cabecera)")
+
+    magic, format_version, graph_version, nodes_count, edges_count, arcs_count, names_size, source_index = (
+        BINARY_HEADER.unpack_from(view)
+    )
+    if magic != BINARY_MAGIC:
+        raise ValueError("No es un grafo binario (magia distinta de 'DJKG')")
+    if format_version != BINARY_FORMAT_VERSION:
+        raise ValueError(f"Versión de formato binario no soportada: {format_version}")
+    if min(nodes_count, edges_count, arcs_count, names_size) < 0 or not -1 <= source_index < nodes_count:
+        raise ValueError("Cabecera de grafo binario no válida")
+
+    data = BinaryGraph()
+    data.graph_version = graph_version
+    data.source_index = source_index
+    position = BINARY_HEADER.size
+    for name, typecode, length in BINARY_SECTIONS:
+        size = length(nodes_count, edges_count, arcs_count, names_size) * array(typecode).itemsize
+        end = position + size
+        if end > len(view):
+            raise ValueError(f"El fichero binario está truncado (sección {name})")
+        section = view[position:end]
+        setattr(data, name, section if typecode == 'B' else section.cast(typecode))
+        position = end + (-size % 8)
+
+    if position != len(view):
+        raise ValueError("El tamaño del fichero binario no coincide con su cabecera")
+    if data.offsets[0] != 0 or data.offsets[nodes_count] != arcs_count:
+        raise ValueError("La adyacencia del grafo binario no es válida")
+    return data
+
+
+def snapshot_from_binary(buffer, graph_id=None) -> GraphSnapshot:
+    """
+    GraphSnapshot leída de un grafo binario
+
+    ``node_ids``, la adyacencia y las coordenadas son vistas sobre
+    ``buffer``, que debe mantenerse sin modificar mientras se use la
+    instantánea.
+    """
+    data = read_graph_binary(buffer)
+    return GraphSnapshot(
+        graph_id, data.graph_version, data.node_ids, data.node_names(),
+        data.offsets, data.targets, data.weights, xs=data.xs, ys=data.ys,
+    )
+
+
+def _section_chunks(values) -> Iterator[memoryview]:
+    """Bytes de un array (sin copiarlo) en trozos, más el relleno hasta 8"""
+    view = memoryview(values).cast('B')
+    for start in range(0, len(view), BINARY_CHUNK_SIZE):
+        yield view[start:start + BINARY_CHUNK_SIZE]
+    if len(view) % 8:
+        yield memoryview(bytes(-len(view) % 8))
+
+
+def iter_graph_binary(graph: Graph) -> Iterator[memoryview]:
+    """
+    Emite el grafo en formato binario
+
+    Lee nodos y aristas con dos consultas, sin instanciar modelos, y los
+    vuelca en arrays compactos (la cabecera necesita los tamaños, así que
+    el grafo se reúne antes de empezar a emitir). La adyacencia se
+    construye con GraphSnapshot.build, igual que al cargar la instantánea.
+    """
+    node_rows: List[Tuple[int, str, float, float]] = []
+    source_index = -1
+    for index, (node_id, name, x, y, is_source) in enumerate(
+        Node.objects
+        .filter(graph_id=graph.id)
+        .order_by('name')
+        .values_list('id', 'name', 'x_position', 'y_position', 'is_source')
+        .iterator(chunk_size=_loader_chunk_size())
+    ):
+        node_rows.append((node_id, name, x, y))
+        if is_source:
+            source_index = index
+
+    index_of = {row[0]: index for index, row in enumerate(node_rows)}
+    lookup = index_of.get
+    edge_sources = array('i')
+    edge_targets = array('i')
+    edge_weights = array('d')
+    edge_directed = array('B')
+    for from_id, to_id, weight, directed in iter_edge_rows(graph.id):
+        from_index = lookup(from_id)
+        to_index = lookup(to_id)
+        if from_index is None or to_index is None:
+            # Nodo creado después de leer los nodos
+            continue
+        edge_sources.append(from_index)
+        edge_targets.append(to_index)
+        edge_weights.append(weight)
+        edge_directed.append(1 if directed else 0)
+
+    # Con la posición como ID, la adyacencia sale directamente en posiciones
+    snapshot = GraphSnapshot.build(
+        graph.id, graph.version,
+        ((index, name, x, y) for index, (_, name, x, y) in enumerate(node_rows)),
+        zip(edge_sources, edge_targets, edge_weights, edge_directed),
+    )
+    node_ids = array('q', [row[0] for row in node_rows])
+    del node_rows, index_of
+
+    encoded = [name.encode('utf-8') for name in snapshot.names]
+    name_offsets = array('q', [0])
+    for name in encoded:
+        name_offsets.append(name_offsets[-1] + len(name))
+    names = b''.join(encoded)
+    del encoded
+
+    yield memoryview(BINARY_HEADER.pack(
+        BINARY_MAGIC, BINARY_FORMAT_VERSION, snapshot.version, snapshot.nodes_count,
+        len(edge_weights), snapshot.arcs_count, len(names), source_index,
+    ))
+    for values in (
+        node_ids, snapshot.xs, snapshot.ys, name_offsets, names,
+        snapshot.offsets, snapshot.targets, snapshot.weights,
+        edge_sources, edge_targets, edge_weights, edge_directed,
+    ):
+        yield from _section_chunks(values)
+
+
+def snapshot_file_path(graph: Graph) -> Optional[str]:
+    """
+    Fichero binario de la instantánea de ``graph`` en ``GRAPH_SNAPSHOT_DIR``
+    (None si no está configurado)
+
+    El nombre lleva la fecha de creación además del ID, porque la base de
+    datos puede reutilizar el ID de un grafo borrado.
+    """
+    directory = getattr(settings, 'GRAPH_SNAPSHOT_DIR', None)
+    if not directory:
+        return None
+    return os.path.join(directory, f"graph-{graph.id}-{int(graph.created_at.timestamp() * 1e6)}.djkg")
+
+
+def _read_snapshot_file(path: str, graph: Graph) -> Optional[GraphSnapshot]:
+    """Instantánea sobre el fichero mapeado en memoria, o None si falta o es de otra versión"""
+    try:
+        with open(path, 'rb') as source:
+            mapped = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        header = BINARY_HEADER.unpack_from(mapped)
+        if header[0] != BINARY_MAGIC or header[2] != graph.version:
+            return None
+        # El mapa sigue abierto mientras la instantánea tenga vistas sobre él
+        return snapshot_from_binary(mapped, graph.id)
+    except (struct.error, ValueError):
+        return None
+
+
+def write_snapshot_file(graph: Graph, path: str):
+    """Escribe el grafo en binario de forma atómica (fichero temporal y rename)"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as target:
+            for chunk in iter_graph_binary(graph):
+                target.write(chunk)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def stored_snapshot(graph: Graph) -> GraphSnapshot:
+    """
+    Instantánea de ``graph`` desde ``GRAPH_SNAPSHOT_DIR``
+
+    Si el fichero falta o es de otra versión se vuelve a escribir desde la
+    base de datos (las mismas dos consultas que load_graph_snapshot) y se
+    lee mapeado. Si el directorio no se puede usar, se carga como siempre.
+    """
+    path = snapshot_file_path(graph)
+    if path is None:
+        return load_graph_snapshot(graph)
+    snapshot = _read_snapshot_file(path, graph)
+    if snapshot is None:
+        try:
+            write_snapshot_file(graph, path)
+        except OSError:
+            return load_graph_snapshot(graph)
+        snapshot = _read_snapshot_file(path, graph)
+    return snapshot if snapshot is not None else load_graph_snapshot(graph)
+
+
+def remove_snapshot_files(graph_id: int):
+    """Borra los ficheros de instantánea de un grafo eliminado"""
+    directory = getattr(settings, 'GRAPH_SNAPSHOT_DIR', None)
+    if not directory:
+        return
+    for path in glob.glob(os.path.join(glob.escape(directory), f"graph-{graph_id}-*.djkg")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
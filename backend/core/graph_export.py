@@ -0,0 +1,186 @@
+"""
+Exportación de grafos en streaming
+
+Los nodos y las aristas se leen con ``values_list().iterator()`` y se
+emiten a medida que llegan, sin instanciar modelos ni construir la
+estructura anidada de GraphDetailSerializer. Formatos:
+
+* ``ndjson``: una línea ``{"type": "graph", ...}``, una por nodo
+  ``{"type": "node", ...}`` y una por arista ``{"type": "edge", ...}``.
+  Conserva todo el grafo (posiciones y nodo origen incluidos).
+* ``csv``: cabecera ``from,to,weight,directed`` y una fila por arista,
+  con los nombres de los nodos. No incluye posiciones ni nodos aislados.
+* ``dimacs``: ``p sp N M`` y arcos ``a u v w``; los nodos se numeran de 1
+  a N por orden de nombre y cada arista no dirigida da dos arcos.
+* ``binary``: el formato compacto de core.graph_binary (este sí reúne el
+  grafo en arrays antes de emitir, porque la cabecera lleva los tamaños).
+
+Todos se pueden volver a importar con core.graph_import.
+"""
+
+import csv
+import io
+import json
+from typing import Iterator, Union
+
+from django.db.models import Count, Q
+from django.utils.text import slugify
+
+from .graph_binary import iter_graph_binary
+from .graph_snapshot import _loader_chunk_size, iter_edge_rows
+from .models import Graph, Node, Edge
+
+EXPORT_FORMATS = ('ndjson', 'csv', 'dimacs', 'binary')
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'dimacs': 'text/plain',
+    'binary': 'application/octet-stream',
+}
+
+EXPORT_EXTENSIONS = {'ndjson': 'ndjson', 'csv': 'csv', 'dimacs': 'gr', 'binary': 'djkg'}
+
+# Líneas de texto agrupadas en cada trozo de la respuesta
+EXPORT_LINES_PER_CHUNK = 1000
+
+
+def _node_rows(graph_id: int) -> Iterator[tuple]:
+    """Filas ``(nombre, x, y, es_origen)`` en orden por nombre"""
+    return (
+        Node.objects
+        .filter(graph_id=graph_id)
+        .order_by('name')
+        .values_list('name', 'x_position', 'y_position', 'is_source')
+        .iterator(chunk_size=_loader_chunk_size())
+    )
+
+
+def _edge_rows(graph_id: int) -> Iterator[tuple]:
+    """Filas ``(nombre origen, nombre destino, peso, dirigida)`` en una consulta"""
+    return (
+        Edge.objects
+        .filter(graph_id=graph_id)
+        .order_by('from_node__name', 'to_node__name')
+        .values_list('from_node__name', 'to_node__name', 'weight', 'directed')
+        .iterator(chunk_size=_loader_chunk_size())
+    )
+
+
+def _chunked(lines: Iterator[str]) -> Iterator[str]:
+    """Agrupa líneas para no emitir un trozo por fila"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= EXPORT_LINES_PER_CHUNK:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def _ndjson_lines(graph: Graph) -> Iterator[str]:
+    def line(record):
+        return json.dumps(record, ensure_ascii=False) + '\n'
+
+    yield line({
+        'type': 'graph',
+        'name': graph.name,
+        'description': graph.description,
+        'version': graph.version,
+    })
+    for name, x, y, is_source in _node_rows(graph.id):
+        yield line({
+            'type': 'node',
+            'name': name,
+            'x_position': x,
+            'y_position': y,
+            'is_source': is_source,
+        })
+    for from_name, to_name, weight, directed in _edge_rows(graph.id):
+        yield line({
+            'type': 'edge',
+            'from': from_name,
+            'to': to_name,
+            'weight': weight,
+            'directed': directed,
+        })
+
+
+def iter_ndjson(graph: Graph) -> Iterator[str]:
+    return _chunked(_ndjson_lines(graph))
+
+
+def iter_csv(graph: Graph) -> Iterator[str]:
+    # csv.writer escapa comas y comillas en los nombres
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(('from', 'to', 'weight', 'directed'))
+    rows = 1
+    for from_name, to_name, weight, directed in _edge_rows(graph.id):
+        writer.writerow((from_name, to_name, weight, 'true' if directed else 'false'))
+        rows += 1
+        if rows >= EXPORT_LINES_PER_CHUNK:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if rows:
+        yield buffer.getvalue()
+
+
+def _dimacs_weight(weight: float) -> str:
+    # Los lectores de DIMACS esperan enteros; los pesos fraccionarios se conservan
+    return str(int(weight)) if weight.is_integer() else repr(weight)
+
+
+def _dimacs_lines(graph: Graph) -> Iterator[str]:
+    counts = Edge.objects.filter(graph_id=graph.id).aggregate(
+        edges=Count('id'), undirected=Count('id', filter=Q(directed=False))
+    )
+    number_of = {
+        node_id: number
+        for number, node_id in enumerate(
+            Node.objects
+            .filter(graph_id=graph.id)
+            .order_by('name')
+            .values_list('id', flat=True)
+            .iterator(chunk_size=_loader_chunk_size()),
+            start=1
+        )
+    }
+
+    yield f"c {graph.name}\n"
+    yield "c nodos numerados por orden de nombre\n"
+    yield f"p sp {len(number_of)} {counts['edges'] + counts['undirected']}\n"
+    for from_id, to_id, weight, directed in iter_edge_rows(graph.id):
+        u = number_of.get(from_id)
+        v = number_of.get(to_id)
+        if u is None or v is None:
+            # Nodo creado después de numerar los nodos
+            continue
+        w = _dimacs_weight(weight)
+        yield f"a {u} {v} {w}\n"
+        if not directed:
+            yield f"a {v} {u} {w}\n"
+
+
+def iter_dimacs(graph: Graph) -> Iterator[str]:
+    return _chunked(_dimacs_lines(graph))
+
+
+def iter_graph_export(graph: Graph, export_format: str) -> Iterator[Union[str, memoryview]]:
+    """Trozos del grafo exportado en ``export_format`` (texto o bytes en binario)"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato no soportado: {export_format!r}")
+    return {
+        'ndjson': iter_ndjson,
+        'csv': iter_csv,
+        'dimacs': iter_dimacs,
+        'binary': iter_graph_binary,
+    }[export_format](graph)
+
+
+def export_filename(graph: Graph, export_format: str) -> str:
+    """Nombre de fichero para Content-Disposition"""
+    return f"{slugify(graph.name) or f'graph-{graph.id}'}.{EXPORT_EXTENSIONS[export_format]}"
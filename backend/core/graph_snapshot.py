@@ -0,0 +1,363 @@
+"""
+Instantánea compacta (CSR) de un grafo para los algoritmos
+
+Cada nodo recibe un índice entero denso (en el orden por nombre del modelo
+Node) y la adyacencia se guarda en tres buffers contiguos de ``array``:
+``offsets`` (int64, V + 1), ``targets`` (int32) y ``weights`` (float64),
+con una entrada por arista dirigida (las aristas no dirigidas aparecen en
+ambos sentidos). Los vecinos del nodo ``i`` son
+``targets[offsets[i]:offsets[i + 1]]``.
+
+También guarda las coordenadas de los nodos (``xs``/``ys``, NaN si faltan),
+que usa la heurística de A*.
+
+Las instantáneas se cachean en memoria por grafo y se reconstruyen solo
+cuando cambia ``Graph.version``. También se pueden leer de un grafo
+exportado en binario (core.graph_binary), con los buffers como
+``memoryview`` en lugar de ``array``; con ``GRAPH_SNAPSHOT_DIR``
+configurado, get_graph_snapshot las guarda y las lee así.
+"""
+
+import math
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import connections
+
+from .models import Graph, Node, Edge
+
+# Filas leídas por viaje a la base de datos al cargar un grafo
+DEFAULT_LOADER_CHUNK_SIZE = 10000
+
+
+class GraphSnapshot:
+    """Grafo de solo lectura con índices enteros y adyacencia CSR"""
+
+    __slots__ = (
+        'graph_id', 'version', 'node_ids', 'names', 'index_of',
+        'offsets', 'targets', 'weights', 'xs', 'ys',
+        '_reversed', '_heuristic_scale',
+    )
+
+    def __init__(
+        self,
+        graph_id: Optional[int],
+        version: int,
+        node_ids: Sequence[int],
+        names: List[str],
+        offsets: Sequence[int],
+        targets: Sequence[int],
+        weights: Sequence[float],
+        index_of: Optional[Dict[int, int]] = None,
+        xs: Optional[Sequence[float]] = None,
+        ys: Optional[Sequence[float]] = None,
+    ):
+        self.graph_id = graph_id
+        self.version = version
+        self.node_ids = node_ids
+        self.names = names
+        if index_of is None:
+            index_of = {node_id: index for index, node_id in enumerate(node_ids)}
+        self.index_of = index_of
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        if xs is None or ys is None:
+            xs = ys = array('d', [math.nan]) * len(node_ids)
+        self.xs = xs
+        self.ys = ys
+        self._reversed: Optional['GraphSnapshot'] = None
+        self._heuristic_scale: Optional[float] = None
+
+    def __getstate__(self):
+        # Las vistas sobre un grafo binario (ver graph_binary) no se pueden
+        # serializar: al enviarlas a otro proceso se copian a un array
+        state = {}
+        for slot in self.__slots__:
+            value = getattr(self, slot)
+            if isinstance(value, memoryview):
+                value = array(value.format, value.tobytes())
+            state[slot] = value
+        return state
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+
+    @classmethod
+    def build(
+        cls,
+        graph_id: Optional[int],
+        version: int,
+        nodes: Iterable[Tuple[int, str, Optional[float], Optional[float]]],
+        edges: Iterable[Tuple[int, int, float, bool]],
+    ) -> 'GraphSnapshot':
+        """
+        Construye la instantánea a partir de filas ``(id, nombre, x, y)`` y
+        ``(from_node_id, to_node_id, peso, dirigida)``.
+
+        Las aristas cuyo extremo no está entre los nodos se ignoran. El orden
+        relativo de las aristas de cada nodo se conserva (ordenación estable
+        por conteo), así que los recorridos son deterministas.
+        """
+        node_ids = array('q')
+        names: List[str] = []
+        xs = array('d')
+        ys = array('d')
+        for node_id, name, x, y in nodes:
+            node_ids.append(node_id)
+            names.append(name)
+            xs.append(math.nan if x is None else x)
+            ys.append(math.nan if y is None else y)
+        index_of = {node_id: index for index, node_id in enumerate(node_ids)}
+
+        sources = array('i')
+        dests = array('i')
+        edge_weights = array('d')
+        add_source = sources.append
+        add_dest = dests.append
+        add_weight = edge_weights.append
+        lookup = index_of.get
+        for from_id, to_id, weight, directed in edges:
+            from_index = lookup(from_id)
+            to_index = lookup(to_id)
+            if from_index is None or to_index is None:
+                continue
+            add_source(from_index)
+            add_dest(to_index)
+            add_weight(weight)
+            # Si la arista no es dirigida, agregar la arista inversa
+            if not directed:
+                add_source(to_index)
+                add_dest(from_index)
+                add_weight(weight)
+
+        nodes_count = len(node_ids)
+        offsets = array('q', bytes(8 * (nodes_count + 1)))
+        for source in sources:
+            offsets[source + 1] += 1
+        for index in range(nodes_count):
+            offsets[index + 1] += offsets[index]
+
+        edges_count = len(sources)
+        targets = array('i', bytes(4 * edges_count))
+        weights = array('d', bytes(8 * edges_count))
+        cursor = offsets[:nodes_count]
+        for source, dest, weight in zip(sources, dests, edge_weights):
+            position = cursor[source]
+            targets[position] = dest
+            weights[position] = weight
+            cursor[source] = position + 1
+
+        return cls(
+            graph_id, version, node_ids, names, offsets, targets, weights,
+            index_of=index_of, xs=xs, ys=ys,
+        )
+
+    @property
+    def nodes_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def arcs_count(self) -> int:
+        """Número de aristas dirigidas (las no dirigidas cuentan doble)"""
+        return len(self.targets)
+
+    def index(self, node_id: int) -> Optional[int]:
+        """Índice denso de un ID de nodo, o None si no pertenece al grafo"""
+        return self.index_of.get(node_id)
+
+    def neighbors(self, index: int) -> Iterator[Tuple[int, float]]:
+        """Itera los pares (vecino, peso) del nodo ``index``"""
+        targets = self.targets
+        weights = self.weights
+        for position in range(self.offsets[index], self.offsets[index + 1]):
+            yield targets[position], weights[position]
+
+    def reversed(self) -> 'GraphSnapshot':
+        """
+        Instantánea con todas las aristas invertidas (adyacencia de entrada)
+
+        Se construye la primera vez que se pide y queda asociada a esta
+        instantánea. Comparte nodos e índices con el grafo original.
+        """
+        if self._reversed is None:
+            nodes_count = self.nodes_count
+            offsets = self.offsets
+            targets = self.targets
+            weights = self.weights
+
+            reverse_offsets = array('q', bytes(8 * (nodes_count + 1)))
+            for target in targets:
+                reverse_offsets[target + 1] += 1
+            for index in range(nodes_count):
+                reverse_offsets[index + 1] += reverse_offsets[index]
+
+            reverse_targets = array('i', bytes(4 * len(targets)))
+            reverse_weights = array('d', bytes(8 * len(targets)))
+            cursor = reverse_offsets[:nodes_count]
+            for source in range(nodes_count):
+                for position in range(offsets[source], offsets[source + 1]):
+                    target = targets[position]
+                    reverse_position = cursor[target]
+                    reverse_targets[reverse_position] = source
+                    reverse_weights[reverse_position] = weights[position]
+                    cursor[target] = reverse_position + 1
+
+            reversed_snapshot = GraphSnapshot(
+                self.graph_id, self.version, self.node_ids, self.names,
+                reverse_offsets, reverse_targets, reverse_weights,
+                index_of=self.index_of, xs=self.xs, ys=self.ys,
+            )
+            reversed_snapshot._reversed = self
+            self._reversed = reversed_snapshot
+        return self._reversed
+
+    def heuristic_scale(self) -> float:
+        """
+        Factor para convertir distancia euclidiana en cota inferior del peso
+
+        Es el mínimo de ``peso / longitud`` sobre las aristas de longitud no
+        nula, así que ``escala * distancia_euclidiana(u, t)`` nunca supera el
+        coste real de ``u`` a ``t`` (heurística admisible y consistente).
+        Retorna 0.0 si algún nodo no tiene coordenadas o no hay aristas con
+        longitud, en cuyo caso A* no aporta nada sobre Dijkstra.
+        """
+        if self._heuristic_scale is None:
+            xs = self.xs
+            ys = self.ys
+            scale = 0.0
+            if not any(math.isnan(value) for value in xs) and not any(math.isnan(value) for value in ys):
+                scale = math.inf
+                offsets = self.offsets
+                targets = self.targets
+                weights = self.weights
+                for source in range(self.nodes_count):
+                    x = xs[source]
+                    y = ys[source]
+                    for position in range(offsets[source], offsets[source + 1]):
+                        target = targets[position]
+                        length = math.hypot(xs[target] - x, ys[target] - y)
+                        if length > 0:
+                            ratio = weights[position] / length
+                            if ratio < scale:
+                                scale = ratio
+                if scale == math.inf:
+                    scale = 0.0
+                # Margen para que el redondeo no vuelva inadmisible la heurística
+                scale *= 1 - 1e-9
+            self._heuristic_scale = scale
+        return self._heuristic_scale
+
+    def to_graph_dict(self) -> Dict[str, List[Tuple[str, float]]]:
+        """Adyacencia en el formato clásico {nodo_id: [(destino_id, peso), ...]}"""
+        ids = [str(node_id) for node_id in self.node_ids]
+        return {
+            ids[index]: [(ids[target], weight) for target, weight in self.neighbors(index)]
+            for index in range(self.nodes_count)
+        }
+
+
+def _loader_chunk_size() -> int:
+    return getattr(settings, 'GRAPH_LOADER_CHUNK_SIZE', DEFAULT_LOADER_CHUNK_SIZE)
+
+
+def iter_node_rows(graph_id: int) -> Iterator[Tuple[int, str, Optional[float], Optional[float]]]:
+    """
+    Filas ``(id, nombre, x, y)`` de los nodos del grafo, en orden por nombre
+
+    Una sola consulta leída por bloques; no se instancian modelos.
+    """
+    return (
+        Node.objects
+        .filter(graph_id=graph_id)
+        .order_by('name')
+        .values_list('id', 'name', 'x_position', 'y_position')
+        .iterator(chunk_size=_loader_chunk_size())
+    )
+
+
+def iter_edge_rows(graph_id: int) -> Iterator[Tuple[int, int, float, bool]]:
+    """
+    Filas ``(from_node_id, to_node_id, peso, dirigida)`` de las aristas del grafo
+
+    Se leen las claves foráneas crudas, sin cargar los nodos, en una sola
+    consulta. Se conserva el orden por nombre de origen y destino para que la
+    adyacencia resultante sea la misma que antes.
+
+    La consulta la genera el ORM, pero las filas se leen del cursor por
+    bloques con ``fetchmany``: así se evita el conversor por fila de
+    BooleanField (en SQLite ``directed`` llega como 0/1), que en grafos
+    grandes costaba más que la propia lectura.
+    """
+    queryset = (
+        Edge.objects
+        .filter(graph_id=graph_id)
+        .order_by('from_node__name', 'to_node__name')
+        .values_list('from_node_id', 'to_node_id', 'weight', 'directed')
+    )
+    sql, params = queryset.query.sql_with_params()
+    chunk_size = _loader_chunk_size()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+
+
+def load_graph_snapshot(graph: Graph) -> GraphSnapshot:
+    """
+    Carga desde la base de datos la instantánea de la versión actual del grafo
+
+    Usa exactamente dos consultas (nodos y aristas), independientemente del
+    tamaño del grafo, y vuelca las filas directamente en los buffers.
+    """
+    return GraphSnapshot.build(
+        graph.id, graph.version, iter_node_rows(graph.id), iter_edge_rows(graph.id)
+    )
+
+
+_snapshot_cache: 'OrderedDict[int, GraphSnapshot]' = OrderedDict()
+_snapshot_lock = threading.Lock()
+
+
+def get_graph_snapshot(graph: Graph) -> GraphSnapshot:
+    """
+    Obtiene la instantánea del grafo, reutilizando la cacheada si su versión
+    coincide con ``graph.version``. La caché es LRU y guarda como máximo
+    ``GRAPH_SNAPSHOT_CACHE_SIZE`` grafos. Si no está en memoria se lee del
+    fichero binario de ``GRAPH_SNAPSHOT_DIR`` (si está configurado) o de la
+    base de datos.
+    """
+    with _snapshot_lock:
+        snapshot = _snapshot_cache.get(graph.id)
+        if snapshot is not None and snapshot.version == graph.version:
+            _snapshot_cache.move_to_end(graph.id)
+            return snapshot
+
+    if getattr(settings, 'GRAPH_SNAPSHOT_DIR', None):
+        # Importación diferida: core.graph_binary importa este módulo
+        from .graph_binary import stored_snapshot
+        snapshot = stored_snapshot(graph)
+    else:
+        snapshot = load_graph_snapshot(graph)
+
+    with _snapshot_lock:
+        _snapshot_cache[graph.id] = snapshot
+        _snapshot_cache.move_to_end(graph.id)
+        max_size = getattr(settings, 'GRAPH_SNAPSHOT_CACHE_SIZE', 8)
+        while len(_snapshot_cache) > max_size:
+            _snapshot_cache.popitem(last=False)
+
+    return snapshot
+
+
+def clear_snapshot_cache():
+    """Vaciar la caché de instantáneas"""
+    with _snapshot_lock:
+        _snapshot_cache.clear()
@@ -0,0 +1,51 @@
+"""
+Exporta un grafo a un fichero NDJSON, CSV, DIMACS o binario
+
+    python manage.py export_graph 3 red.djkg
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.graph_export import EXPORT_EXTENSIONS, EXPORT_FORMATS, iter_graph_export
+from core.models import Graph
+
+
+class Command(BaseCommand):
+    help = 'Exporta un grafo completo (NDJSON, CSV, DIMACS o binario) sin cargarlo en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('graph', help='ID o nombre del grafo')
+        parser.add_argument('path', help='Fichero de salida')
+        parser.add_argument(
+            '--format', choices=EXPORT_FORMATS,
+            help='Formato de salida (por defecto, según la extensión)'
+        )
+
+    def handle(self, *args, **options):
+        export_format = options['format'] or next(
+            (
+                name for name, extension in EXPORT_EXTENSIONS.items()
+                if options['path'].lower().endswith('.' + extension)
+            ),
+            None
+        )
+        if export_format is None:
+            raise CommandError("No se pudo deducir el formato; use --format")
+
+        graph = (
+            Graph.objects.filter(pk=options['graph']).first() if options['graph'].isdigit() else None
+        ) or Graph.objects.filter(name=options['graph']).first()
+        if graph is None:
+            raise CommandError(f"No existe el grafo {options['graph']!r}")
+
+        written = 0
+        try:
+            with open(options['path'], 'wb') as target:
+                for chunk in iter_graph_export(graph, export_format):
+                    written += target.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        except OSError as e:
+            raise CommandError(f"No se pudo escribir el fichero: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Grafo {graph.name!r} exportado en {export_format} ({written:,} bytes)"
+        ))
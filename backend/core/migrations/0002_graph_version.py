@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='graph',
+            name='version',
+            field=models.PositiveBigIntegerField(default=1, editable=False, verbose_name='Versión'),
+        ),
+    ]
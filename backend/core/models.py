@@ -3,10 +3,61 @@ Modelos para la aplicación de grafos con algoritmo de Dijkstra
 Adaptados del proyecto Django original para servir como API REST
 """
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
 
 
+def _count_subquery(queryset, field: str):
+    """Subconsulta COUNT(*) correlacionada por ``field`` (0 si no hay filas)"""
+    counts = (
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+class GraphQuerySet(models.QuerySet):
+    """Consultas de grafos con los datos de los serializers precargados"""
+    
+    def with_counts(self):
+        """Anotar ``num_nodes`` y ``num_edges`` y precargar el nodo origen"""
+        return self.annotate(
+            num_nodes=_count_subquery(Node.objects.all(), 'graph'),
+            num_edges=_count_subquery(Edge.objects.all(), 'graph'),
+        ).prefetch_related(
+            Prefetch(
+                'nodes',
+                queryset=Node.objects.filter(is_source=True),
+                to_attr='source_nodes'
+            )
+        )
+    
+    def with_details(self):
+        """Precargar nodos (con sus conexiones) y aristas (con sus nodos)"""
+        return self.prefetch_related(
+            Prefetch('nodes', queryset=Node.objects.with_connections_count()),
+            Prefetch('edges', queryset=Edge.objects.select_related('from_node', 'to_node')),
+        )
+
+
+class NodeQuerySet(models.QuerySet):
+    """Consultas de nodos con los datos de los serializers precargados"""
+    
+    def with_connections_count(self):
+        """Anotar ``num_connections`` (aristas salientes + entrantes)"""
+        return self.annotate(
+            num_connections=(
+                _count_subquery(Edge.objects.all(), 'from_node')
+                + _count_subquery(Edge.objects.all(), 'to_node')
+            )
+        )
+
+
 class Graph(models.Model):
     """Modelo para manejar múltiples grafos en la base de datos"""
     name = models.CharField(max_length=100, unique=True, verbose_name="Nombre")
@@ -14,6 +65,9 @@ class Graph(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
     is_active = models.BooleanField(default=False, verbose_name="Grafo activo")
+    version = models.PositiveBigIntegerField(default=1, editable=False, verbose_name="Versión")
+    
+    objects = GraphQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
@@ -27,8 +81,25 @@ class Graph(models.Model):
         # Si este grafo se marca como activo, desactivar los demás
         if self.is_active:
             Graph.objects.exclude(pk=self.pk).update(is_active=False)
+        # La versión solo la incrementa bump_version; no sobrescribirla con
+        # un valor posiblemente desactualizado de esta instancia
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'version'
+            ]
         super().save(*args, **kwargs)
     
+    @classmethod
+    def bump_version(cls, *graph_ids):
+        """
+        Incrementar la versión de los grafos cuyos nodos o aristas cambiaron
+        
+        La versión solo crece; identifica el contenido del grafo en las ETag
+        y en las cachés de instantáneas y resultados.
+        """
+        cls.objects.filter(pk__in=graph_ids).update(version=F('version') + 1)
+    
     @classmethod
     def get_active_graph(cls):
         """Obtiene el grafo activo actual"""
@@ -36,17 +107,26 @@ class Graph(models.Model):
     
     @property
     def nodes_count(self):
-        """Cuenta los nodos del grafo"""
+        """Cuenta los nodos del grafo (anotación de with_counts si existe)"""
+        if hasattr(self, 'num_nodes'):
+            return self.num_nodes
+        # Con los nodos precargados count() no consulta la base de datos
         return self.nodes.count()
     
     @property
     def edges_count(self):
-        """Cuenta las aristas del grafo"""
+        """Cuenta las aristas del grafo (anotación de with_counts si existe)"""
+        if hasattr(self, 'num_edges'):
+            return self.num_edges
         return self.edges.count()
     
     @property
     def source_node(self):
-        """Obtiene el nodo fuente del grafo"""
+        """Obtiene el nodo fuente del grafo (de los nodos precargados si los hay)"""
+        if hasattr(self, 'source_nodes'):
+            return self.source_nodes[0] if self.source_nodes else None
+        if 'nodes' in getattr(self, '_prefetched_objects_cache', {}):
+            return next((node for node in self.nodes.all() if node.is_source), None)
         return self.nodes.filter(is_source=True).first()
 
 
@@ -64,6 +144,8 @@ class Node(models.Model):
     y_position = models.FloatField(null=True, blank=True, verbose_name="Posición Y")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de creación")
     
+    objects = NodeQuerySet.as_manager()
+    
     class Meta:
         unique_together = [['graph', 'name']]
         ordering = ['name']
@@ -75,16 +157,24 @@ class Node(models.Model):
     
     @property
     def connections_count(self):
-        """Contar total de conexiones del nodo"""
+        """Contar total de conexiones del nodo (anotación si existe)"""
+        if hasattr(self, 'num_connections'):
+            return self.num_connections
         outgoing = self.edges_from.count()
         incoming = self.edges_to.count()
         return outgoing + incoming
     
     def save(self, *args, **kwargs):
-        # Si este nodo se marca como origen, desmarcar los demás del mismo grafo
-        if self.is_source:
-            Node.objects.filter(graph=self.graph).exclude(pk=self.pk).update(is_source=False)
-        super().save(*args, **kwargs)
+        # El cambio y el incremento de versión (señal post_save) van juntos
+        with transaction.atomic():
+            # Si este nodo se marca como origen, desmarcar los demás del mismo grafo
+            if self.is_source:
+                Node.objects.filter(graph=self.graph).exclude(pk=self.pk).update(is_source=False)
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
 
 class Edge(models.Model):
@@ -131,7 +221,13 @@ class Edge(models.Model):
         if self.from_node and self.to_node:
             self.graph = self.from_node.graph
         self.clean()
-        super().save(*args, **kwargs)
+        # El cambio y el incremento de versión (señal post_save) van juntos
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
     
     def __str__(self):
         arrow = "→" if self.directed else "—"
@@ -0,0 +1,287 @@
+"""
+Ejecución en paralelo de tareas sobre una instantánea de grafo
+
+Cada proceso del pool recibe la instantánea una sola vez (en su
+inicializador) y la guarda como global de solo lectura; las tareas
+solo transportan sus argumentos y resultados.
+
+Cada proceso de Django mantiene unos pocos pools abiertos
+(``PARALLEL_POOL_CACHE_SIZE``), uno por instantánea (grafo y versión) y
+número de procesos, y los reutiliza entre peticiones; al pasar del máximo
+se cierra el usado hace más tiempo, y al pedir una versión nueva de un
+grafo se cierran los de sus versiones anteriores. Así ninguna petición
+arranca procesos propios, las peticiones sobre grafos distintos no se
+cierran el pool unas a otras y los trabajadores conservan lo que hayan
+calculado sobre el grafo.
+
+``PARALLEL_START_METHOD`` elige cómo se crean los procesos (``'fork'``,
+``'forkserver'`` o ``'spawn'``; por defecto, el de la plataforma).
+"""
+
+import multiprocessing
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, List, Optional
+
+from django.conf import settings
+
+# Contadores compartidos por pool, repartidos entre las llamadas de imap_on_snapshot
+PROGRESS_SLOTS = 1 << 16
+
+# Pools abiertos a la vez por proceso de Django
+DEFAULT_POOL_CACHE_SIZE = 2
+
+_worker_snapshot = None
+_worker_progress = None
+
+# Contadores de la tarea en curso en el proceso del pool (ver imap_on_snapshot)
+_worker_call_offset = None
+_worker_task_index = 0
+
+
+class _SharedPool:
+    """Pool de procesos de una instantánea y sus contadores compartidos"""
+
+    def __init__(self, snapshot, workers: int):
+        context = multiprocessing.get_context(getattr(settings, 'PARALLEL_START_METHOD', None))
+        self.snapshot = snapshot
+        self.workers = workers
+        self.progress = context.Array('q', PROGRESS_SLOTS, lock=False)
+        # Contadores ocupados por llamadas en curso (1) o libres (0)
+        self.used = bytearray(PROGRESS_SLOTS)
+        if context.get_start_method() != 'fork':
+            # Se deserializa en _init_worker, después de preparar Django
+            snapshot = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(snapshot, self.progress),
+        )
+
+    def allocate(self, count: int) -> Optional[int]:
+        """Reserva ``count`` contadores a cero (llamar con ``_pool_lock`` tomado)"""
+        offset = self.used.find(bytes(count))
+        if offset < 0:
+            return None
+        self.used[offset:offset + count] = b'\x01' * count
+        self.progress[offset:offset + count] = [0] * count
+        return offset
+
+    def release(self, offset: int, count: int):
+        with _pool_lock:
+            self.used[offset:offset + count] = bytes(count)
+
+
+_pools: 'OrderedDict[tuple, _SharedPool]' = OrderedDict()
+_pool_lock = threading.Lock()
+
+
+def _init_worker(snapshot, progress=None):
+    """
+    Inicializador de cada proceso: preparar Django y fijar la instantánea
+    (serializada con pickle si el proceso no se creó con "fork")
+    """
+    global _worker_snapshot, _worker_progress
+    from django.apps import apps
+    if not apps.ready:
+        # Con los métodos de arranque "spawn" y "forkserver" el hijo empieza vacío
+        import django
+        django.setup()
+    else:
+        # Con "fork" el hijo hereda las conexiones abiertas del padre: no compartirlas
+        from django.db import connections
+        connections.close_all()
+    if isinstance(snapshot, bytes):
+        snapshot = pickle.loads(snapshot)
+    _worker_snapshot = snapshot
+    _worker_progress = progress
+
+
+def get_worker_snapshot():
+    """Instantánea del proceso actual (solo válida dentro de una tarea del pool)"""
+    return _worker_snapshot
+
+
+def is_cancelled() -> bool:
+    """Indica si el proceso principal ya no necesita más resultados (ver imap_on_snapshot)"""
+    return _worker_call_offset is not None and _worker_progress[_worker_call_offset] != 0
+
+
+def report_progress(count: int):
+    """Publica cuántos resultados lleva la tarea actual (ver imap_on_snapshot)"""
+    if _worker_call_offset is not None:
+        _worker_progress[_worker_call_offset + 1 + _worker_task_index] = count
+
+
+def progress_before() -> int:
+    """Resultados publicados por las tareas anteriores a la actual en la misma llamada"""
+    if _worker_call_offset is None:
+        return 0
+    first = _worker_call_offset + 1
+    return sum(_worker_progress[first:first + _worker_task_index])
+
+
+def _run_tracked(task: Callable, offset: Optional[int], index: int, block):
+    """Ejecuta ``task(block)`` con los contadores de su llamada"""
+    global _worker_call_offset, _worker_task_index
+    _worker_call_offset = offset
+    _worker_task_index = index
+    try:
+        return task(block)
+    finally:
+        _worker_call_offset = None
+
+
+def default_workers() -> int:
+    """Número de procesos a usar (``PARALLEL_WORKERS`` o todos los núcleos)"""
+    return getattr(settings, 'PARALLEL_WORKERS', None) or os.cpu_count() or 1
+
+
+def _pool_key(snapshot, workers: int) -> tuple:
+    """Grafo, versión y procesos (o la propia instantánea si no es de un grafo guardado)"""
+    if snapshot.graph_id is None:
+        # El pool conserva la instantánea, así que su id() no se reutiliza mientras exista
+        return (None, id(snapshot), workers)
+    return (snapshot.graph_id, snapshot.version, workers)
+
+
+def _discard_pool(key: tuple):
+    """Cierra el pool de ``key`` (llamar con ``_pool_lock`` tomado)"""
+    # Las tareas ya enviadas por otras peticiones terminan igualmente
+    _pools.pop(key).executor.shutdown(wait=False)
+
+
+def _snapshot_pool(snapshot, workers: int) -> _SharedPool:
+    """Pool compartido para ``snapshot`` (llamar con ``_pool_lock`` tomado)"""
+    key = _pool_key(snapshot, workers)
+    pool = _pools.get(key)
+    if pool is not None:
+        _pools.move_to_end(key)
+        return pool
+
+    if snapshot.graph_id is not None:
+        # Las versiones anteriores del grafo ya no se van a pedir
+        for old_key in [k for k in _pools if k[0] == snapshot.graph_id and k[1] < snapshot.version]:
+            _discard_pool(old_key)
+    max_pools = max(1, getattr(settings, 'PARALLEL_POOL_CACHE_SIZE', DEFAULT_POOL_CACHE_SIZE))
+    while len(_pools) >= max_pools:
+        _discard_pool(next(iter(_pools)))
+
+    pool = _pools[key] = _SharedPool(snapshot, workers)
+    return pool
+
+
+def shutdown_pool():
+    """Cierra todos los pools (se vuelven a crear en la siguiente llamada)"""
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    # Sin el cerrojo: las tareas que terminan liberan sus contadores con él
+    for pool in pools:
+        pool.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _submit_all(snapshot, calls: Callable, count: int, workers: Optional[int]) -> tuple:
+    """
+    Reserva ``count`` contadores en el pool de ``snapshot``, le envía las
+    tareas ``(función, *argumentos)`` que genera ``calls(offset)`` y retorna
+    ``(pool, offset, futures)``; ``offset`` es None si no se pidieron
+    contadores o no quedan libres
+    """
+    workers = workers or default_workers()
+    with _pool_lock:
+        for attempt in range(2):
+            pool = _snapshot_pool(snapshot, workers)
+            offset = pool.allocate(count) if count else None
+            try:
+                return pool, offset, [pool.executor.submit(*call) for call in calls(offset)]
+            except BrokenProcessPool:
+                # Un proceso murió: descartar el pool y reintentar con uno nuevo
+                if attempt:
+                    raise
+                _discard_pool(_pool_key(snapshot, workers))
+
+
+def chunked(items: list, chunks: int) -> list:
+    """Divide ``items`` en como mucho ``chunks`` bloques contiguos"""
+    chunks = max(1, min(chunks, len(items)))
+    size, extra = divmod(len(items), chunks)
+    blocks = []
+    start = 0
+    for index in range(chunks):
+        end = start + size + (1 if index < extra else 0)
+        blocks.append(items[start:end])
+        start = end
+    return blocks
+
+
+def map_on_snapshot(snapshot, task: Callable, blocks: list, workers: Optional[int] = None) -> list:
+    """
+    Ejecuta ``task(bloque)`` para cada bloque en el pool y retorna los
+    resultados en el mismo orden. ``task`` debe ser una función de módulo
+    que obtenga el grafo con get_worker_snapshot().
+    """
+    _, _, futures = _submit_all(
+        snapshot, lambda offset: [(task, block) for block in blocks], 0, workers
+    )
+    return [future.result() for future in futures]
+
+
+def imap_on_snapshot(snapshot, task: Callable, blocks: list, workers: Optional[int] = None) -> Iterator:
+    """
+    Como map_on_snapshot, pero genera los resultados en orden a medida que
+    están listos.
+
+    Las tareas de una llamada comparten contadores: cada una publica cuántos
+    resultados lleva con report_progress() y puede consultar con
+    progress_before() cuántos han publicado las anteriores, para no producir
+    más de los que se van a usar. Al cerrar el generador antes de terminar
+    se cancelan las tareas pendientes y se avisa a las que están en curso,
+    que deben consultar is_cancelled() para detenerse antes. Si no quedan
+    contadores libres las tareas se ejecutan sin ellos (progress_before()
+    da 0 e is_cancelled() False).
+    """
+    count = len(blocks) + 1
+    pool, offset, futures = _submit_all(
+        snapshot,
+        lambda offset: [
+            (_run_tracked, task, offset, index, block) for index, block in enumerate(blocks)
+        ],
+        count,
+        workers
+    )
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        if offset is not None:
+            # El primer contador de la llamada indica la cancelación; las
+            # tareas que sigan en curso lo ven hasta que terminan, y los
+            # contadores se liberan cuando termina la última
+            pool.progress[offset] = 1
+            _release_when_done(pool, offset, count, futures)
+
+
+def _release_when_done(pool: _SharedPool, offset: int, count: int, futures: List):
+    """Libera los contadores de una llamada cuando no quedan tareas suyas en curso"""
+    pending = [len(futures)]
+    lock = threading.Lock()
+
+    def task_done(_):
+        with lock:
+            pending[0] -= 1
+            last = pending[0] == 0
+        if last:
+            pool.release(offset, count)
+
+    if not futures:
+        pool.release(offset, count)
+    for future in futures:
+        future.add_done_callback(task_done)
@@ -0,0 +1,351 @@
+"""
+Conteo de caminos simples y estadísticas de distancia sin enumerarlos
+
+Para cada nodo se agrega la información de todos sus caminos hacia el
+destino en una tupla ``(número, suma, suma de cuadrados, mínima,
+caminos con la mínima, máxima)``, de modo que nunca se construye ningún
+camino. Se elige la estrategia según la forma del subgrafo relevante
+(nodos alcanzables desde el inicio que pueden llegar al destino dentro de
+``max_depth``):
+
+* ``dag``: si el subgrafo no tiene ciclos todo recorrido es un camino
+  simple y basta una programación dinámica en orden topológico (por
+  capas de profundidad si ``max_depth`` recorta caminos).
+* ``bitmask``: con ciclos y pocos nodos, programación dinámica memorizada
+  por (nodo, conjunto de nodos ya usados).
+* ``dfs``: en el resto de casos, o con ``max_distance``/``max_stretch``,
+  el DFS podado de algorithms.iter_simple_paths, agregando al vuelo y con
+  un máximo de ``count_limit`` caminos (``ALL_PATHS_COUNT_LIMIT`` por
+  defecto). Si se alcanza, el número exacto no se conoce: el resultado
+  lleva ``count_limited``, ``paths_count`` nulo y una cota inferior en
+  ``paths_count_lower_bound``, y las estadísticas cubren solo los caminos
+  contados.
+"""
+
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .algorithms import (
+    DISTANCE_TOLERANCE, ComputationContext, distance_limit, iter_simple_paths
+)
+from .graph_snapshot import GraphSnapshot
+from .models import Graph, Node
+
+COUNT_ONLY_MODE = 'count_only'
+
+# Máximo de nodos relevantes para la programación dinámica por máscara de bits
+BITMASK_MAX_NODES = 16
+
+# Caminos que el DFS de respaldo cuenta como máximo (por defecto y tope por petición)
+DEFAULT_COUNT_LIMIT = 100_000
+MAX_COUNT_LIMIT = 1_000_000
+
+# (número, suma, suma de cuadrados, mínima, caminos con la mínima, máxima)
+PathStats = Tuple[int, float, float, float, int, float]
+
+# Agregado del camino vacío que empieza y termina en el destino
+DESTINATION_STATS: PathStats = (1, 0.0, 0.0, 0.0, 1, 0.0)
+
+
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) <= DISTANCE_TOLERANCE * max(1.0, abs(a), abs(b))
+
+
+def _shift(stats: PathStats, weight: float) -> PathStats:
+    """Agregado de los mismos caminos precedidos por una arista de peso ``weight``"""
+    count, total, total_sq, low, low_count, high = stats
+    return (
+        count,
+        total + weight * count,
+        total_sq + 2 * weight * total + weight * weight * count,
+        low + weight,
+        low_count,
+        high + weight,
+    )
+
+
+def _merge(a: Optional[PathStats], b: Optional[PathStats]) -> Optional[PathStats]:
+    """Agregado de la unión de dos conjuntos disjuntos de caminos"""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    if _close(a[3], b[3]):
+        low, low_count = min(a[3], b[3]), a[4] + b[4]
+    elif a[3] < b[3]:
+        low, low_count = a[3], a[4]
+    else:
+        low, low_count = b[3], b[4]
+    return (a[0] + b[0], a[1] + b[1], a[2] + b[2], low, low_count, max(a[5], b[5]))
+
+
+def _relevant_subgraph(
+    snapshot: GraphSnapshot, start: int, end: int, hops: List[int], max_depth: int
+) -> Tuple[List[int], Dict[int, List[Tuple[int, float]]]]:
+    """
+    Nodos que pueden formar parte de algún camino de ``start`` a ``end`` con
+    como mucho ``max_depth`` nodos, y sus aristas útiles: no se sale del
+    destino ni se vuelve al inicio.
+    Retorna: (nodos, {nodo: [(vecino, peso), ...]})
+    """
+    max_arcs = max_depth - 1
+    depth = {start: 0}
+    frontier = [start]
+    while frontier:
+        next_frontier = []
+        for node in frontier:
+            if node == end:
+                continue
+            for neighbor, _ in snapshot.neighbors(node):
+                if neighbor not in depth and depth[node] + 1 + hops[neighbor] <= max_arcs:
+                    depth[neighbor] = depth[node] + 1
+                    next_frontier.append(neighbor)
+        frontier = next_frontier
+
+    nodes = [node for node in depth if depth[node] + hops[node] <= max_arcs]
+    relevant = set(nodes)
+    arcs = {
+        node: [
+            (neighbor, weight)
+            for neighbor, weight in snapshot.neighbors(node)
+            if neighbor in relevant and neighbor != start
+        ] if node != end else []
+        for node in nodes
+    }
+    return nodes, arcs
+
+
+def _topological_order(nodes: List[int], arcs: Dict[int, List[Tuple[int, float]]]) -> Optional[List[int]]:
+    """Orden topológico (Kahn) o None si hay ciclos"""
+    indegree = {node: 0 for node in nodes}
+    for node in nodes:
+        for neighbor, _ in arcs[node]:
+            indegree[neighbor] += 1
+    order = [node for node in nodes if indegree[node] == 0]
+    for node in order:
+        for neighbor, _ in arcs[node]:
+            indegree[neighbor] -= 1
+            if indegree[neighbor] == 0:
+                order.append(neighbor)
+    return order if len(order) == len(nodes) else None
+
+
+def _dag_stats(
+    order: List[int], arcs: Dict[int, List[Tuple[int, float]]], start: int, end: int, max_depth: int
+) -> Optional[PathStats]:
+    """Programación dinámica en orden topológico inverso (por capas si hace falta)"""
+    # Máximo de aristas hasta el destino: si cabe en max_depth no hay que contar capas
+    longest = {}
+    for node in reversed(order):
+        reachable = [longest[neighbor] for neighbor, _ in arcs[node] if neighbor in longest]
+        if node == end:
+            longest[node] = 0
+        elif reachable:
+            longest[node] = 1 + max(reachable)
+
+    if longest.get(start, 0) <= max_depth - 1:
+        stats = {end: DESTINATION_STATS}
+        for node in reversed(order):
+            if node == end:
+                continue
+            aggregate = None
+            for neighbor, weight in arcs[node]:
+                if neighbor in stats:
+                    aggregate = _merge(aggregate, _shift(stats[neighbor], weight))
+            if aggregate is not None:
+                stats[node] = aggregate
+        return stats.get(start)
+
+    # Capa h: caminos con como mucho h aristas hasta el destino
+    layer = {end: DESTINATION_STATS}
+    for _ in range(max_depth - 1):
+        next_layer = {end: DESTINATION_STATS}
+        for node in order:
+            if node == end:
+                continue
+            aggregate = None
+            for neighbor, weight in arcs[node]:
+                if neighbor in layer:
+                    aggregate = _merge(aggregate, _shift(layer[neighbor], weight))
+            if aggregate is not None:
+                next_layer[node] = aggregate
+        layer = next_layer
+    return layer.get(start)
+
+
+def _bitmask_stats(
+    nodes: List[int], arcs: Dict[int, List[Tuple[int, float]]], start: int, end: int,
+    hops: List[int], max_depth: int
+) -> Optional[PathStats]:
+    """Programación dinámica memorizada por (nodo, máscara de nodos usados)"""
+    local = {node: bit for bit, node in enumerate(nodes)}
+    memo: Dict[Tuple[int, int], Optional[PathStats]] = {}
+
+    def walk(node: int, mask: int, used: int) -> Optional[PathStats]:
+        if node == end:
+            return DESTINATION_STATS
+        key = (node, mask)
+        if key in memo:
+            return memo[key]
+        aggregate = None
+        for neighbor, weight in arcs[node]:
+            bit = 1 << local[neighbor]
+            # ``used`` nodos en el camino: el vecino y su resto deben caber en max_depth
+            if mask & bit or used + 1 + hops[neighbor] > max_depth:
+                continue
+            suffix = walk(neighbor, mask | bit, used + 1)
+            if suffix is not None:
+                aggregate = _merge(aggregate, _shift(suffix, weight))
+        memo[key] = aggregate
+        return aggregate
+
+    return walk(start, 1 << local[start], 1)
+
+
+def _dfs_stats(
+    snapshot: GraphSnapshot, start: int, end: int, max_depth: int, limit: float,
+    bounds: Tuple[List[float], List[int]], count_limit: int
+) -> Tuple[Optional[PathStats], bool]:
+    """
+    Agregado por enumeración podada (sin materializar resultados)
+    Retorna: (estadísticas, hay más caminos que count_limit)
+    """
+    aggregate = None
+    count = 0
+    for distance, _ in iter_simple_paths(snapshot, start, end, max_depth, limit, bounds):
+        if count >= count_limit:
+            return aggregate, True
+        count += 1
+        aggregate = _merge(aggregate, (1, distance, distance * distance, distance, 1, distance))
+    return aggregate, False
+
+
+def count_paths(
+    graph: Graph,
+    start_node: Node,
+    end_node: Node,
+    max_depth: int = 20,
+    max_distance: Optional[float] = None,
+    max_stretch: Optional[float] = None,
+    context: Optional[ComputationContext] = None,
+    count_limit: Optional[int] = None
+) -> Dict:
+    """
+    Cuenta los caminos simples entre dos nodos (con como mucho ``max_depth``
+    nodos) y calcula sus estadísticas de distancia sin construirlos
+
+    Las estadísticas son las mismas que AllPathsViewSet calcula a partir de
+    una lista completa de caminos (mínima, máxima, media, caminos óptimos y
+    varianza respecto al óptimo de Dijkstra). ``context`` permite reutilizar
+    las búsquedas de la petición (ver ComputationContext). ``count_limit``
+    acota los caminos que enumera el DFS de respaldo (por defecto
+    ``ALL_PATHS_COUNT_LIMIT``).
+    """
+    start_time = time.time()
+    if context is None:
+        context = ComputationContext(graph, start_node, end_node)
+    snapshot = context.snapshot
+
+    start = context.start
+    end = context.end
+
+    if start is None or end is None:
+        return {
+            'start_node': start_node.name,
+            'end_node': end_node.name,
+            'mode': COUNT_ONLY_MODE,
+            'paths_count': 0,
+            'success': False,
+            'message': 'Nodos no encontrados en el grafo',
+            'execution_time': time.time() - start_time
+        }
+
+    shortest_distance = context.dijkstra().get('total_distance')
+
+    bounds = context.bounds()
+    limit = distance_limit(bounds[0][start], max_distance, max_stretch)
+    if count_limit is None:
+        count_limit = getattr(settings, 'ALL_PATHS_COUNT_LIMIT', DEFAULT_COUNT_LIMIT)
+    count_limited = False
+
+    hops = bounds[1]
+    if start == end or 1 + hops[start] > max_depth:
+        # Caso trivial: solo el camino vacío, o ningún camino cabe en max_depth
+        method = 'dag'
+        stats = DESTINATION_STATS if start == end else None
+    elif limit < math.inf:
+        # Con límite de distancia el agregado depende del prefijo: enumerar
+        method = 'dfs'
+        stats, count_limited = _dfs_stats(snapshot, start, end, max_depth, limit, bounds, count_limit)
+    else:
+        nodes, arcs = _relevant_subgraph(snapshot, start, end, hops, max_depth)
+        order = _topological_order(nodes, arcs)
+        if order is not None:
+            method = 'dag'
+            stats = _dag_stats(order, arcs, start, end, max_depth)
+        elif len(nodes) <= BITMASK_MAX_NODES:
+            method = 'bitmask'
+            stats = _bitmask_stats(nodes, arcs, start, end, hops, max_depth)
+        else:
+            method = 'dfs'
+            stats, count_limited = _dfs_stats(snapshot, start, end, max_depth, limit, bounds, count_limit)
+
+    counted = stats[0] if stats is not None else 0
+    success = counted > 0
+    # Con el conteo detenido solo se sabe que hay más caminos que los contados
+    paths_count = None if count_limited else counted
+    paths_count_lower_bound = counted + 1 if count_limited else counted
+
+    statistics = None
+    if success:
+        count, total, total_sq, low, low_count, high = stats
+        optimal_count = 0
+        distance_variance = 0
+        if shortest_distance is not None:
+            if _close(low, shortest_distance):
+                optimal_count = low_count
+            # Varianza respecto al óptimo: E[(d - o)²] = E[d²] - 2·o·E[d] + o²
+            distance_variance = max(
+                0.0,
+                total_sq / count - 2 * shortest_distance * total / count
+                + shortest_distance * shortest_distance
+            )
+        statistics = {
+            'shortest_distance': low,
+            'longest_distance': high,
+            'average_distance': total / count,
+            'optimal_paths_count': optimal_count,
+            'dijkstra_distance': shortest_distance,
+            'distance_variance': distance_variance
+        }
+        if count_limited:
+            message = (
+                f"Hay más de {counted} caminos entre {start_node.name} y {end_node.name}"
+                f" (conteo detenido en {counted} caminos)"
+            )
+        else:
+            message = f"Hay {paths_count} caminos entre {start_node.name} y {end_node.name}"
+    else:
+        message = f"No se encontraron caminos entre {start_node.name} y {end_node.name}"
+
+    return {
+        'start_node': start_node.name,
+        'end_node': end_node.name,
+        'mode': COUNT_ONLY_MODE,
+        'method': method,
+        'paths_count': paths_count,
+        'paths_count_lower_bound': paths_count_lower_bound,
+        'count_limited': count_limited,
+        'success': success,
+        'message': message,
+        'statistics': statistics,
+        'execution_time': time.time() - start_time,
+        'search_limits': {
+            'max_depth': max_depth,
+            'max_distance': limit if limit < math.inf else None,
+            'count_limit': count_limit,
+        }
+    }
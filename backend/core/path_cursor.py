@@ -0,0 +1,62 @@
+"""
+Cursores para continuar la enumeración de caminos entre peticiones
+
+El cursor es un token opaco firmado (django.core.signing) con el estado de
+la búsqueda, así que no se guarda nada en el servidor:
+
+* modo ``'all'``: la pila del DFS como posiciones de adyacencia por nivel
+  (de ella se reconstruyen el camino y las distancias acumuladas);
+* modo ``'k_shortest'``: el montículo de candidatos del algoritmo de Yen
+  (no hace falta guardar los caminos ya emitidos).
+
+Los índices de nodo solo son válidos para una versión concreta del grafo,
+por eso el cursor guarda la consulta completa, incluida ``Graph.version``.
+"""
+
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core import signing
+
+CURSOR_SALT = 'core.all-paths-cursor'
+
+# Validez de un cursor en segundos
+DEFAULT_CURSOR_MAX_AGE = 60 * 60
+
+
+def cursor_query(
+    graph_id: int,
+    version: int,
+    start_node_id: int,
+    end_node_id: int,
+    mode: str,
+    max_depth: int,
+    max_distance: Optional[float],
+    max_stretch: Optional[float]
+) -> List:
+    """Parámetros de la búsqueda que un cursor debe repetir para ser válido"""
+    return [
+        graph_id, version, start_node_id, end_node_id,
+        mode, max_depth, max_distance, max_stretch,
+    ]
+
+
+def encode_cursor(query: List, offset: int, state) -> str:
+    """Token firmado con la consulta, los caminos ya devueltos y el estado"""
+    return signing.dumps(
+        {'q': query, 'n': offset, 's': state},
+        salt=CURSOR_SALT,
+        compress=True,
+    )
+
+
+def decode_cursor(token: str) -> Dict:
+    """
+    Contenido de un cursor: ``{'q': consulta, 'n': caminos ya devueltos,
+    's': estado}``. Lanza ValueError si la firma no es válida o caducó.
+    """
+    max_age = getattr(settings, 'ALL_PATHS_CURSOR_MAX_AGE', DEFAULT_CURSOR_MAX_AGE)
+    try:
+        return signing.loads(token, salt=CURSOR_SALT, max_age=max_age)
+    except signing.BadSignature:
+        raise ValueError('El cursor no es válido o ha caducado')
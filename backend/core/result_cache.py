@@ -0,0 +1,252 @@
+"""
+Caché de resultados de caminos más cortos
+
+Las entradas se indexan por ``(graph_id, Graph.version, ...)``: cualquier
+cambio en los nodos o aristas incrementa la versión, así que las entradas
+antiguas dejan de consultarse y terminan expulsadas por LRU.
+
+Se guardan dos tipos de entrada:
+
+* Árboles completos ``(distances, previous)`` por nodo de inicio; cualquier
+  consulta posterior desde ese nodo se responde recorriendo predecesores.
+* Resultados puntuales ``(distancia, camino)`` por algoritmo y par
+  inicio/destino, calculados con salida anticipada.
+
+El almacenamiento se configura con ``DIJKSTRA_RESULT_CACHE``: ``'local'``
+(LRU en memoria del proceso, limitada por entradas y bytes) o ``'django'``
+(cualquier backend del framework de caché, p. ej. locmem o file-based). En
+este caso las claves llevan el prefijo ``KEY_PREFIX`` y una generación, de
+modo que vaciar la caché de resultados no toca el resto de claves del alias.
+"""
+
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_CACHE_SETTINGS = {
+    'BACKEND': 'local',
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'dijkstra',
+    'MAX_ENTRIES': 1024,
+    'MAX_BYTES': 64 * 1024 * 1024,
+    'TIMEOUT': None,
+}
+
+Tree = Tuple[array, array]
+PointResult = Tuple[float, List[int]]
+
+
+class LocalLRUBackend:
+    """LRU en memoria del proceso, limitada por número de entradas y bytes"""
+
+    name = 'local'
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: 'OrderedDict[tuple, object]' = OrderedDict()
+        self.sizes: Dict[tuple, int] = {}
+        self.latest_versions: Dict[int, int] = {}
+        self.total_bytes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: tuple, value, size: int):
+        if size > self.max_bytes:
+            return
+        graph_id, version = key[0], key[1]
+        with self.lock:
+            # Una versión nueva del grafo vuelve inútiles las anteriores
+            if self.latest_versions.get(graph_id, version) < version:
+                for old_key in [k for k in self.entries if k[0] == graph_id and k[1] < version]:
+                    self._discard(old_key)
+            self.latest_versions[graph_id] = max(version, self.latest_versions.get(graph_id, version))
+
+            if key in self.entries:
+                self._discard(key)
+            self.entries[key] = value
+            self.sizes[key] = size
+            self.total_bytes += size
+
+            while self.entries and (
+                len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes
+            ):
+                oldest_key = next(iter(self.entries))
+                self._discard(oldest_key)
+                self.evictions += 1
+
+    def _discard(self, key: tuple):
+        del self.entries[key]
+        self.total_bytes -= self.sizes.pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.latest_versions.clear()
+            self.total_bytes = 0
+
+    def info(self) -> Dict:
+        return {
+            'entries': len(self.entries),
+            'bytes': self.total_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+        }
+
+
+class DjangoCacheBackend:
+    """
+    Adaptador sobre el framework de caché de Django
+
+    La expulsión la hace el propio backend (MAX_ENTRIES/CULL_FREQUENCY en
+    ``CACHES``); no se necesita ningún servicio externo con locmem o file-based.
+
+    El alias puede ser compartido con el resto del proyecto: las claves son
+    ``<prefijo>:<generación>:...`` y clear() solo incrementa la generación
+    (guardada en la propia caché, así que vale para todos los procesos). Las
+    entradas de generaciones anteriores dejan de leerse y el backend las
+    expulsa como a cualquier otra.
+    """
+
+    name = 'django'
+
+    def __init__(self, alias: str, timeout: Optional[int], key_prefix: str = 'dijkstra'):
+        self.cache = caches[alias]
+        self.alias = alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+        self.generation_key = f'{key_prefix}:generation'
+
+    def _generation(self) -> int:
+        generation = self.cache.get(self.generation_key)
+        if generation is None:
+            self.cache.add(self.generation_key, 1, None)
+            generation = self.cache.get(self.generation_key, 1)
+        return generation
+
+    def _make_key(self, key: tuple) -> str:
+        return f'{self.key_prefix}:{self._generation()}:' + ':'.join(str(part) for part in key)
+
+    def get(self, key: tuple):
+        return self.cache.get(self._make_key(key))
+
+    def set(self, key: tuple, value, size: int):
+        self.cache.set(self._make_key(key), value, self.timeout)
+
+    def clear(self):
+        # Solo el espacio de nombres de los resultados, no todo el alias
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:
+            self.cache.set(self.generation_key, 2, None)
+
+    def info(self) -> Dict:
+        return {
+            'cache_alias': self.alias,
+            'key_prefix': self.key_prefix,
+            'generation': self._generation(),
+        }
+
+
+class ShortestPathCache:
+    """Caché de árboles y resultados puntuales con contadores de aciertos/fallos"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _count(self, hit: bool):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_tree(self, graph_id: int, version: int, source: int) -> Optional[Tree]:
+        tree = self.backend.get((graph_id, version, 'tree', source))
+        self._count(tree is not None)
+        return tree
+
+    def set_tree(self, graph_id: int, version: int, source: int,
+                 distances: List[float], previous: List[int]):
+        tree = (array('d', distances), array('i', previous))
+        size = sum(part.itemsize * len(part) for part in tree)
+        self.backend.set((graph_id, version, 'tree', source), tree, size)
+
+    def get_path(self, graph_id: int, version: int, source: int, target: int,
+                 algorithm: str = 'dijkstra') -> Tuple[Optional[Tree], Optional[PointResult]]:
+        """
+        Busca una consulta puntual: primero el árbol completo del origen y,
+        si no existe, el resultado puntual de ese algoritmo. Cuenta un único
+        acierto o fallo.
+        Retorna (árbol, resultado_puntual); a lo sumo uno no es None.
+        """
+        tree = self.backend.get((graph_id, version, 'tree', source))
+        point = None
+        if tree is None:
+            point = self.backend.get((graph_id, version, 'point', algorithm, source, target))
+        self._count(tree is not None or point is not None)
+        return tree, point
+
+    def set_point(self, graph_id: int, version: int, source: int, target: int,
+                  distance: float, path: List[int], algorithm: str = 'dijkstra'):
+        self.backend.set(
+            (graph_id, version, 'point', algorithm, source, target),
+            (distance, path),
+            8 + 8 * len(path)
+        )
+
+    def clear(self):
+        self.backend.clear()
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            **self.backend.info(),
+        }
+
+
+_result_cache: Optional[ShortestPathCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ShortestPathCache:
+    """Caché global del proceso, creada según ``DIJKSTRA_RESULT_CACHE``"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                options = {
+                    **DEFAULT_CACHE_SETTINGS,
+                    **getattr(settings, 'DIJKSTRA_RESULT_CACHE', {}),
+                }
+                if options['BACKEND'] == 'django':
+                    backend = DjangoCacheBackend(
+                        options['CACHE_ALIAS'], options['TIMEOUT'], options['KEY_PREFIX']
+                    )
+                else:
+                    backend = LocalLRUBackend(options['MAX_ENTRIES'], options['MAX_BYTES'])
+                _result_cache = ShortestPathCache(backend)
+    return _result_cache
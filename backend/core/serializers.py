@@ -4,6 +4,14 @@ Serializers para la API REST de grafos con algoritmo de Dijkstra
 
 from rest_framework import serializers
 from .models import Graph, Node, Edge
+from .algorithms import (
+    PATH_SEARCH_MODES, POINT_TO_POINT_SEARCHES, TRACE_FORMATS, full_trace_max_nodes
+)
+from .distance_matrix import METHODS as MATRIX_METHODS
+from .graph_export import EXPORT_FORMATS
+from .graph_import import IMPORT_FORMATS, detect_format
+from .path_counting import COUNT_ONLY_MODE, MAX_COUNT_LIMIT
+from .path_cursor import cursor_query, decode_cursor
 
 
 class NodeSerializer(serializers.ModelSerializer):
@@ -45,11 +53,11 @@ class GraphDetailSerializer(serializers.ModelSerializer):
         model = Graph
         fields = [
             'id', 'name', 'description', 'created_at', 'updated_at', 
-            'is_active', 'nodes', 'edges', 'nodes_count', 'edges_count', 
+            'is_active', 'version', 'nodes', 'edges', 'nodes_count', 'edges_count', 
             'source_node'
         ]
         read_only_fields = [
-            'id', 'created_at', 'updated_at', 'nodes', 'edges', 
+            'id', 'created_at', 'updated_at', 'version', 'nodes', 'edges', 
             'nodes_count', 'edges_count', 'source_node'
         ]
 
@@ -64,72 +72,181 @@ class GraphSerializer(serializers.ModelSerializer):
         model = Graph
         fields = [
             'id', 'name', 'description', 'created_at', 'updated_at', 
-            'is_active', 'nodes_count', 'edges_count', 'source_node_name'
+            'is_active', 'version', 'nodes_count', 'edges_count', 'source_node_name'
         ]
         read_only_fields = [
-            'id', 'created_at', 'updated_at', 'nodes_count', 
+            'id', 'created_at', 'updated_at', 'version', 'nodes_count', 
             'edges_count', 'source_node_name'
         ]
 
 
-class DijkstraRequestSerializer(serializers.Serializer):
+class GraphImportRequestSerializer(serializers.Serializer):
+    """Serializer para importaciones masivas de grafos"""
+    name = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    format = serializers.ChoiceField(choices=list(IMPORT_FORMATS), required=False)
+    file = serializers.FileField(required=False)
+    data = serializers.JSONField(required=False)
+    
+    def validate_name(self, value):
+        """Validar que no existe otro grafo con el mismo nombre"""
+        if Graph.objects.filter(name=value).exists():
+            raise serializers.ValidationError("Ya existe un grafo con ese nombre")
+        return value
+    
+    def validate(self, data):
+        """Exactamente una fuente (fichero o datos) y un formato conocido"""
+        if ('file' in data) == ('data' in data):
+            raise serializers.ValidationError("Indique 'file' o 'data' (solo uno)")
+        
+        if 'format' not in data:
+            detected = detect_format(data['file'].name) if 'file' in data else None
+            if detected is None and 'data' in data and isinstance(data['data'], dict):
+                detected = 'json'
+            if detected is None:
+                raise serializers.ValidationError({
+                    'format': "No se pudo deducir el formato; indique 'format'"
+                })
+            data['format'] = detected
+        
+        if 'data' in data and data['format'] == 'binary':
+            raise serializers.ValidationError({
+                'data': "El formato binario solo se acepta como fichero ('file')"
+            })
+        
+        if 'data' in data and data['format'] != 'json' and not isinstance(data['data'], str):
+            raise serializers.ValidationError({
+                'data': "En formato NDJSON, CSV o DIMACS 'data' debe ser texto"
+            })
+        return data
+
+
+class GraphImportResultSerializer(serializers.Serializer):
+    """Serializer para el informe de una importación"""
+    graph_id = serializers.IntegerField()
+    graph_name = serializers.CharField()
+    format = serializers.CharField()
+    nodes_created = serializers.IntegerField()
+    edges_created = serializers.IntegerField()
+    duplicate_edges = serializers.IntegerField()
+    split_edges = serializers.IntegerField()
+    parse_time = serializers.FloatField()
+    write_time = serializers.FloatField()
+    execution_time = serializers.FloatField()
+    edges_per_second = serializers.FloatField(allow_null=True)
+
+
+class GraphExportRequestSerializer(serializers.Serializer):
+    """Serializer para los parámetros de exportación (query string)"""
+    # No se llama ``format``: DRF reserva ese parámetro para elegir el renderer
+    export_format = serializers.ChoiceField(choices=list(EXPORT_FORMATS), default='ndjson')
+
+
+class GraphRequestMixin:
+    """
+    Resuelve ``graph_id`` con una sola consulta y deja la instancia en
+    ``graph`` de validated_data, para que la vista no la vuelva a cargar
+    """
+    
+    def resolve_graph(self, data):
+        """Añadir a ``data`` el grafo, o lanzar ValidationError"""
+        graph = Graph.objects.filter(id=data['graph_id']).first()
+        if graph is None:
+            raise serializers.ValidationError({'graph_id': ["El grafo especificado no existe"]})
+        data['graph'] = graph
+        return data
+
+
+class NodePairRequestMixin:
+    """
+    Resuelve ``graph_id``, ``start_node_id`` y ``end_node_id`` con una sola
+    consulta y deja las instancias en ``graph``, ``start_node`` y
+    ``end_node`` de validated_data, para que la vista no las vuelva a cargar
+    """
+    
+    def resolve_node_pair(self, data):
+        """Añadir a ``data`` el grafo y los nodos, o lanzar ValidationError"""
+        graph_id = data['graph_id']
+        nodes = {
+            node.id: node
+            for node in Node.objects.select_related('graph').filter(
+                id__in=[data['start_node_id'], data['end_node_id']]
+            )
+        }
+        start_node = nodes.get(data['start_node_id'])
+        end_node = nodes.get(data['end_node_id'])
+        
+        # El grafo llega con los nodos; solo se consulta aparte si ninguno es suyo
+        graph = next(
+            (node.graph for node in nodes.values() if node.graph_id == graph_id), None
+        )
+        if graph is None:
+            graph = Graph.objects.filter(id=graph_id).first()
+        
+        errors = {}
+        if graph is None:
+            errors['graph_id'] = ["El grafo especificado no existe"]
+        if start_node is None:
+            errors['start_node_id'] = ["El nodo de inicio especificado no existe"]
+        if end_node is None:
+            errors['end_node_id'] = ["El nodo de destino especificado no existe"]
+        if errors:
+            raise serializers.ValidationError(errors)
+        
+        # Verificar que los nodos pertenecen al grafo
+        if start_node.graph_id != graph.id:
+            raise serializers.ValidationError(
+                "El nodo de inicio no pertenece al grafo especificado"
+            )
+        
+        if end_node.graph_id != graph.id:
+            raise serializers.ValidationError(
+                "El nodo de destino no pertenece al grafo especificado"
+            )
+        
+        # Verificar que los nodos son diferentes
+        if start_node.id == end_node.id:
+            raise serializers.ValidationError(
+                "El nodo de inicio y destino deben ser diferentes"
+            )
+        
+        data['graph'] = graph
+        data['start_node'] = start_node
+        data['end_node'] = end_node
+        return data
+
+
+class DijkstraRequestSerializer(NodePairRequestMixin, serializers.Serializer):
     """Serializer para solicitudes del algoritmo de Dijkstra"""
     graph_id = serializers.IntegerField()
     start_node_id = serializers.IntegerField()
     end_node_id = serializers.IntegerField()
     include_steps = serializers.BooleanField(default=False)
-    
-    def validate_graph_id(self, value):
-        """Validar que el grafo existe"""
-        try:
-            Graph.objects.get(id=value)
-        except Graph.DoesNotExist:
-            raise serializers.ValidationError("El grafo especificado no existe")
-        return value
-    
-    def validate_start_node_id(self, value):
-        """Validar que el nodo de inicio existe"""
-        try:
-            Node.objects.get(id=value)
-        except Node.DoesNotExist:
-            raise serializers.ValidationError("El nodo de inicio especificado no existe")
-        return value
-    
-    def validate_end_node_id(self, value):
-        """Validar que el nodo de destino existe"""
-        try:
-            Node.objects.get(id=value)
-        except Node.DoesNotExist:
-            raise serializers.ValidationError("El nodo de destino especificado no existe")
-        return value
+    algorithm = serializers.ChoiceField(
+        choices=list(POINT_TO_POINT_SEARCHES), default='dijkstra'
+    )
+    trace_format = serializers.ChoiceField(choices=list(TRACE_FORMATS), default='auto')
     
     def validate(self, data):
         """Validaciones adicionales"""
-        try:
-            graph = Graph.objects.get(id=data['graph_id'])
-            start_node = Node.objects.get(id=data['start_node_id'])
-            end_node = Node.objects.get(id=data['end_node_id'])
-            
-            # Verificar que los nodos pertenecen al grafo
-            if start_node.graph != graph:
-                raise serializers.ValidationError(
-                    "El nodo de inicio no pertenece al grafo especificado"
-                )
-            
-            if end_node.graph != graph:
-                raise serializers.ValidationError(
-                    "El nodo de destino no pertenece al grafo especificado"
-                )
-            
-            # Verificar que los nodos son diferentes
-            if start_node == end_node:
-                raise serializers.ValidationError(
-                    "El nodo de inicio y destino deben ser diferentes"
-                )
-                
-        except (Graph.DoesNotExist, Node.DoesNotExist):
-            # Los errores específicos ya se manejan en las validaciones individuales
-            pass
+        if data.get('include_steps') and data.get('algorithm', 'dijkstra') != 'dijkstra':
+            raise serializers.ValidationError(
+                "Los pasos detallados solo están disponibles con algorithm='dijkstra'"
+            )
+        
+        data = self.resolve_node_pair(data)
+        
+        # Los pasos completos copian todo el estado en cada paso
+        max_nodes = full_trace_max_nodes()
+        if (
+            data.get('include_steps')
+            and data.get('trace_format') == 'full'
+            and data['graph'].nodes.count() > max_nodes
+        ):
+            raise serializers.ValidationError(
+                f"trace_format='full' solo está disponible para grafos de "
+                f"hasta {max_nodes} nodos; use 'compact'"
+            )
             
         return data
 
@@ -151,71 +268,191 @@ class DijkstraResultSerializer(serializers.Serializer):
     shortest_path = serializers.ListField(child=serializers.CharField())
     total_distance = serializers.FloatField()
     steps = DijkstraStepSerializer(many=True)
+    trace = serializers.JSONField(allow_null=True, required=False)
     success = serializers.BooleanField()
     message = serializers.CharField()
     execution_time = serializers.FloatField(required=False)
+    algorithm = serializers.CharField(required=False)
+    settled_nodes = serializers.IntegerField(allow_null=True, required=False)
 
 
-class AllPathsRequestSerializer(serializers.Serializer):
-    """Serializer para solicitudes de búsqueda de todos los caminos"""
+class ShortestPathTreeRequestSerializer(serializers.Serializer):
+    """Serializer para solicitudes del árbol de caminos más cortos"""
     graph_id = serializers.IntegerField()
-    start_node_id = serializers.IntegerField()
-    end_node_id = serializers.IntegerField()
-    max_paths = serializers.IntegerField(default=100, min_value=1, max_value=500)
-    max_depth = serializers.IntegerField(default=20, min_value=1, max_value=50)
+    start_node_id = serializers.IntegerField(required=False)
+    target_node_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, default=list
+    )
     
-    def validate_graph_id(self, value):
-        """Validar que el grafo existe"""
+    def validate(self, data):
+        """Resolver el grafo, el nodo de inicio y los destinos solicitados"""
         try:
-            Graph.objects.get(id=value)
+            graph = Graph.objects.get(id=data['graph_id'])
         except Graph.DoesNotExist:
-            raise serializers.ValidationError("El grafo especificado no existe")
-        return value
+            raise serializers.ValidationError({'graph_id': "El grafo especificado no existe"})
+        
+        if data.get('start_node_id') is None:
+            # Por defecto se usa el nodo origen del grafo
+            source_node = graph.source_node
+            if source_node is None:
+                raise serializers.ValidationError({
+                    'start_node_id': "El grafo no tiene nodo origen; especifique start_node_id"
+                })
+            data['start_node_id'] = source_node.id
+        
+        requested_ids = {data['start_node_id'], *data['target_node_ids']}
+        nodes_by_id = Node.objects.filter(graph=graph).in_bulk(requested_ids)
+        if data['start_node_id'] not in nodes_by_id:
+            raise serializers.ValidationError(
+                "El nodo de inicio no pertenece al grafo especificado"
+            )
+        missing = [node_id for node_id in data['target_node_ids'] if node_id not in nodes_by_id]
+        if missing:
+            raise serializers.ValidationError({
+                'target_node_ids': f"Nodos que no pertenecen al grafo: {missing}"
+            })
+        
+        # Las instancias resueltas pasan a la vista, que no vuelve a consultarlas
+        data['graph'] = graph
+        data['start_node'] = nodes_by_id[data['start_node_id']]
+        data['target_nodes'] = [nodes_by_id[node_id] for node_id in data['target_node_ids']]
+        return data
+
+
+class ShortestPathTreePathSerializer(serializers.Serializer):
+    """Serializer para un camino expandido del árbol de caminos más cortos"""
+    end_node = serializers.CharField()
+    end_node_id = serializers.IntegerField()
+    shortest_path = serializers.ListField(child=serializers.CharField())
+    path_ids = serializers.ListField(child=serializers.IntegerField())
+    total_distance = serializers.FloatField(allow_null=True)
+    success = serializers.BooleanField()
+
+
+class ShortestPathTreeResultSerializer(serializers.Serializer):
+    """Serializer para el árbol de caminos más cortos (arreglos paralelos)"""
+    start_node = serializers.CharField()
+    start_node_id = serializers.IntegerField()
+    node_ids = serializers.ListField(child=serializers.IntegerField())
+    node_names = serializers.ListField(child=serializers.CharField())
+    distances = serializers.ListField(child=serializers.FloatField())
+    predecessors = serializers.ListField(
+        child=serializers.IntegerField(allow_null=True)
+    )
+    paths = ShortestPathTreePathSerializer(many=True)
+    reachable_count = serializers.IntegerField()
+    success = serializers.BooleanField()
+    message = serializers.CharField()
+    execution_time = serializers.FloatField()
+
+
+class BatchPairSerializer(serializers.Serializer):
+    """Par (inicio, destino) de una solicitud por lotes"""
+    start_node_id = serializers.IntegerField()
+    end_node_id = serializers.IntegerField()
+
+
+class BatchDijkstraRequestSerializer(GraphRequestMixin, serializers.Serializer):
+    """Serializer para solicitudes de caminos más cortos por lotes"""
+    graph_id = serializers.IntegerField()
+    pairs = BatchPairSerializer(many=True, allow_empty=False, max_length=10000)
+    algorithm = serializers.ChoiceField(
+        choices=list(POINT_TO_POINT_SEARCHES), default='dijkstra'
+    )
     
-    def validate_start_node_id(self, value):
-        """Validar que el nodo de inicio existe"""
-        try:
-            Node.objects.get(id=value)
-        except Node.DoesNotExist:
-            raise serializers.ValidationError("El nodo de inicio especificado no existe")
-        return value
+    def validate(self, data):
+        """Resolver el grafo (los nodos de cada par se comprueban por separado)"""
+        return self.resolve_graph(data)
+
+
+class BatchPathResultSerializer(serializers.Serializer):
+    """Resultado de un par dentro de una solicitud por lotes"""
+    start_node_id = serializers.IntegerField()
+    end_node_id = serializers.IntegerField()
+    start_node = serializers.CharField(allow_null=True)
+    end_node = serializers.CharField(allow_null=True)
+    shortest_path = serializers.ListField(child=serializers.CharField())
+    total_distance = serializers.FloatField(allow_null=True)
+    success = serializers.BooleanField()
+    message = serializers.CharField()
+
+
+class BatchDijkstraResultSerializer(serializers.Serializer):
+    """Serializer para los resultados de caminos más cortos por lotes"""
+    graph_id = serializers.IntegerField()
+    algorithm = serializers.CharField()
+    pairs_count = serializers.IntegerField()
+    sources_count = serializers.IntegerField()
+    results = BatchPathResultSerializer(many=True)
+    execution_time = serializers.FloatField()
+
+
+class DistanceMatrixRequestSerializer(GraphRequestMixin, serializers.Serializer):
+    """Serializer para solicitudes de matriz de distancias"""
+    graph_id = serializers.IntegerField()
+    source_node_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    target_node_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    method = serializers.ChoiceField(choices=list(MATRIX_METHODS), default='auto')
+    format = serializers.ChoiceField(choices=['json', 'binary'], default='json')
     
-    def validate_end_node_id(self, value):
-        """Validar que el nodo de destino existe"""
-        try:
-            Node.objects.get(id=value)
-        except Node.DoesNotExist:
-            raise serializers.ValidationError("El nodo de destino especificado no existe")
-        return value
+    def validate(self, data):
+        """Validar que el grafo existe"""
+        return self.resolve_graph(data)
+
+
+class AllPathsRequestSerializer(NodePairRequestMixin, serializers.Serializer):
+    """Serializer para solicitudes de búsqueda de todos los caminos"""
+    graph_id = serializers.IntegerField()
+    start_node_id = serializers.IntegerField()
+    end_node_id = serializers.IntegerField()
+    max_paths = serializers.IntegerField(default=100, min_value=1, max_value=500)
+    max_depth = serializers.IntegerField(default=20, min_value=1, max_value=50)
+    mode = serializers.ChoiceField(
+        choices=[*PATH_SEARCH_MODES, COUNT_ONLY_MODE], default='all'
+    )
+    max_distance = serializers.FloatField(required=False, min_value=0)
+    max_stretch = serializers.FloatField(required=False, min_value=1)
+    stream = serializers.BooleanField(default=False)
+    cursor = serializers.CharField(required=False)
+    parallel = serializers.BooleanField(default=False)
+    # Solo modo count_only: caminos que puede enumerar el DFS de respaldo
+    count_limit = serializers.IntegerField(required=False, min_value=1, max_value=MAX_COUNT_LIMIT)
     
     def validate(self, data):
         """Validaciones adicionales"""
-        try:
-            graph = Graph.objects.get(id=data['graph_id'])
-            start_node = Node.objects.get(id=data['start_node_id'])
-            end_node = Node.objects.get(id=data['end_node_id'])
-            
-            # Verificar que los nodos pertenecen al grafo
-            if start_node.graph != graph:
-                raise serializers.ValidationError(
-                    "El nodo de inicio no pertenece al grafo especificado"
-                )
-            
-            if end_node.graph != graph:
-                raise serializers.ValidationError(
-                    "El nodo de destino no pertenece al grafo especificado"
-                )
-            
-            # Verificar que los nodos son diferentes
-            if start_node == end_node:
-                raise serializers.ValidationError(
-                    "El nodo de inicio y destino deben ser diferentes"
-                )
-                
-        except (Graph.DoesNotExist, Node.DoesNotExist):
-            pass
+        data = self.resolve_node_pair(data)
+        
+        # Un cursor solo continúa la misma búsqueda sobre la misma versión
+        if 'cursor' in data:
+            self._validate_cursor_query(data, data['graph'])
             
         return data
+    
+    def validate_cursor(self, value):
+        """Verificar la firma del cursor y devolver su contenido"""
+        try:
+            return decode_cursor(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+    
+    def _validate_cursor_query(self, data, graph):
+        query = data['cursor']['q']
+        expected = cursor_query(
+            graph.id, graph.version, data['start_node_id'], data['end_node_id'],
+            data['mode'], data['max_depth'], data.get('max_distance'), data.get('max_stretch')
+        )
+        if query[:1] + query[2:] != expected[:1] + expected[2:]:
+            raise serializers.ValidationError(
+                "El cursor no corresponde a los parámetros de esta búsqueda"
+            )
+        if query[1] != expected[1]:
+            raise serializers.ValidationError(
+                "El grafo ha cambiado desde que se generó el cursor"
+            )
 
 
 class PathInfoSerializer(serializers.Serializer):
@@ -238,9 +475,43 @@ class SearchLimitsSerializer(serializers.Serializer):
     """Serializer para información de límites de búsqueda"""
     max_paths = serializers.IntegerField()
     max_depth = serializers.IntegerField()
+    max_distance = serializers.FloatField(allow_null=True, required=False)
     paths_limited = serializers.BooleanField()
 
 
+class PathStatisticsSerializer(serializers.Serializer):
+    """Serializer para las estadísticas de distancia de un conteo de caminos"""
+    shortest_distance = serializers.FloatField()
+    longest_distance = serializers.FloatField()
+    average_distance = serializers.FloatField()
+    optimal_paths_count = serializers.IntegerField()
+    dijkstra_distance = serializers.FloatField(allow_null=True)
+    distance_variance = serializers.FloatField()
+
+
+class PathCountLimitsSerializer(serializers.Serializer):
+    """Serializer para los límites de un conteo de caminos"""
+    max_depth = serializers.IntegerField()
+    max_distance = serializers.FloatField(allow_null=True)
+    count_limit = serializers.IntegerField()
+
+
+class PathCountResultSerializer(serializers.Serializer):
+    """Serializer para los resultados del modo count_only"""
+    start_node = serializers.CharField()
+    end_node = serializers.CharField()
+    mode = serializers.CharField()
+    method = serializers.CharField(required=False)
+    paths_count = serializers.IntegerField(allow_null=True)
+    paths_count_lower_bound = serializers.IntegerField(required=False)
+    count_limited = serializers.BooleanField(required=False)
+    success = serializers.BooleanField()
+    message = serializers.CharField()
+    statistics = PathStatisticsSerializer(allow_null=True, required=False)
+    execution_time = serializers.FloatField()
+    search_limits = PathCountLimitsSerializer(required=False)
+
+
 class AllPathsResultSerializer(serializers.Serializer):
     """Serializer para los resultados de búsqueda de todos los caminos"""
     start_node = serializers.CharField()
@@ -252,4 +523,6 @@ class AllPathsResultSerializer(serializers.Serializer):
     message = serializers.CharField()
     comparison = AllPathsComparisonSerializer(allow_null=True)
     execution_time = serializers.FloatField()
+    mode = serializers.CharField(required=False)
+    next_cursor = serializers.CharField(allow_null=True, required=False)
     search_limits = SearchLimitsSerializer()
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+Señales que mantienen actualizada la versión de los grafos
+
+Cualquier alta, modificación o baja de un nodo o una arista incrementa
+``Graph.version``, que invalida las instantáneas cacheadas del grafo.
+Al borrar un grafo se borran también sus instantáneas en disco.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .graph_binary import remove_snapshot_files
+from .models import Graph, Node, Edge
+
+
+@receiver(post_save, sender=Node)
+@receiver(post_save, sender=Edge)
+def bump_graph_version_on_save(sender, instance, **kwargs):
+    Graph.bump_version(instance.graph_id)
+
+
+@receiver(post_delete, sender=Node)
+@receiver(post_delete, sender=Edge)
+def bump_graph_version_on_delete(sender, instance, origin=None, **kwargs):
+    # En los borrados en cascada basta con la señal del objeto que los originó
+    if isinstance(origin, Graph):
+        return
+    if sender is Edge and isinstance(origin, Node):
+        return
+    Graph.bump_version(instance.graph_id)
+
+
+@receiver(post_delete, sender=Graph)
+def remove_snapshot_files_on_delete(sender, instance, **kwargs):
+    remove_snapshot_files(instance.id)
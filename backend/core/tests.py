@@ -1,3 +1,1046 @@
-from django.test import TestCase
+"""
+Pruebas del motor de caminos, la importación y exportación y la API
 
-# Create your tests here.
+Los grafos se generan al azar con semilla fija. Las cachés de instantáneas,
+validaciones y resultados viven en el proceso y se indexan por ID y versión
+del grafo; como la base de datos de pruebas reutiliza IDs tras cada
+rollback, se vacían antes de cada prueba.
+"""
+
+import io
+import json
+import math
+import random
+from array import array
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import algorithms, parallel
+from .algorithms import dijkstra_algorithm, find_all_paths, shortest_path_tree
+from .distance_matrix import BINARY_HEADER, BINARY_MAGIC
+from .graph_export import EXPORT_FORMATS, iter_graph_export
+from .graph_import import ParsedGraph, import_graph_content, parse_dimacs
+from .graph_snapshot import clear_snapshot_cache, get_graph_snapshot, load_graph_snapshot
+from .models import Graph, Node, Edge
+from .path_counting import count_paths
+from .path_cursor import decode_cursor
+from .result_cache import DjangoCacheBackend, LocalLRUBackend, get_result_cache
+from .serializers import AllPathsRequestSerializer, DijkstraRequestSerializer
+
+
+def make_graph(name, nodes_count, edges_count, seed, directed_ratio=0.5):
+    """Grafo aleatorio con coordenadas, pesos enteros y sin pares repetidos"""
+    rnd = random.Random(seed)
+    graph = Graph.objects.create(name=name)
+    nodes = Node.objects.bulk_create([
+        Node(
+            graph=graph, name=f'N{index:02d}', is_source=index == 0,
+            x_position=rnd.uniform(0, 10), y_position=rnd.uniform(0, 10)
+        )
+        for index in range(nodes_count)
+    ])
+    pairs = set()
+    edges = []
+    while len(edges) < edges_count:
+        a, b = rnd.sample(range(nodes_count), 2)
+        if (a, b) in pairs or (b, a) in pairs:
+            continue
+        pairs.add((a, b))
+        edges.append(Edge(
+            graph=graph, from_node=nodes[a], to_node=nodes[b],
+            weight=rnd.randint(1, 20), directed=rnd.random() < directed_ratio
+        ))
+    Edge.objects.bulk_create(edges)
+    return graph, list(graph.nodes.order_by('name'))
+
+
+def model_adjacency(graph):
+    """Lista de adyacencia ``{id: [(vecino, peso)]}`` leída de los modelos"""
+    adjacency = {node.id: [] for node in graph.nodes.all()}
+    for edge in graph.edges.all():
+        adjacency[edge.from_node_id].append((edge.to_node_id, edge.weight))
+        if not edge.directed:
+            adjacency[edge.to_node_id].append((edge.from_node_id, edge.weight))
+    return adjacency
+
+
+def linear_scan_distances(graph, start_node):
+    """Dijkstra original (mínimo por recorrido lineal) sobre los modelos, como referencia"""
+    adjacency = model_adjacency(graph)
+    distances = {node_id: math.inf for node_id in adjacency}
+    distances[start_node.id] = 0.0
+    visited = set()
+    while len(visited) < len(adjacency):
+        current = min(
+            (node_id for node_id in adjacency if node_id not in visited),
+            key=lambda node_id: distances[node_id]
+        )
+        if distances[current] == math.inf:
+            break
+        visited.add(current)
+        for neighbor, weight in adjacency[current]:
+            distances[neighbor] = min(distances[neighbor], distances[current] + weight)
+    return distances
+
+
+def reference_paths(graph, start_node, end_node, max_depth):
+    """DFS recursivo original: caminos simples de como mucho ``max_depth`` nodos"""
+    adjacency = model_adjacency(graph)
+    names = dict(graph.nodes.values_list('id', 'name'))
+    paths = []
+
+    def visit(path, distance):
+        if len(path) > max_depth:
+            return
+        if path[-1] == end_node.id:
+            paths.append(([names[node_id] for node_id in path], distance))
+            return
+        for neighbor, weight in adjacency[path[-1]]:
+            if neighbor not in path:
+                visit(path + [neighbor], distance + weight)
+
+    visit([start_node.id], 0.0)
+    return sorted(paths)
+
+
+def edge_set(graph):
+    return {
+        (edge.from_node.name, edge.to_node.name, edge.weight, edge.directed)
+        for edge in graph.edges.select_related('from_node', 'to_node')
+    }
+
+
+class GraphTestCase(TestCase):
+    """Vacía las cachés del proceso antes de cada prueba"""
+
+    def setUp(self):
+        clear_snapshot_cache()
+        algorithms._validation_cache.clear()
+        get_result_cache().clear()
+        self.client = APIClient()
+
+
+class DijkstraEngineTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('motor', 40, 90, seed=1)
+
+    def test_heap_and_snapshot_match_linear_scan(self):
+        for start_node in self.nodes[:5]:
+            expected = linear_scan_distances(self.graph, start_node)
+
+            tree = shortest_path_tree(self.graph, start_node)
+            tree_distances = dict(zip(tree['node_ids'], tree['distances']))
+            for node_id, distance in expected.items():
+                if distance == math.inf:
+                    self.assertNotIn(node_id, tree_distances)
+                else:
+                    self.assertAlmostEqual(tree_distances[node_id], distance)
+
+            for end_node in self.nodes[-5:]:
+                result = dijkstra_algorithm(self.graph, start_node, end_node)
+                if expected[end_node.id] == math.inf:
+                    self.assertFalse(result['success'])
+                else:
+                    self.assertTrue(result['success'])
+                    self.assertAlmostEqual(result['total_distance'], expected[end_node.id])
+
+    def test_path_weights_add_up_to_total_distance(self):
+        weights = {}
+        for from_name, to_name, weight, directed in edge_set(self.graph):
+            weights[from_name, to_name] = min(weight, weights.get((from_name, to_name), math.inf))
+            if not directed:
+                weights[to_name, from_name] = min(weight, weights.get((to_name, from_name), math.inf))
+
+        result = dijkstra_algorithm(self.graph, self.nodes[0], self.nodes[-1])
+        self.assertTrue(result['success'])
+        path = result['shortest_path']
+        self.assertEqual(
+            sum(weights[pair] for pair in zip(path, path[1:])), result['total_distance']
+        )
+
+    def test_compact_trace_replays_to_final_distances(self):
+        start_node = self.nodes[0]
+        result = dijkstra_algorithm(
+            self.graph, start_node, self.nodes[-1], include_steps=True, trace_format='compact'
+        )
+        trace = result['trace']
+        self.assertEqual(result['steps'], [])
+        node_ids = {node.name: node.id for node in self.nodes}
+        expected = linear_scan_distances(self.graph, start_node)
+
+        distances = {trace['start']: 0.0}
+        for event in trace['events']:
+            if event[0] == 'r':
+                _, _, neighbor, old_distance, new_distance = event
+                # Cada relajación parte del estado que deja la anterior
+                self.assertEqual(old_distance, distances.get(neighbor))
+                self.assertLess(new_distance, distances.get(neighbor, math.inf))
+                distances[neighbor] = new_distance
+            else:
+                _, node, distance = event
+                self.assertEqual(distance, distances[node])
+                self.assertEqual(distance, expected[node_ids[trace['names'][node]]])
+        self.assertAlmostEqual(
+            distances[trace['names'].index(self.nodes[-1].name)], result['total_distance']
+        )
+
+    def test_context_keeps_one_result_per_trace_format(self):
+        context = algorithms.ComputationContext(self.graph, self.nodes[0], self.nodes[-1])
+        full = context.dijkstra(include_steps=True, trace_format='full')
+        compact = context.dijkstra(include_steps=True, trace_format='compact')
+        self.assertTrue(full['steps'])
+        self.assertIsNone(full.get('trace'))
+        self.assertEqual(compact['steps'], [])
+        self.assertEqual(compact['trace']['format'], 'compact')
+        self.assertIs(context.dijkstra(include_steps=True, trace_format='full'), full)
+        self.assertIs(context.dijkstra(include_steps=True, trace_format='compact'), compact)
+        # Sin pasos sirve cualquiera de los anteriores
+        self.assertIn(context.dijkstra(), (full, compact))
+        self.assertEqual(compact['total_distance'], full['total_distance'])
+
+
+class DijkstraStreamTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('en vivo', 30, 70, seed=11)
+        self.pair = {
+            'graph_id': self.graph.id,
+            'start_node_id': self.nodes[0].id,
+            'end_node_id': self.nodes[-1].id,
+        }
+
+    def read_messages(self, response):
+        body = b''.join(response.streaming_content).decode()
+        messages = []
+        for block in body.split('\n\n'):
+            if block:
+                event, data = block.split('\n')
+                messages.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return messages
+
+    def test_stream_sends_the_compact_trace_and_summary(self):
+        response = self.client.get(
+            '/api/dijkstra/stream_steps/', self.pair, HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        messages = self.read_messages(response)
+
+        expected = dijkstra_algorithm(
+            self.graph, self.nodes[0], self.nodes[-1], include_steps=True, trace_format='compact'
+        )
+        kinds = [kind for kind, _ in messages]
+        self.assertEqual(kinds[0], 'init')
+        self.assertEqual(kinds[-1], 'summary')
+        self.assertEqual(set(kinds[1:-1]), {'steps'})
+        self.assertEqual(messages[0][1]['names'], expected['trace']['names'])
+        events = [event for kind, batch in messages if kind == 'steps' for event in batch]
+        self.assertEqual(events, json.loads(json.dumps(expected['trace']['events'])))
+        summary = messages[-1][1]
+        self.assertEqual(summary['success'], expected['success'])
+        self.assertEqual(summary['shortest_path'], expected['shortest_path'])
+
+    def test_stream_rejects_other_algorithms(self):
+        response = self.client.get(
+            '/api/dijkstra/stream_steps/', {**self.pair, 'algorithm': 'astar'},
+            HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class GraphSnapshotTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('instantanea', 20, 40, seed=2)
+
+    def test_adjacency_matches_the_edges(self):
+        snapshot = get_graph_snapshot(self.graph)
+        self.assertEqual(list(snapshot.node_ids), [node.id for node in self.nodes])
+
+        expected = {node.id: [] for node in self.nodes}
+        for edge in self.graph.edges.all():
+            expected[edge.from_node_id].append((edge.to_node_id, edge.weight))
+            if not edge.directed:
+                expected[edge.to_node_id].append((edge.from_node_id, edge.weight))
+        for node in self.nodes:
+            neighbors = [
+                (snapshot.node_ids[target], weight)
+                for target, weight in snapshot.neighbors(snapshot.index(node.id))
+            ]
+            self.assertEqual(sorted(neighbors), sorted(expected[node.id]))
+
+    def test_snapshot_is_rebuilt_only_on_a_version_bump(self):
+        snapshot = get_graph_snapshot(self.graph)
+        self.graph.refresh_from_db()
+        self.assertIs(get_graph_snapshot(self.graph), snapshot)
+
+        edge = self.graph.edges.first()
+        edge.weight += 100
+        edge.save()
+        self.graph.refresh_from_db()
+        rebuilt = get_graph_snapshot(self.graph)
+        self.assertIsNot(rebuilt, snapshot)
+        self.assertEqual(rebuilt.version, self.graph.version)
+        self.assertIn(
+            edge.weight,
+            [weight for _, weight in rebuilt.neighbors(rebuilt.index(edge.from_node_id))]
+        )
+
+    def test_loader_uses_two_queries(self):
+        with self.assertNumQueries(2):
+            load_graph_snapshot(self.graph)
+
+
+class ShortestPathTreeTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('arbol', 20, 40, seed=4)
+        self.url = '/api/dijkstra/shortest_path_tree/'
+
+    def test_tree_defaults_to_the_source_node_and_expands_targets(self):
+        targets = self.nodes[-3:]
+        response = self.client.post(
+            self.url,
+            {'graph_id': self.graph.id, 'target_node_ids': [node.id for node in targets]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['start_node_id'], self.nodes[0].id)
+
+        expected = linear_scan_distances(self.graph, self.nodes[0])
+        distances = dict(zip(response.data['node_ids'], response.data['distances']))
+        self.assertEqual(
+            set(distances), {node_id for node_id, distance in expected.items() if distance < math.inf}
+        )
+        for node_id, distance in distances.items():
+            self.assertAlmostEqual(distance, expected[node_id])
+
+        self.assertEqual([path['end_node_id'] for path in response.data['paths']], [n.id for n in targets])
+        for path in response.data['paths']:
+            if path['success']:
+                self.assertEqual(path['path_ids'][0], self.nodes[0].id)
+                self.assertAlmostEqual(path['total_distance'], expected[path['end_node_id']])
+
+    def test_nodes_of_other_graphs_are_rejected(self):
+        other, other_nodes = make_graph('otro', 3, 2, seed=4)
+        response = self.client.post(
+            self.url,
+            {'graph_id': self.graph.id, 'target_node_ids': [other_nodes[0].id]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('target_node_ids', response.data)
+
+
+class ResultCacheTests(GraphTestCase):
+
+    def test_local_backend_evicts_the_least_recently_used_entry(self):
+        backend = LocalLRUBackend(max_entries=2, max_bytes=1000)
+        backend.set((1, 1, 'a'), 'A', 10)
+        backend.set((1, 1, 'b'), 'B', 10)
+        self.assertEqual(backend.get((1, 1, 'a')), 'A')
+        backend.set((1, 1, 'c'), 'C', 10)
+        self.assertIsNone(backend.get((1, 1, 'b')))
+        self.assertEqual(backend.get((1, 1, 'a')), 'A')
+        self.assertEqual(backend.get((1, 1, 'c')), 'C')
+        self.assertEqual(backend.info()['evictions'], 1)
+
+        backend.set((1, 1, 'd'), 'D', 995)
+        self.assertEqual(list(backend.entries), [(1, 1, 'd')])
+        self.assertLessEqual(backend.info()['bytes'], 1000)
+
+    def test_new_version_discards_older_entries(self):
+        backend = LocalLRUBackend(max_entries=10, max_bytes=1000)
+        backend.set((1, 1, 'a'), 'A', 10)
+        backend.set((2, 1, 'a'), 'otro grafo', 10)
+        backend.set((1, 2, 'a'), 'A2', 10)
+        self.assertIsNone(backend.get((1, 1, 'a')))
+        self.assertEqual(backend.get((2, 1, 'a')), 'otro grafo')
+
+    def test_hits_misses_and_invalidation_on_a_version_bump(self):
+        graph, nodes = make_graph('cache', 10, 20, seed=5)
+        cache = get_result_cache()
+        first = dijkstra_algorithm(graph, nodes[0], nodes[-1])
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(dijkstra_algorithm(graph, nodes[0], nodes[-1])['total_distance'], first['total_distance'])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        # Un atajo nuevo cambia la versión y el resultado cacheado deja de usarse
+        Edge.objects.create(graph=graph, from_node=nodes[0], to_node=nodes[-1], weight=0.5, directed=True)
+        graph.refresh_from_db()
+        result = dijkstra_algorithm(graph, nodes[0], nodes[-1])
+        self.assertEqual(result['total_distance'], 0.5)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_django_backend_clear_keeps_other_keys(self):
+        default_cache = caches['default']
+        default_cache.set('ajena', 1)
+        backend = DjangoCacheBackend('default', timeout=60)
+        backend.set(('clave',), 'valor', 5)
+        self.assertEqual(backend.get(('clave',)), 'valor')
+        backend.clear()
+        self.assertIsNone(backend.get(('clave',)))
+        self.assertEqual(default_cache.get('ajena'), 1)
+
+
+class BidirectionalDijkstraTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('bidireccional', 300, 700, seed=6, directed_ratio=0.0)
+
+    def test_matches_dijkstra(self):
+        for start_node in self.nodes[:6]:
+            for end_node in self.nodes[-6:]:
+                expected = dijkstra_algorithm(self.graph, start_node, end_node)
+                result = dijkstra_algorithm(self.graph, start_node, end_node, algorithm='bidirectional')
+                self.assertEqual(result['success'], expected['success'])
+                if expected['success']:
+                    self.assertAlmostEqual(result['total_distance'], expected['total_distance'])
+
+    def test_settles_fewer_nodes_than_dijkstra(self):
+        settled = {'dijkstra': 0, 'bidirectional': 0}
+        for start_node, end_node in zip(self.nodes[:10], self.nodes[-10:]):
+            for algorithm in settled:
+                response = self.client.post('/api/dijkstra/calculate/', {
+                    'graph_id': self.graph.id, 'start_node_id': start_node.id,
+                    'end_node_id': end_node.id, 'algorithm': algorithm,
+                }, format='json')
+                self.assertEqual(response.status_code, 200, response.data)
+                self.assertEqual(response.data['algorithm'], algorithm)
+                self.assertIsNotNone(response.data['settled_nodes'])
+                settled[algorithm] += response.data['settled_nodes']
+        self.assertLess(settled['bidirectional'], settled['dijkstra'])
+
+
+class AStarTests(GraphTestCase):
+
+    def test_matches_dijkstra(self):
+        graph, nodes = make_graph('astar', 60, 150, seed=7)
+        for start_node in nodes[:6]:
+            for end_node in nodes[-6:]:
+                expected = dijkstra_algorithm(graph, start_node, end_node)
+                result = dijkstra_algorithm(graph, start_node, end_node, algorithm='astar')
+                self.assertEqual(result['algorithm'], 'astar')
+                self.assertEqual(result['success'], expected['success'])
+                if expected['success']:
+                    self.assertAlmostEqual(result['total_distance'], expected['total_distance'])
+
+    def test_falls_back_to_dijkstra_without_coordinates(self):
+        graph, nodes = make_graph('sin-coordenadas', 10, 20, seed=7)
+        Node.objects.filter(pk=nodes[3].pk).update(x_position=None)
+        result = dijkstra_algorithm(graph, nodes[0], nodes[-1], algorithm='astar')
+        self.assertEqual(result['algorithm'], 'dijkstra')
+
+
+class BatchShortestPathTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('lotes', 20, 40, seed=8)
+        self.url = '/api/dijkstra/batch/'
+
+    def post(self, pairs, **extra):
+        return self.client.post(self.url, {
+            'graph_id': self.graph.id,
+            'pairs': [{'start_node_id': a, 'end_node_id': b} for a, b in pairs],
+            **extra,
+        }, format='json')
+
+    def test_pairs_are_grouped_by_source_and_keep_their_order(self):
+        a, b, c, d = self.nodes[0], self.nodes[5], self.nodes[10], self.nodes[15]
+        pairs = [(a.id, b.id), (c.id, d.id), (a.id, c.id), (a.id, d.id)]
+        response = self.post(pairs)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['pairs_count'], 4)
+        self.assertEqual(response.data['sources_count'], 2)
+
+        results = response.data['results']
+        self.assertEqual([(r['start_node_id'], r['end_node_id']) for r in results], pairs)
+        for (start_id, end_id), result in zip(pairs, results):
+            expected = linear_scan_distances(self.graph, Node.objects.get(id=start_id))[end_id]
+            if expected == math.inf:
+                self.assertFalse(result['success'])
+            else:
+                self.assertTrue(result['success'])
+                self.assertAlmostEqual(result['total_distance'], expected)
+
+    def test_invalid_pairs_do_not_affect_the_others(self):
+        _, other_nodes = make_graph('ajeno', 2, 1, seed=8)
+        a, b = self.nodes[0], self.nodes[1]
+        response = self.post([(a.id, a.id), (other_nodes[0].id, b.id), (a.id, other_nodes[1].id), (a.id, b.id)])
+        self.assertEqual(response.status_code, 200, response.data)
+        messages = [result['message'] for result in response.data['results']]
+        self.assertIn('deben ser diferentes', messages[0])
+        self.assertIn('nodo de inicio no pertenece', messages[1])
+        self.assertIn('nodo de destino no pertenece', messages[2])
+        self.assertEqual(
+            response.data['results'][3]['success'],
+            linear_scan_distances(self.graph, a)[b.id] < math.inf
+        )
+
+    def test_unknown_graph_is_rejected_with_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {
+                'graph_id': 999999, 'pairs': [{'start_node_id': 1, 'end_node_id': 2}],
+            }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('graph_id', response.data)
+
+    def test_graph_is_loaded_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post([(self.nodes[0].id, self.nodes[1].id)])
+        self.assertEqual(response.status_code, 200)
+        graph_selects = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "core_graph"' in query['sql']
+        ]
+        self.assertEqual(len(graph_selects), 1, graph_selects)
+
+
+class DistanceMatrixTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('matriz', 15, 35, seed=9)
+        self.url = '/api/dijkstra/distance_matrix/'
+
+    def expected_rows(self, sources, targets):
+        rows = []
+        for source in sources:
+            distances = linear_scan_distances(self.graph, source)
+            rows.append([distances[target.id] for target in targets])
+        return rows
+
+    def test_matrix_matches_dijkstra_from_each_source(self):
+        for method in ('dijkstra', 'floyd_warshall'):
+            response = self.client.post(
+                self.url, {'graph_id': self.graph.id, 'method': method}, format='json'
+            )
+            self.assertEqual(response.status_code, 200, response.data)
+            ids = response.data['source_node_ids']
+            nodes = sorted(self.nodes, key=lambda node: ids.index(node.id))
+            for row, expected in zip(response.data['matrix'], self.expected_rows(nodes, nodes)):
+                self.assertEqual(row, [None if value == math.inf else value for value in expected])
+
+    def test_binary_format_carries_ids_and_float64_rows(self):
+        sources, targets = self.nodes[:3], self.nodes[5:9]
+        response = self.client.post(self.url, {
+            'graph_id': self.graph.id,
+            'source_node_ids': [node.id for node in sources],
+            'target_node_ids': [node.id for node in targets],
+            'format': 'binary',
+        }, format='json', HTTP_ACCEPT='application/octet-stream')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+
+        payload = response.content
+        magic, rows, cols = BINARY_HEADER.unpack_from(payload)
+        self.assertEqual((magic, rows, cols), (BINARY_MAGIC, 3, 4))
+        values = array('q')
+        values.frombytes(payload[BINARY_HEADER.size:BINARY_HEADER.size + 8 * (rows + cols)])
+        self.assertEqual(list(values), [node.id for node in sources + targets])
+        matrix = array('d')
+        matrix.frombytes(payload[BINARY_HEADER.size + 8 * (rows + cols):])
+        expected = self.expected_rows(sources, targets)
+        self.assertEqual(list(matrix), [value for row in expected for value in row])
+
+    @override_settings(DISTANCE_MATRIX_MAX_CELLS=100)
+    def test_matrix_over_the_cell_limit_is_rejected(self):
+        response = self.client.post(self.url, {'graph_id': self.graph.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.data['success'])
+        self.assertIn('100 celdas', response.data['message'])
+
+    def test_graph_is_loaded_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'graph_id': self.graph.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        graph_selects = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT') and 'FROM "core_graph"' in query['sql']
+        ]
+        self.assertEqual(len(graph_selects), 1, graph_selects)
+
+
+class PathEnumerationTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('caminos', 14, 30, seed=3)
+        self.start, self.end = self.nodes[0], self.nodes[-1]
+
+    def all_distances(self, max_depth=14):
+        result = find_all_paths(self.graph, self.start, self.end, max_paths=100000, max_depth=max_depth)
+        self.assertIsNone(result['next_cursor'])
+        return sorted(path['total_distance'] for path in result['all_paths'])
+
+    def test_k_shortest_paths_in_order(self):
+        expected = self.all_distances()
+        result = find_all_paths(self.graph, self.start, self.end, max_paths=25, mode='k_shortest')
+        distances = [path['total_distance'] for path in result['all_paths']]
+        self.assertEqual(distances, sorted(distances))
+        self.assertEqual(distances, expected[:len(distances)])
+        self.assertEqual(len(distances), min(25, len(expected)))
+
+    def test_dfs_matches_recursive_reference(self):
+        for max_depth in (3, 6, 14):
+            result = find_all_paths(self.graph, self.start, self.end, max_paths=100000, max_depth=max_depth)
+            found = sorted((path['path'], path['total_distance']) for path in result['all_paths'])
+            self.assertEqual(found, reference_paths(self.graph, self.start, self.end, max_depth))
+            for path in result['all_paths']:
+                self.assertEqual(path['nodes_count'], len(path['path']))
+                self.assertEqual(len(path['path_ids']), len(path['path']))
+
+    def test_long_chain_within_max_depth(self):
+        graph = Graph.objects.create(name='cadena')
+        nodes = Node.objects.bulk_create([
+            Node(graph=graph, name=f'C{index:02d}', is_source=index == 0) for index in range(50)
+        ])
+        Edge.objects.bulk_create([
+            Edge(graph=graph, from_node=a, to_node=b, weight=1, directed=False)
+            for a, b in zip(nodes, nodes[1:])
+        ])
+        result = find_all_paths(graph, nodes[0], nodes[-1], max_paths=10, max_depth=50)
+        self.assertEqual(result['paths_count'], 1)
+        self.assertEqual(result['all_paths'][0]['total_distance'], 49)
+
+        result = find_all_paths(graph, nodes[0], nodes[-1], max_paths=10, max_depth=49)
+        self.assertEqual(result['paths_count'], 0)
+
+    def test_distance_bounds_keep_exactly_the_paths_within_them(self):
+        reference = reference_paths(self.graph, self.start, self.end, 14)
+        optimal = linear_scan_distances(self.graph, self.start)[self.end.id]
+        for bounds, limit in (
+            ({'max_distance': optimal + 10}, optimal + 10),
+            ({'max_stretch': 1.5}, optimal * 1.5),
+            ({'max_distance': optimal + 30, 'max_stretch': 2}, min(optimal + 30, optimal * 2)),
+        ):
+            with self.subTest(**bounds):
+                result = find_all_paths(
+                    self.graph, self.start, self.end, max_paths=100000, max_depth=14, **bounds
+                )
+                found = sorted((path['path'], path['total_distance']) for path in result['all_paths'])
+                self.assertEqual(found, [path for path in reference if path[1] <= limit])
+
+    def test_stream_emits_one_line_per_path_and_a_summary(self):
+        body = {
+            'graph_id': self.graph.id, 'start_node_id': self.start.id,
+            'end_node_id': self.end.id, 'max_depth': 14, 'max_paths': 500,
+        }
+        expected = self.client.post('/api/all-paths/find_paths/', body, format='json').data
+
+        response = self.client.post(
+            '/api/all-paths/find_paths/', {**body, 'stream': True},
+            format='json', HTTP_ACCEPT='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([record.pop('type') for record in records], ['path'] * (len(records) - 1) + ['summary'])
+
+        summary = records.pop()
+        self.assertEqual(summary['paths_count'], expected['paths_count'])
+        self.assertEqual(summary['comparison'], expected['comparison'])
+        self.assertEqual(
+            sorted((path['path'], path['total_distance']) for path in records),
+            sorted((path['path'], path['total_distance']) for path in expected['all_paths'])
+        )
+
+    def fetch_pages(self, mode, page_size):
+        request = {
+            'graph_id': self.graph.id, 'start_node_id': self.start.id,
+            'end_node_id': self.end.id, 'max_depth': 14, 'mode': mode,
+        }
+        pages = []
+        cursor = None
+        while True:
+            body = {**request, 'max_paths': page_size}
+            if cursor:
+                body['cursor'] = cursor
+            response = self.client.post('/api/all-paths/find_paths/', body, format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append([(path['path'], path['total_distance']) for path in response.data['all_paths']])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                return pages
+            self.assertLess(len(pages), 200)
+
+    def test_cursor_pages_cover_the_full_set(self):
+        total = len(self.all_distances())
+        for mode in ('all', 'k_shortest'):
+            for page_size in (7, total):
+                with self.subTest(mode=mode, page_size=page_size):
+                    whole = [path for page in self.fetch_pages(mode, 500) for path in page]
+                    pages = self.fetch_pages(mode, page_size)
+                    # Ninguna página vacía: el último cursor lleva a caminos
+                    self.assertTrue(all(pages))
+                    self.assertEqual(len(pages), math.ceil(total / page_size))
+                    paged = [path for page in pages for path in page]
+                    if mode == 'all':
+                        # Cada página se ordena por distancia; el conjunto debe ser el mismo
+                        paged, whole = sorted(paged), sorted(whole)
+                    self.assertEqual(paged, whole)
+                    self.assertEqual(len(whole), total)
+
+    def test_k_shortest_cursor_keeps_only_the_candidates(self):
+        emitted = []
+        cursor = None
+        for _ in range(4):
+            result = find_all_paths(
+                self.graph, self.start, self.end, max_paths=5, mode='k_shortest',
+                cursor=decode_cursor(cursor) if cursor else None
+            )
+            emitted.extend(tuple(path['path_ids']) for path in result['all_paths'])
+            cursor = result['next_cursor']
+            state = decode_cursor(cursor)['s']
+            self.assertEqual(list(state), ['candidates'])
+            snapshot = get_graph_snapshot(self.graph)
+            pending = {
+                tuple(str(snapshot.node_ids[index]) for index in candidate[2])
+                for candidate in state['candidates']
+            }
+            self.assertFalse(pending & set(emitted))
+
+    def test_count_only_matches_enumeration(self):
+        for max_depth in (4, 8, 14):
+            distances = self.all_distances(max_depth)
+            result = count_paths(self.graph, self.start, self.end, max_depth=max_depth)
+            self.assertEqual(result['paths_count'], len(distances), result['method'])
+            self.assertEqual(result['paths_count_lower_bound'], len(distances))
+            self.assertFalse(result['count_limited'])
+            if distances:
+                self.assertAlmostEqual(result['statistics']['shortest_distance'], distances[0])
+                self.assertAlmostEqual(result['statistics']['longest_distance'], distances[-1])
+
+    def test_count_limit_reports_a_lower_bound_instead_of_a_count(self):
+        body = {
+            'graph_id': self.graph.id, 'start_node_id': self.start.id, 'end_node_id': self.end.id,
+            'max_depth': 14, 'mode': 'count_only', 'max_distance': 1000, 'count_limit': 3,
+        }
+        response = self.client.post('/api/all-paths/find_paths/', body, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['method'], 'dfs')
+        self.assertTrue(response.data['count_limited'])
+        self.assertIsNone(response.data['paths_count'])
+        self.assertEqual(response.data['paths_count_lower_bound'], 4)
+        self.assertIn('más de 3 caminos', response.data['message'])
+
+        response = self.client.post('/api/all-paths/compare_with_dijkstra/', body, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIsNone(response.data['comparison_summary']['total_paths_found'])
+        analysis = response.data['comparison_summary']['paths_analysis']
+        self.assertTrue(analysis['count_limited'])
+        self.assertEqual(analysis['paths_count_lower_bound'], 4)
+
+    @override_settings(PARALLEL_WORKERS=2)
+    def test_parallel_matches_sequential(self):
+        self.addCleanup(parallel.shutdown_pool)
+        for max_paths, max_depth in ((1, 14), (9, 6), (64, 14), (65, 14), (500, 14)):
+            sequential = find_all_paths(self.graph, self.start, self.end, max_paths, max_depth)
+            in_parallel = find_all_paths(
+                self.graph, self.start, self.end, max_paths, max_depth, parallel=True
+            )
+            self.assertEqual(in_parallel['all_paths'], sequential['all_paths'])
+            self.assertEqual(in_parallel['next_cursor'] is None, sequential['next_cursor'] is None)
+
+    @override_settings(PARALLEL_WORKERS=2, PARALLEL_POOL_CACHE_SIZE=2)
+    def test_pools_are_kept_per_graph(self):
+        self.addCleanup(parallel.shutdown_pool)
+        other, other_nodes = make_graph('otro', 14, 30, seed=4)
+
+        def search(graph, nodes):
+            find_all_paths(graph, nodes[0], nodes[-1], 20, 14, parallel=True)
+            return dict(parallel._pools)
+
+        first = search(self.graph, self.nodes)
+        both = search(other, other_nodes)
+        self.assertEqual(len(both), 2)
+        # Alternar entre los dos grafos no vuelve a crear ningún pool
+        for _ in range(2):
+            self.assertEqual(search(self.graph, self.nodes), both)
+            self.assertEqual(search(other, other_nodes), both)
+
+        # Una versión nueva del grafo cierra el pool de la anterior
+        Node.objects.create(graph=self.graph, name='N99')
+        self.graph.refresh_from_db()
+        pools = search(self.graph, self.nodes)
+        self.assertEqual(len(pools), 2)
+        self.assertNotIn(next(iter(first)), pools)
+        self.assertIn(next(iter(set(both) - set(first))), pools)
+
+
+class RequestValidationTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('validación', 10, 20, seed=12)
+        self.pair = {
+            'graph_id': self.graph.id,
+            'start_node_id': self.nodes[0].id,
+            'end_node_id': self.nodes[-1].id,
+        }
+
+    def test_node_pair_is_resolved_in_one_query(self):
+        for serializer_class in (DijkstraRequestSerializer, AllPathsRequestSerializer):
+            serializer = serializer_class(data=self.pair)
+            with self.assertNumQueries(1):
+                self.assertTrue(serializer.is_valid())
+            data = serializer.validated_data
+            self.assertEqual(data['graph'], self.graph)
+            self.assertEqual(data['start_node'], self.nodes[0])
+            self.assertEqual(data['end_node'], self.nodes[-1])
+
+    def test_nodes_from_another_graph_are_rejected(self):
+        other, other_nodes = make_graph('otro', 3, 2, seed=13)
+        serializer = DijkstraRequestSerializer(data={**self.pair, 'end_node_id': other_nodes[0].id})
+        with self.assertNumQueries(1):
+            self.assertFalse(serializer.is_valid())
+        self.assertEqual(
+            serializer.errors['non_field_errors'],
+            ['El nodo de destino no pertenece al grafo especificado']
+        )
+
+    def test_cached_calculation_only_runs_the_validation_query(self):
+        self.client.post('/api/dijkstra/calculate/', self.pair, format='json')
+        with self.assertNumQueries(1):
+            response = self.client.post('/api/dijkstra/calculate/', self.pair, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['success'])
+
+
+class GraphValidationTests(GraphTestCase):
+
+    def test_validation_queries_do_not_depend_on_graph_size(self):
+        for nodes_count, edges_count in ((5, 8), (80, 200)):
+            graph, _ = make_graph(f'validación {nodes_count}', nodes_count, edges_count, seed=14)
+            with self.assertNumQueries(3):
+                self.assertEqual(algorithms.validate_graph_for_dijkstra(graph), (True, []))
+
+    def test_verdict_is_reused_until_the_graph_changes(self):
+        graph, _ = make_graph('veredicto', 8, 12, seed=15)
+        algorithms.validate_graph_for_dijkstra(graph)
+        with self.assertNumQueries(0):
+            self.assertEqual(algorithms.validate_graph_for_dijkstra(graph), (True, []))
+
+        # Edge.save() rechaza pesos negativos: escribir directamente y subir la versión
+        graph.edges.filter(pk=graph.edges.first().pk).update(weight=-1)
+        self.assertEqual(algorithms.validate_graph_for_dijkstra(graph), (True, []))
+        Graph.bump_version(graph.id)
+        graph.refresh_from_db()
+        is_valid, errors = algorithms.validate_graph_for_dijkstra(graph)
+        self.assertFalse(is_valid)
+        self.assertIn('pesos negativos', errors[0])
+
+
+class GraphQueryCountTests(GraphTestCase):
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def endpoint_queries(self, graph):
+        Graph.objects.filter(pk=graph.pk).update(is_active=True)
+        Graph.objects.exclude(pk=graph.pk).update(is_active=False)
+        counts = {}
+        counts['list'], _ = self.count_queries('/api/graphs/')
+        counts['detail'], detail = self.count_queries(f'/api/graphs/{graph.id}/')
+        self.assertEqual(len(detail['nodes']), graph.nodes.count())
+        self.assertEqual(len(detail['edges']), graph.edges.count())
+        counts['active'], active = self.count_queries('/api/graphs/active/')
+        self.assertEqual(active['id'], graph.id)
+        counts['nodes'], _ = self.count_queries('/api/nodes/', {'graph_id': graph.id})
+        counts['edges'], _ = self.count_queries('/api/edges/', {'graph_id': graph.id})
+        return counts
+
+    def test_graph_endpoints_do_not_depend_on_graph_size(self):
+        small, _ = make_graph('pequeño', 5, 6, seed=16)
+        small_counts = self.endpoint_queries(small)
+        large, _ = make_graph('grande', 120, 300, seed=17)
+        self.assertEqual(self.endpoint_queries(large), small_counts)
+        self.assertLessEqual(max(small_counts.values()), 4)
+
+
+class ConditionalRequestTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('etag', 6, 8, seed=7)
+
+    def assertNotModified(self, url, etag):
+        # Solo se consulta la versión del grafo, no sus nodos ni aristas
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_graph_detail_returns_304_until_the_graph_changes(self):
+        url = f'/api/graphs/{self.graph.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        edge = self.graph.edges.first()
+        edge.weight += 1
+        edge.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_node_list_etag_changes_with_bulk_positions(self):
+        url = f'/api/nodes/?graph_id={self.graph.id}'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        response = self.client.post(
+            '/api/nodes/bulk_update_positions/',
+            {'positions': [{'id': self.nodes[0].id, 'x_position': 1, 'y_position': 2}]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_edge_list_etag_changes_when_an_edge_is_deleted(self):
+        url = f'/api/edges/?graph_id={self.graph.id}'
+        etag = self.client.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        self.graph.edges.first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class GraphImportTests(GraphTestCase):
+
+    def test_dimacs_rejects_arcs_outside_the_header(self):
+        with self.assertRaisesMessage(ValueError, 'línea 3: el nodo 4 está fuera del rango 1..3'):
+            parse_dimacs(['p sp 3 2', 'a 1 2 5', 'a 2 4 1'])
+        with self.assertRaisesMessage(ValueError, 'línea 2'):
+            parse_dimacs(['p sp 3 1', 'a 0 2 5'])
+        with self.assertRaisesMessage(ValueError, 'declara 2 arcos'):
+            parse_dimacs(['p sp 3 2', 'a 1 2 5'])
+
+    def test_parallel_edges_keep_the_lightest_per_direction(self):
+        parsed = ParsedGraph()
+        parsed.add_edge('a', 'b', 5, directed=True)
+        parsed.add_edge('a', 'b', 3, directed=True)
+        parsed.add_edge('a', 'b', 4, directed=True)
+        self.assertEqual(parsed.edges, {('a', 'b'): (3, True)})
+        self.assertEqual((parsed.duplicate_edges, parsed.split_edges), (2, 0))
+
+    def test_undirected_edge_wins_unless_a_directed_one_is_lighter(self):
+        parsed = ParsedGraph()
+        parsed.add_edge('a', 'b', 5, directed=True)
+        parsed.add_edge('a', 'b', 4, directed=False)
+        parsed.add_edge('b', 'a', 6, directed=False)
+        self.assertEqual(parsed.edges, {('a', 'b'): (4, False)})
+        self.assertEqual((parsed.duplicate_edges, parsed.split_edges), (2, 0))
+
+        # La dirigida más ligera no debe dejar sin el sentido b -> a
+        parsed = ParsedGraph()
+        parsed.add_edge('a', 'b', 4, directed=False)
+        parsed.add_edge('a', 'b', 1, directed=True)
+        self.assertEqual(parsed.edges, {('a', 'b'): (1, True), ('b', 'a'): (4, True)})
+        self.assertEqual((parsed.duplicate_edges, parsed.split_edges), (0, 1))
+
+    def test_import_report_counts_merged_edges(self):
+        result = import_graph_content(
+            'origen,destino,peso,dirigida\n'
+            'a,b,4,false\n'
+            'a,b,1,true\n'
+            'b,c,2,true\n'
+            'b,c,3,true\n',
+            'csv', 'fusionado'
+        )
+        self.assertEqual(result['edges_created'], 3)
+        self.assertEqual(result['duplicate_edges'], 1)
+        self.assertEqual(result['split_edges'], 1)
+        graph = Graph.objects.get(id=result['graph_id'])
+        self.assertEqual(
+            edge_set(graph),
+            {('a', 'b', 1.0, True), ('b', 'a', 4.0, True), ('b', 'c', 2.0, True)}
+        )
+        self.assertEqual(
+            dijkstra_algorithm(graph, graph.nodes.get(name='b'), graph.nodes.get(name='a'))['total_distance'],
+            4.0
+        )
+
+
+class ImportExportTests(GraphTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.graph, self.nodes = make_graph('exportado', 25, 50, seed=5)
+
+    def export(self, export_format):
+        response = self.client.get(
+            f'/api/graphs/{self.graph.id}/export/', {'export_format': export_format}
+        )
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def reimport(self, content, file_format, name):
+        upload = io.BytesIO(content)
+        upload.name = f'grafo.{file_format}'
+        response = self.client.post(
+            '/api/graphs/import/', {'name': name, 'format': file_format, 'file': upload},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return Graph.objects.get(id=response.data['graph_id'])
+
+    def test_round_trip_for_each_format(self):
+        original_nodes = {
+            (node.name, node.x_position, node.y_position, node.is_source) for node in self.nodes
+        }
+        original_edges = edge_set(self.graph)
+        for export_format in EXPORT_FORMATS:
+            with self.subTest(export_format=export_format):
+                imported = self.reimport(
+                    self.export(export_format), export_format, f'copia-{export_format}'
+                )
+                if export_format in ('ndjson', 'binary'):
+                    self.assertEqual(
+                        {(n.name, n.x_position, n.y_position, n.is_source) for n in imported.nodes.all()},
+                        original_nodes
+                    )
+                    self.assertEqual(edge_set(imported), original_edges)
+                elif export_format == 'csv':
+                    self.assertEqual(edge_set(imported), original_edges)
+                else:
+                    # DIMACS numera los nodos por orden de nombre y parte las no dirigidas
+                    number_of = {node.name: str(index) for index, node in enumerate(self.nodes, start=1)}
+                    arcs = set()
+                    for from_name, to_name, weight, directed in original_edges:
+                        arcs.add((number_of[from_name], number_of[to_name], weight, True))
+                        if not directed:
+                            arcs.add((number_of[to_name], number_of[from_name], weight, True))
+                    self.assertEqual(edge_set(imported), arcs)
+
+    def test_export_is_parsed_without_changes(self):
+        content = b''.join(
+            chunk.encode('utf-8') if isinstance(chunk, str) else bytes(chunk)
+            for chunk in iter_graph_export(self.graph, 'ndjson')
+        )
+        result = import_graph_content(content.decode('utf-8'), 'ndjson', 'copia')
+        self.assertEqual(result['nodes_created'], len(self.nodes))
+        self.assertEqual(result['edges_created'], self.graph.edges.count())
+
+    def test_export_returns_304_with_one_query(self):
+        url = f'/api/graphs/{self.graph.id}/export/?export_format=csv'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
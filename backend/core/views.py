@@ -2,31 +2,82 @@
 Vistas de la API REST para grafos con algoritmo de Dijkstra
 """
 
+import json
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.response import Response
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from .models import Graph, Node, Edge
 from .serializers import (
     GraphSerializer, GraphDetailSerializer, NodeSerializer, EdgeSerializer,
+    GraphImportRequestSerializer, GraphImportResultSerializer, GraphExportRequestSerializer,
     DijkstraRequestSerializer, DijkstraResultSerializer,
-    AllPathsRequestSerializer, AllPathsResultSerializer
+    ShortestPathTreeRequestSerializer, ShortestPathTreeResultSerializer,
+    BatchDijkstraRequestSerializer, BatchDijkstraResultSerializer,
+    DistanceMatrixRequestSerializer,
+    AllPathsRequestSerializer, AllPathsResultSerializer, PathCountResultSerializer
 )
 from .algorithms import (
-    dijkstra_algorithm, validate_graph_for_dijkstra, find_all_paths
+    ComputationContext, dijkstra_algorithm, iter_dijkstra_trace, validate_graph_for_dijkstra,
+    find_all_paths, iter_all_paths,
+    shortest_path_tree as compute_shortest_path_tree, batch_shortest_paths
+)
+from .etags import (
+    active_graph_etag, conditional_on_version, graph_detail_etag, graph_export_etag,
+    graph_items_etag
 )
+from .graph_export import EXPORT_CONTENT_TYPES, export_filename, iter_graph_export
+from .graph_import import import_graph_content
+from .distance_matrix import compute_distance_matrix, matrix_to_binary, matrix_to_json
+from .path_counting import COUNT_ONLY_MODE, count_paths
+from .result_cache import get_result_cache
+
+# Eventos de Dijkstra agrupados en cada mensaje de /api/dijkstra/stream_steps/
+SSE_EVENTS_PER_MESSAGE = 64
+
+
+class StreamingContentNegotiation(DefaultContentNegotiation):
+    """
+    Negociación para acciones que responden en streaming con su propio
+    Content-Type: un ``Accept`` como ``application/octet-stream`` no
+    coincide con ningún renderer de DRF, pero no debe dar 406; los errores
+    se siguen devolviendo en JSON.
+    """
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
 
 
 class GraphViewSet(viewsets.ModelViewSet):
     """ViewSet para operaciones CRUD de grafos"""
     queryset = Graph.objects.all()
     
+    def get_queryset(self):
+        # Conteos y relaciones precargados: consultas fijas por petición
+        if self.action == 'retrieve':
+            return Graph.objects.with_details()
+        return Graph.objects.with_counts()
+    
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return GraphDetailSerializer
         return GraphSerializer
     
+    @conditional_on_version(graph_detail_etag)
+    def retrieve(self, request, *args, **kwargs):
+        """Detalle del grafo; 304 si ``If-None-Match`` coincide con su versión"""
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
         """Activar un grafo específico"""
@@ -43,10 +94,89 @@ class GraphViewSet(viewsets.ModelViewSet):
             'graph': serializer.data
         })
     
+    @action(
+        detail=False, methods=['post'], url_path='import',
+        parser_classes=[JSONParser, MultiPartParser]
+    )
+    def import_graph(self, request):
+        """
+        Crear un grafo completo desde una lista de aristas (JSON, NDJSON, CSV,
+        DIMACS o el binario de la exportación)
+        
+        Acepta JSON (``data``) o multipart con un fichero (``file``); para
+        ficheros grandes conviene multipart, porque el cuerpo JSON está
+        limitado por DATA_UPLOAD_MAX_MEMORY_SIZE. Ver core.graph_import.
+        """
+        serializer = GraphImportRequestSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        data = serializer.validated_data
+        content = data['file'].read() if 'file' in data else data['data']
+        
+        try:
+            result = import_graph_content(
+                content, data['format'], data['name'], data.get('description', '')
+            )
+        except ValueError as e:
+            return Response(
+                {'success': False, 'message': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'Error importando el grafo: {str(e)}'
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        return Response(
+            GraphImportResultSerializer(result).data,
+            status=status.HTTP_201_CREATED
+        )
+    
+    @action(
+        detail=True, methods=['get'],
+        content_negotiation_class=StreamingContentNegotiation
+    )
+    @conditional_on_version(graph_export_etag)
+    def export(self, request, pk=None):
+        """
+        Descargar el grafo completo en streaming (``?export_format=`` ndjson,
+        csv, dimacs o binary), leyendo filas sin instanciar modelos. Ver
+        core.graph_export.
+        """
+        serializer = GraphExportRequestSerializer(data=request.query_params)
+        
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        export_format = serializer.validated_data['export_format']
+        graph = get_object_or_404(Graph, pk=pk)
+        
+        response = StreamingHttpResponse(
+            iter_graph_export(graph, export_format),
+            content_type=EXPORT_CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{export_filename(graph, export_format)}"'
+        )
+        return response
+    
     @action(detail=False, methods=['get'])
+    @conditional_on_version(active_graph_etag)
     def active(self, request):
         """Obtener el grafo activo actual"""
-        active_graph = Graph.get_active_graph()
+        active_graph = Graph.objects.with_details().filter(is_active=True).first()
         if not active_graph:
             return Response(
                 {'message': 'No hay ningún grafo activo'},
@@ -62,10 +192,16 @@ class NodeViewSet(viewsets.ModelViewSet):
     serializer_class = NodeSerializer
     
     def get_queryset(self):
+        nodes = Node.objects.with_connections_count()
         graph_id = self.request.query_params.get('graph_id')
         if graph_id:
-            return Node.objects.filter(graph_id=graph_id)
-        return Node.objects.all()
+            return nodes.filter(graph_id=graph_id)
+        return nodes
+    
+    @conditional_on_version(graph_items_etag('nodes'))
+    def list(self, request, *args, **kwargs):
+        """Listado de nodos; con ``graph_id`` admite ``If-None-Match``"""
+        return super().list(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         graph_id = self.request.data.get('graph_id')
@@ -137,10 +273,13 @@ class NodeViewSet(viewsets.ModelViewSet):
             }
 
         if nodes_to_update:
-            Node.objects.bulk_update(
-                nodes_to_update,
-                ['x_position', 'y_position']
-            )
+            with transaction.atomic():
+                Node.objects.bulk_update(
+                    nodes_to_update,
+                    ['x_position', 'y_position']
+                )
+                # bulk_update no dispara señales: invalidar las versiones a mano
+                Graph.bump_version(*{node.graph_id for node in nodes_to_update})
 
         return Response({'updated': id_map})
 
@@ -150,10 +289,16 @@ class EdgeViewSet(viewsets.ModelViewSet):
     serializer_class = EdgeSerializer
     
     def get_queryset(self):
+        edges = Edge.objects.select_related('from_node', 'to_node')
         graph_id = self.request.query_params.get('graph_id')
         if graph_id:
-            return Edge.objects.filter(graph_id=graph_id)
-        return Edge.objects.all()
+            return edges.filter(graph_id=graph_id)
+        return edges
+    
+    @conditional_on_version(graph_items_etag('edges'))
+    def list(self, request, *args, **kwargs):
+        """Listado de aristas; con ``graph_id`` admite ``If-None-Match``"""
+        return super().list(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         # La arista heredará el grafo de los nodos automáticamente
@@ -178,10 +323,10 @@ class DijkstraViewSet(viewsets.ViewSet):
         data = serializer.validated_data
         
         try:
-            # Obtener objetos del modelo
-            graph = Graph.objects.get(id=data['graph_id'])
-            start_node = Node.objects.get(id=data['start_node_id'])
-            end_node = Node.objects.get(id=data['end_node_id'])
+            # Objetos del modelo ya resueltos por el serializer
+            graph = data['graph']
+            start_node = data['start_node']
+            end_node = data['end_node']
             
             # Validar grafo para Dijkstra
             is_valid, errors = validate_graph_for_dijkstra(graph)
@@ -200,7 +345,9 @@ class DijkstraViewSet(viewsets.ViewSet):
                 graph=graph,
                 start_node=start_node,
                 end_node=end_node,
-                include_steps=data.get('include_steps', False)
+                include_steps=data.get('include_steps', False),
+                algorithm=data.get('algorithm', 'dijkstra'),
+                trace_format=data.get('trace_format', 'auto')
             )
             
             # Serializar resultado
@@ -216,6 +363,276 @@ class DijkstraViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(
+        detail=False, methods=['get'],
+        content_negotiation_class=StreamingContentNegotiation
+    )
+    def stream_steps(self, request):
+        """
+        Pasos de Dijkstra en vivo como Server-Sent Events
+        
+        Mismos parámetros que calculate, en la query string (EventSource
+        solo hace GET); solo admite algorithm='dijkstra'. Ver _sse_messages
+        para el formato de los mensajes.
+        """
+        serializer = DijkstraRequestSerializer(data=request.query_params)
+        
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        data = serializer.validated_data
+        
+        # Los eventos de la traza solo existen para Dijkstra
+        if data['algorithm'] != 'dijkstra':
+            return Response(
+                {
+                    'success': False,
+                    'message': "stream_steps solo está disponible con algorithm='dijkstra'"
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            graph = data['graph']
+            start_node = data['start_node']
+            end_node = data['end_node']
+            
+            is_valid, errors = validate_graph_for_dijkstra(graph)
+            if not is_valid:
+                return Response(
+                    {
+                        'success': False,
+                        'message': 'El grafo no es válido para Dijkstra',
+                        'errors': errors
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            response = StreamingHttpResponse(
+                self._sse_messages(iter_dijkstra_trace(graph, start_node, end_node)),
+                content_type='text/event-stream'
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+            
+        except Exception as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'Error ejecutando Dijkstra: {str(e)}'
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @staticmethod
+    def _sse_messages(records):
+        """
+        Convierte los registros de iter_dijkstra_trace en mensajes SSE:
+        ``init`` (tabla de nombres), ``steps`` (lista de hasta
+        SSE_EVENTS_PER_MESSAGE eventos ``['v', ...]``/``['r', ...]``),
+        ``summary`` al terminar o ``error`` si algo falla a mitad.
+        
+        La búsqueda solo avanza cuando el servidor pide el siguiente mensaje,
+        es decir, al ritmo al que el cliente lee. Si el cliente se desconecta,
+        el servidor cierra este generador y con él la búsqueda.
+        """
+        def message(event, payload):
+            return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        
+        batch = []
+        try:
+            for kind, record in records:
+                if kind == 'event':
+                    batch.append(record)
+                    if len(batch) >= SSE_EVENTS_PER_MESSAGE:
+                        yield message('steps', batch)
+                        batch = []
+                    continue
+                
+                if batch:
+                    yield message('steps', batch)
+                    batch = []
+                yield message(kind, record)
+        except Exception as e:
+            yield message('error', {
+                'success': False,
+                'message': f'Error ejecutando Dijkstra: {str(e)}'
+            })
+        finally:
+            records.close()
+    
+    @action(detail=False, methods=['post'])
+    def shortest_path_tree(self, request):
+        """Calcular en una sola búsqueda las distancias a todos los nodos"""
+        serializer = ShortestPathTreeRequestSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        data = serializer.validated_data
+        
+        try:
+            graph = data['graph']
+            start_node = data['start_node']
+            target_nodes = data['target_nodes']
+            
+            # Validar grafo para Dijkstra
+            is_valid, errors = validate_graph_for_dijkstra(graph)
+            if not is_valid:
+                return Response(
+                    {
+                        'success': False,
+                        'message': 'El grafo no es válido para Dijkstra',
+                        'errors': errors
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            result = compute_shortest_path_tree(
+                graph=graph,
+                start_node=start_node,
+                target_nodes=target_nodes
+            )
+            
+            result_serializer = ShortestPathTreeResultSerializer(result)
+            return Response(result_serializer.data)
+            
+        except Exception as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'Error calculando el árbol de caminos: {str(e)}'
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Calcular los caminos más cortos de muchos pares en una sola solicitud"""
+        serializer = BatchDijkstraRequestSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        data = serializer.validated_data
+        
+        try:
+            graph = data['graph']
+            
+            # Validar grafo para Dijkstra
+            is_valid, errors = validate_graph_for_dijkstra(graph)
+            if not is_valid:
+                return Response(
+                    {
+                        'success': False,
+                        'message': 'El grafo no es válido para Dijkstra',
+                        'errors': errors
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            result = batch_shortest_paths(
+                graph=graph,
+                pairs=[(pair['start_node_id'], pair['end_node_id']) for pair in data['pairs']],
+                algorithm=data['algorithm']
+            )
+            
+            result_serializer = BatchDijkstraResultSerializer(result)
+            return Response(result_serializer.data)
+            
+        except Exception as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'Error ejecutando Dijkstra por lotes: {str(e)}'
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(
+        detail=False, methods=['post'],
+        content_negotiation_class=StreamingContentNegotiation
+    )
+    def distance_matrix(self, request):
+        """Calcular la matriz de distancias entre orígenes y destinos"""
+        serializer = DistanceMatrixRequestSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        
+        data = serializer.validated_data
+        
+        try:
+            graph = data['graph']
+            
+            # Validar grafo para Dijkstra
+            is_valid, errors = validate_graph_for_dijkstra(graph)
+            if not is_valid:
+                return Response(
+                    {
+                        'success': False,
+                        'message': 'El grafo no es válido para Dijkstra',
+                        'errors': errors
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            try:
+                result = compute_distance_matrix(
+                    graph=graph,
+                    source_node_ids=data.get('source_node_ids'),
+                    target_node_ids=data.get('target_node_ids'),
+                    method=data['method']
+                )
+            except ValueError as e:
+                return Response(
+                    {'success': False, 'message': str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            if data['format'] == 'binary':
+                response = HttpResponse(
+                    matrix_to_binary(
+                        result['source_node_ids'], result['target_node_ids'], result['matrix']
+                    ),
+                    content_type='application/octet-stream'
+                )
+                response['X-Matrix-Method'] = result['method']
+                return response
+            
+            result['matrix'] = matrix_to_json(result['matrix'])
+            return Response(result)
+            
+        except Exception as e:
+            return Response(
+                {
+                    'success': False,
+                    'message': f'Error calculando la matriz de distancias: {str(e)}'
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=False, methods=['get', 'delete'])
+    def cache_stats(self, request):
+        """Consultar (GET) o vaciar (DELETE) la caché de resultados"""
+        cache = get_result_cache()
+        if request.method == 'DELETE':
+            cache.clear()
+        return Response(cache.stats())
+    
     @action(detail=False, methods=['post'])
     def validate_graph(self, request):
         """Validar si un grafo es apto para Dijkstra"""
@@ -250,7 +667,10 @@ class DijkstraViewSet(viewsets.ViewSet):
 class AllPathsViewSet(viewsets.ViewSet):
     """ViewSet para encontrar todos los caminos entre dos nodos"""
     
-    @action(detail=False, methods=['post'])
+    @action(
+        detail=False, methods=['post'],
+        content_negotiation_class=StreamingContentNegotiation
+    )
     def find_paths(self, request):
         """Encontrar todos los caminos posibles entre dos nodos"""
         serializer = AllPathsRequestSerializer(data=request.data)
@@ -264,25 +684,25 @@ class AllPathsViewSet(viewsets.ViewSet):
         try:
             # Obtener los datos validados
             data = serializer.validated_data
-            graph = Graph.objects.get(id=data['graph_id'])
-            start_node = Node.objects.get(id=data['start_node_id'])
-            end_node = Node.objects.get(id=data['end_node_id'])
-            max_paths = data.get('max_paths', 100)
-            max_depth = data.get('max_depth', 20)
-            
-            # Ejecutar algoritmo de búsqueda de todos los caminos
-            result = find_all_paths(
-                graph=graph,
-                start_node=start_node,
-                end_node=end_node,
-                max_paths=max_paths,
-                max_depth=max_depth
-            )
+            graph = data['graph']
+            start_node = data['start_node']
+            end_node = data['end_node']
             
-            # Serializar resultado
-            result_serializer = AllPathsResultSerializer(result)
+            # Modo streaming: un camino por línea (NDJSON) según se encuentran
+            if data.get('stream') and data.get('mode', 'all') != COUNT_ONLY_MODE:
+                response = StreamingHttpResponse(
+                    self._ndjson_records(
+                        iter_all_paths(
+                            graph, start_node, end_node, **self._search_options(data)
+                        )
+                    ),
+                    content_type='application/x-ndjson'
+                )
+                response['X-Accel-Buffering'] = 'no'
+                return response
             
-            return Response(result_serializer.data)
+            context = ComputationContext(graph, start_node, end_node)
+            return Response(self._search_paths(data, context))
             
         except Exception as e:
             return Response(
@@ -293,42 +713,104 @@ class AllPathsViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @staticmethod
+    def _search_options(data):
+        """Parámetros de find_all_paths/iter_all_paths desde los datos validados"""
+        return {
+            'max_paths': data.get('max_paths', 100),
+            'max_depth': data.get('max_depth', 20),
+            'mode': data.get('mode', 'all'),
+            'max_distance': data.get('max_distance'),
+            'max_stretch': data.get('max_stretch'),
+            'cursor': data.get('cursor'),
+            'parallel': data.get('parallel', False),
+        }
+    
+    def _search_paths(self, data, context):
+        """Resultado serializado de la búsqueda (o del conteo) de caminos"""
+        search_options = self._search_options(data)
+        
+        # Modo conteo: estadísticas sin construir los caminos
+        if search_options['mode'] == COUNT_ONLY_MODE:
+            result = count_paths(
+                graph=context.graph,
+                start_node=context.start_node,
+                end_node=context.end_node,
+                max_depth=search_options['max_depth'],
+                max_distance=search_options['max_distance'],
+                max_stretch=search_options['max_stretch'],
+                context=context,
+                count_limit=data.get('count_limit')
+            )
+            return PathCountResultSerializer(result).data
+        
+        # Ejecutar algoritmo de búsqueda de todos los caminos
+        result = find_all_paths(
+            graph=context.graph,
+            start_node=context.start_node,
+            end_node=context.end_node,
+            context=context,
+            **search_options
+        )
+        
+        # Serializar resultado
+        return AllPathsResultSerializer(result).data
+    
+    @staticmethod
+    def _ndjson_records(records):
+        """
+        Convierte los registros de iter_all_paths en líneas NDJSON
+        ``{"type": "path", ...}`` y una última ``{"type": "summary", ...}``.
+        Un error a mitad de la respuesta se informa con ``{"type": "error"}``,
+        porque el código de estado ya se envió.
+        """
+        try:
+            for kind, record in records:
+                yield json.dumps({'type': kind, **record}, ensure_ascii=False) + '\n'
+        except Exception as e:
+            yield json.dumps(
+                {
+                    'type': 'error',
+                    'success': False,
+                    'message': f'Error buscando caminos: {str(e)}'
+                },
+                ensure_ascii=False
+            ) + '\n'
+    
     @action(detail=False, methods=['post'])
     def compare_with_dijkstra(self, request):
         """Comparar todos los caminos con el resultado de Dijkstra"""
-        # Primero encontrar todos los caminos
-        all_paths_response = self.find_paths(request)
-        
-        if all_paths_response.status_code != 200:
-            return all_paths_response
+        serializer = AllPathsRequestSerializer(data=request.data)
         
-        # Obtener también el resultado detallado de Dijkstra
-        dijkstra_serializer = DijkstraRequestSerializer(data=request.data)
-        dijkstra_serializer.is_valid(raise_exception=True)
+        if not serializer.is_valid():
+            return Response(
+                {'errors': serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         try:
-            data = dijkstra_serializer.validated_data
-            graph = Graph.objects.get(id=data['graph_id'])
-            start_node = Node.objects.get(id=data['start_node_id'])
-            end_node = Node.objects.get(id=data['end_node_id'])
+            data = serializer.validated_data
+            graph = data['graph']
+            start_node = data['start_node']
+            end_node = data['end_node']
             
-            # Ejecutar Dijkstra con pasos detallados
-            dijkstra_result = dijkstra_algorithm(
-                graph=graph,
-                start_node=start_node,
-                end_node=end_node,
-                include_steps=True
-            )
+            # Una sola instantánea y una sola búsqueda de Dijkstra para todo
+            context = ComputationContext(graph, start_node, end_node)
+            
+            # Dijkstra con pasos detallados primero: la búsqueda de caminos
+            # reutiliza su resultado
+            dijkstra_result = context.dijkstra(include_steps=True)
+            all_paths_data = self._search_paths(data, context)
             
             # Combinar ambos resultados
             combined_result = {
-                'all_paths_result': all_paths_response.data,
+                'all_paths_result': all_paths_data,
                 'dijkstra_result': dijkstra_result,
                 'comparison_summary': {
-                    'total_paths_found': all_paths_response.data.get('paths_count', 0),
+                    'total_paths_found': all_paths_data.get('paths_count', 0),
                     'dijkstra_optimal': dijkstra_result.get('success', False),
                     'paths_analysis': self._analyze_paths_comparison(
-                        all_paths_response.data, dijkstra_result
+                        all_paths_data, dijkstra_result
                     )
                 }
             }
@@ -352,6 +834,21 @@ class AllPathsViewSet(viewsets.ViewSet):
         all_paths = all_paths_data.get('all_paths', [])
         dijkstra_distance = dijkstra_data.get('total_distance')
         
+        # En modo conteo las estadísticas ya vienen agregadas; si el conteo se
+        # detuvo en count_limit solo cubren los caminos contados
+        statistics = all_paths_data.get('statistics')
+        if all_paths_data.get('mode') == COUNT_ONLY_MODE and statistics:
+            return {
+                'shortest_distance': statistics['shortest_distance'],
+                'longest_distance': statistics['longest_distance'],
+                'average_distance': statistics['average_distance'],
+                'optimal_paths_count': statistics['optimal_paths_count'],
+                'dijkstra_confirmed_optimal': statistics['optimal_paths_count'] > 0,
+                'distance_variance': statistics['distance_variance'],
+                'count_limited': all_paths_data.get('count_limited', False),
+                'paths_count_lower_bound': all_paths_data.get('paths_count_lower_bound')
+            }
+        
         if not all_paths or dijkstra_distance is None:
             return {'analysis': 'Datos insuficientes para análisis'}
         
@@ -365,7 +862,8 @@ class AllPathsViewSet(viewsets.ViewSet):
             'average_distance': sum(distances) / len(distances) if distances else None,
             'optimal_paths_count': len(optimal_paths),
             'dijkstra_confirmed_optimal': len(optimal_paths) > 0 and min(distances) == dijkstra_distance,
-            'distance_variance': self._calculate_variance(distances, dijkstra_distance)
+            'distance_variance': self._calculate_variance(distances, dijkstra_distance),
+            'paths_limited': all_paths_data.get('search_limits', {}).get('paths_limited', False)
         }
         
         return analysis
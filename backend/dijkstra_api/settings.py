@@ -138,6 +138,64 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 50
 }
 
+# Número máximo de grafos cuya instantánea compacta (CSR) se mantiene en memoria
+GRAPH_SNAPSHOT_CACHE_SIZE = int(os.getenv('GRAPH_SNAPSHOT_CACHE_SIZE', '8'))
+
+# Directorio donde guardar las instantáneas en binario (.djkg) para que los
+# demás procesos y los reinicios las lean con mmap en lugar de la base de
+# datos (vacío = desactivado)
+GRAPH_SNAPSHOT_DIR = os.getenv('GRAPH_SNAPSHOT_DIR') or None
+
+# Filas por bloque al cargar nodos y aristas de un grafo desde la base de datos
+GRAPH_LOADER_CHUNK_SIZE = int(os.getenv('GRAPH_LOADER_CHUNK_SIZE', '10000'))
+
+# Caché de Django (en memoria del proceso; no requiere servicios externos)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dijkstra-api',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+}
+
+# Caché de resultados de caminos más cortos (ver core/result_cache.py).
+# BACKEND: 'local' (LRU propia, limitada por entradas y bytes) o 'django'
+# (usa CACHES[CACHE_ALIAS], p. ej. locmem o FileBasedCache, con las claves
+# bajo KEY_PREFIX: vaciar esta caché no borra el resto del alias)
+DIJKSTRA_RESULT_CACHE = {
+    'BACKEND': os.getenv('DIJKSTRA_RESULT_CACHE_BACKEND', 'local'),
+    'CACHE_ALIAS': 'default',
+    'KEY_PREFIX': 'dijkstra',
+    'MAX_ENTRIES': 1024,
+    'MAX_BYTES': 64 * 1024 * 1024,
+    'TIMEOUT': None,
+}
+
+# Procesos para los cálculos en paralelo (None = todos los núcleos)
+PARALLEL_WORKERS = int(os.getenv('PARALLEL_WORKERS', '0')) or None
+
+# Pools de procesos abiertos a la vez (uno por grafo) y cómo se arrancan
+# ('fork', 'forkserver' o 'spawn'; None = el de la plataforma)
+PARALLEL_POOL_CACHE_SIZE = int(os.getenv('PARALLEL_POOL_CACHE_SIZE', '2'))
+PARALLEL_START_METHOD = os.getenv('PARALLEL_START_METHOD') or None
+
+# Tamaño máximo (filas × columnas) de /api/dijkstra/distance_matrix/
+DISTANCE_MATRIX_MAX_CELLS = int(os.getenv('DISTANCE_MATRIX_MAX_CELLS', '4000000'))
+
+# Nodos máximos para los pasos completos (trace_format='full') de Dijkstra
+DIJKSTRA_FULL_TRACE_MAX_NODES = int(os.getenv('DIJKSTRA_FULL_TRACE_MAX_NODES', '200'))
+
+# Filas por bloque de inserción en /api/graphs/import/ y manage.py import_graph
+GRAPH_IMPORT_BATCH_SIZE = int(os.getenv('GRAPH_IMPORT_BATCH_SIZE', '10000'))
+
+# Caminos que enumera como máximo el modo count_only cuando no puede contarlos
+# sin recorrerlos (ciclos con muchos nodos o límite de distancia); cada
+# petición puede pedir otro valor con ``count_limit`` (hasta 1.000.000)
+ALL_PATHS_COUNT_LIMIT = int(os.getenv('ALL_PATHS_COUNT_LIMIT', '100000'))
+
+# Validez (segundos) de los cursores de /api/all-paths/find_paths/
+ALL_PATHS_CURSOR_MAX_AGE = int(os.getenv('ALL_PATHS_CURSOR_MAX_AGE', '3600'))
+
 # CORS configuration for React frontend
 CORS_ALLOWED_ORIGINS = [
     os.getenv('FRONTEND_URL', 'http://localhost:3000'),
@@ -1,7 +1,12 @@
-import React, { useState, useEffect, useRef, useCallback } from 'react';
+import React, { useState, useEffect, useRef, useCallback, useMemo } from 'react';
 import { useLocation } from 'react-router-dom';
 import { useApp } from '../../context/AppContext';
-import { Node, Edge, DijkstraStep, AllPathsResult, PathInfo } from '../../types';
+import {
+  Node, Edge, DijkstraStep, DijkstraResult, DijkstraStreamSummary, DijkstraTrace, DijkstraTraceEvent,
+  AllPathsResult, PathInfo
+} from '../../types';
+import { dijkstraApi } from '../../services/api';
+import { dijkstraStepSource } from '../../services/dijkstraSteps';
 import './AlgorithmVisualizer.css';
 
 interface Position {
@@ -39,11 +44,49 @@ const AlgorithmVisualizer: React.FC = () => {
   const [positionsDirty, setPositionsDirty] = useState(false);
   const [toastMessage, setToastMessage] = useState<string | null>(null);
 
+  // Resultado con los pasos en vivo (stream_steps): la traza crece a medida
+  // que llegan los mensajes y se completa con el resumen final
+  const [liveResult, setLiveResult] = useState<DijkstraResult | null>(null);
+  const [isStreaming, setIsStreaming] = useState(false);
+  const streamRef = useRef<EventSource | null>(null);
+  const playIntervalRef = useRef<ReturnType<typeof setInterval> | null>(null);
+  const dijkstraResult = liveResult ?? state.dijkstraResult;
+  // Sin camino solo cuando el resultado es definitivo
+  const noPath = !!dijkstraResult && !isStreaming && dijkstraResult.success === false;
+
+  // Pasos del resultado actual (completos o reconstruidos desde la traza compacta)
+  const dijkstraSteps = useMemo(() => dijkstraStepSource(dijkstraResult), [dijkstraResult]);
+  // Número de pasos disponibles para la reproducción, que avanza mientras llegan más
+  const stepsCountRef = useRef(0);
+  stepsCountRef.current = dijkstraSteps.length;
+
   const showToast = (msg: string, ms = 3000) => {
     setToastMessage(msg);
     setTimeout(() => setToastMessage(null), ms);
   };
 
+  const stopPlayback = useCallback(() => {
+    if (playIntervalRef.current) {
+      clearInterval(playIntervalRef.current);
+      playIntervalRef.current = null;
+    }
+  }, []);
+
+  // Cerrar el EventSource (el servidor detiene la búsqueda al desconectarse)
+  const closeStream = useCallback(() => {
+    if (streamRef.current) {
+      streamRef.current.close();
+      streamRef.current = null;
+      setIsStreaming(false);
+      setIsRunning(false);
+    }
+  }, []);
+
+  // Al cambiar de grafo o de nodos, o al desmontar, cerrar la traza en vivo
+  const activeGraphId = state.activeGraph?.id;
+  useEffect(() => closeStream, [closeStream, activeGraphId, selectedStartNode, selectedEndNode]);
+  useEffect(() => stopPlayback, [stopPlayback]);
+
   // Constantes de dibujo
   const NODE_RADIUS = 25;
   const CANVAS_WIDTH = 800;
@@ -367,7 +410,7 @@ const AlgorithmVisualizer: React.FC = () => {
     ctx.fillRect(0, 0, CANVAS_WIDTH, CANVAS_HEIGHT);
 
     // Obtener paso actual si hay resultado
-    const currentStepData = state.dijkstraResult?.steps?.[state.currentStep];
+    const currentStepData = dijkstraSteps.get(state.currentStep);
     const currentDistancesByName = currentStepData?.distances || {};
 
     // name -> id map
@@ -393,7 +436,6 @@ const AlgorithmVisualizer: React.FC = () => {
     });
 
     // calcular aristas a resaltar (omitir si el resultado indica que NO hay camino)
-    const noPath = state.dijkstraResult && state.dijkstraResult.success === false;
     const edgesToHighlight = new Set<number>();
     if (!noPath && currentStepData && currentStepData.previous) {
       // Si hay un nodo destino seleccionado, reconstruir la cadena de predecesores desde ese nodo
@@ -482,9 +524,9 @@ const AlgorithmVisualizer: React.FC = () => {
     });
 
     // Dibujar camino final si está disponible (si no están suprimidos los resaltados)
-    if (!suppressHighlights && state.dijkstraResult) {
-      if (state.dijkstraResult.success && state.dijkstraResult?.shortest_path && state.currentStep === (state.dijkstraResult.steps?.length || 1) - 1) {
-        const pathIds = state.dijkstraResult.shortest_path.map((id: any) => parseInt(id));
+    if (!suppressHighlights && dijkstraResult) {
+      if (dijkstraResult.success && dijkstraResult?.shortest_path && state.currentStep === (dijkstraSteps.length || 1) - 1) {
+        const pathIds = dijkstraResult.shortest_path.map((id: any) => parseInt(id));
         drawHighlightedPath(ctx, pathIds);
       }
     }
@@ -505,7 +547,7 @@ const AlgorithmVisualizer: React.FC = () => {
       // Dibujar el camino seleccionado con un color diferente
       drawCustomPath(ctx, pathNodeIds, '#FF6B6B'); // Color rojo para diferenciarlo
     }
-  }, [nodePositions, state.edges, state.nodes, state.dijkstraResult, state.currentStep, selectedEndNode, drawEdge, drawNode, drawHighlightedPath, showAllPaths, allPathsResult, selectedPathIndex, drawCustomPath, suppressHighlights]);
+  }, [nodePositions, state.edges, state.nodes, dijkstraResult, noPath, dijkstraSteps, state.currentStep, selectedEndNode, drawEdge, drawNode, drawHighlightedPath, showAllPaths, allPathsResult, selectedPathIndex, drawCustomPath, suppressHighlights]);
 
   // ...existing draw helpers are defined as stable useCallback hooks above...
 
@@ -551,6 +593,72 @@ const AlgorithmVisualizer: React.FC = () => {
     setPositionsDirty(true);
   };
 
+  // Resultado parcial a partir de la cabecera de la traza en vivo
+  const liveTraceResult = (trace: Omit<DijkstraTrace, 'events'>, events: DijkstraTraceEvent[]): DijkstraResult => ({
+    start_node: trace.names[trace.start],
+    end_node: trace.names[trace.end],
+    shortest_path: [],
+    total_distance: Infinity,
+    steps: [],
+    trace: { ...trace, events },
+    success: false,
+    message: '',
+  });
+
+  // Completar el resultado en vivo con el resumen final
+  const liveSummaryResult = (result: DijkstraResult | null, summary: DijkstraStreamSummary): DijkstraResult => ({
+    steps: [],
+    trace: null,
+    ...result,
+    ...summary,
+    total_distance: summary.total_distance ?? Infinity,
+  });
+
+  // Ejecutar Dijkstra recibiendo los pasos en vivo: la reproducción empieza
+  // con los primeros eventos y avanza a medida que llegan los demás
+  const streamDijkstra = (startNodeId: number, endNodeId: number) => {
+    if (!state.activeGraph) return;
+    let result: DijkstraResult | null = null;
+    // Los eventos se acumulan en el sitio; cada mensaje crea solo un resultado nuevo
+    const events: DijkstraTraceEvent[] = [];
+
+    setIsStreaming(true);
+    actions.setCurrentStep(0);
+    streamRef.current = dijkstraApi.streamSteps(
+      { graph_id: state.activeGraph.id, start_node_id: startNodeId, end_node_id: endNodeId },
+      {
+        onInit: (trace) => {
+          result = liveTraceResult(trace, events);
+          setLiveResult(result);
+          setIsPlaying(true);
+          playSteps();
+        },
+        onSteps: (batch) => {
+          if (!result?.trace) return;
+          events.push(...batch);
+          result = { ...result, trace: { ...result.trace, events } };
+          setLiveResult(result);
+        },
+        onSummary: (summary) => {
+          streamRef.current = null;
+          result = liveSummaryResult(result, summary);
+          setLiveResult(result);
+          setIsStreaming(false);
+          setIsRunning(false);
+          if (!summary.success) {
+            showToast('No existe un camino entre los nodos seleccionados.', 4000);
+          }
+        },
+        onError: (message) => {
+          streamRef.current = null;
+          setIsStreaming(false);
+          setIsRunning(false);
+          showToast(`Error ejecutando Dijkstra: ${message}`);
+        },
+      }
+    );
+  };
+
   // Ejecutar algoritmo
   const runDijkstra = async () => {
     if (!selectedStartNode || !selectedEndNode) {
@@ -558,15 +666,21 @@ const AlgorithmVisualizer: React.FC = () => {
       return;
     }
 
+    // Una ejecución anterior en vivo se cancela
+    closeStream();
+    stopPlayback();
+    setLiveResult(null);
+
   setIsRunning(true);
   // asegúrate de que los resaltados estén permitidos cuando ejecutas Dijkstra
   setSuppressHighlights(false);
+    if (showSteps) {
+      // isRunning vuelve a false con el resumen final (o el error)
+      streamDijkstra(selectedStartNode, selectedEndNode);
+      return;
+    }
     try {
-      const res = await actions.runDijkstra(selectedStartNode, selectedEndNode, showSteps);
-      if (showSteps && state.dijkstraResult?.steps) {
-        setIsPlaying(true);
-        playSteps();
-      }
+      const res = await actions.runDijkstra(selectedStartNode, selectedEndNode, false);
       if (res && res.success === false) {
         showToast('No existe un camino entre los nodos seleccionados.');
       }
@@ -627,14 +741,15 @@ const AlgorithmVisualizer: React.FC = () => {
     // El canvas se re-renderizará automáticamente por el useEffect cuando cambie selectedPathIndex
   };
 
-  // Reproducir pasos automáticamente
+  // Reproducir pasos automáticamente (con la traza en vivo, esperando a
+  // que lleguen más pasos mientras el EventSource siga abierto)
   const playSteps = () => {
-    if (!state.dijkstraResult?.steps) return;
-    
     let currentStep = 0;
-    const interval = setInterval(() => {
-      if (!state.dijkstraResult?.steps || currentStep >= state.dijkstraResult.steps.length - 1) {
-        clearInterval(interval);
+    stopPlayback();
+    playIntervalRef.current = setInterval(() => {
+      if (currentStep >= stepsCountRef.current - 1) {
+        if (streamRef.current) return;
+        stopPlayback();
         setIsPlaying(false);
         return;
       }
@@ -646,8 +761,8 @@ const AlgorithmVisualizer: React.FC = () => {
 
   // Navegación manual de pasos
   const goToStep = (step: number) => {
-    if (state.dijkstraResult?.steps) {
-      const maxStep = state.dijkstraResult.steps.length - 1;
+    if (dijkstraSteps.length > 0) {
+      const maxStep = dijkstraSteps.length - 1;
       const newStep = Math.max(0, Math.min(maxStep, step));
       actions.setCurrentStep(newStep);
     }
@@ -674,8 +789,8 @@ const AlgorithmVisualizer: React.FC = () => {
     }
 
     // Si no hay paths pero existe resultado de Dijkstra válido, avanzar al último paso
-    if (state.dijkstraResult && state.dijkstraResult.success) {
-      const last = (state.dijkstraResult.steps && state.dijkstraResult.steps.length > 0) ? state.dijkstraResult.steps.length - 1 : 0;
+    if (dijkstraResult && dijkstraResult.success) {
+      const last = dijkstraSteps.length > 0 ? dijkstraSteps.length - 1 : 0;
       actions.setCurrentStep(last);
     }
   };
@@ -732,7 +847,7 @@ const AlgorithmVisualizer: React.FC = () => {
             onMouseUp={handleMouseUp}
             className="graph-canvas"
           />
-          {state.dijkstraResult && state.dijkstraResult.success === false && (
+          {noPath && (
             <div className="no-path-banner">No existe un camino entre los nodos seleccionados.</div>
           )}
           
@@ -848,8 +963,8 @@ const AlgorithmVisualizer: React.FC = () => {
               <button
                 className="btn btn-outline"
                 onClick={handleShowHighlights}
-                disabled={isRunning || isPlaying || (!state.dijkstraResult && !allPathsResult)}
-                title={(!state.dijkstraResult && !allPathsResult) ? 'No hay resultados para mostrar' : 'Reactivar resaltados'}
+                disabled={isRunning || isPlaying || (!dijkstraResult && !allPathsResult)}
+                title={(!dijkstraResult && !allPathsResult) ? 'No hay resultados para mostrar' : 'Reactivar resaltados'}
               >
                 Mostrar resaltados
               </button>
@@ -864,27 +979,28 @@ const AlgorithmVisualizer: React.FC = () => {
             </div>
           </div>
 
-          {state.dijkstraResult && (
+          {dijkstraResult && (
             <div className="control-section">
               <h3>Resultado</h3>
               
               <div className="result-info">
-                <p><strong>Distancia total:</strong> {state.dijkstraResult.total_distance}</p>
+                {isStreaming && <p>Recibiendo pasos en vivo…</p>}
+                <p><strong>Distancia total:</strong> {dijkstraResult.total_distance}</p>
                 <p><strong>Camino encontrado:</strong> {
-                  state.dijkstraResult.shortest_path?.map(nodeId => {
+                  dijkstraResult.shortest_path?.map(nodeId => {
                     const node = state.nodes.find(n => n.id.toString() === nodeId);
                     return node?.name || nodeId;
                   }).join(' → ')
                 }</p>
-                {!state.dijkstraResult.success && (
+                {noPath && (
                   <p className="no-path-message">No existe un camino entre los nodos seleccionados.</p>
                 )}
-                {state.dijkstraResult.steps && (
-                  <p><strong>Pasos del algoritmo:</strong> {state.dijkstraResult.steps.length}</p>
+                {dijkstraSteps.length > 0 && (
+                  <p><strong>Pasos del algoritmo:</strong> {dijkstraSteps.length}</p>
                 )}
               </div>
 
-              {state.dijkstraResult.steps && (
+              {dijkstraSteps.length > 0 && (
                 <div className="step-controls">
                   <div className="step-navigation">
                     <button 
@@ -904,25 +1020,25 @@ const AlgorithmVisualizer: React.FC = () => {
                     <button 
                       className="btn btn-small"
                       onClick={() => goToStep(state.currentStep + 1)}
-                      disabled={isPlaying || state.currentStep === state.dijkstraResult.steps!.length - 1}
+                      disabled={isPlaying || state.currentStep === dijkstraSteps.length - 1}
                     >
                       ⏩ Siguiente
                     </button>
                     <button 
                       className="btn btn-small"
-                      onClick={() => goToStep((state.dijkstraResult?.steps?.length || 1) - 1)}
-                      disabled={isPlaying || state.currentStep === (state.dijkstraResult?.steps?.length || 1) - 1}
+                      onClick={() => goToStep(dijkstraSteps.length - 1)}
+                      disabled={isPlaying || state.currentStep === dijkstraSteps.length - 1}
                     >
                       ⏭️ Final
                     </button>
                   </div>
                   
                   <div className="step-info">
-                    <span>Paso {state.currentStep + 1} de {state.dijkstraResult.steps.length}</span>
+                    <span>Paso {state.currentStep + 1} de {dijkstraSteps.length}</span>
                     <input
                       type="range"
                       min="0"
-                      max={state.dijkstraResult.steps.length - 1}
+                      max={dijkstraSteps.length - 1}
                       value={state.currentStep}
                       onChange={(e) => goToStep(Number(e.target.value))}
                       disabled={isPlaying}
@@ -930,10 +1046,10 @@ const AlgorithmVisualizer: React.FC = () => {
                     />
                   </div>
 
-                  {state.dijkstraResult.steps[state.currentStep] && (
+                  {dijkstraSteps.get(state.currentStep) && (
                     <div className="current-step-details">
                       <h4>Detalles del paso actual:</h4>
-                      <p>{state.dijkstraResult.steps[state.currentStep].description}</p>
+                      <p>{dijkstraSteps.get(state.currentStep)!.description}</p>
                     </div>
                   )}
                 </div>
@@ -7,7 +7,11 @@ import {
   Edge,
   DijkstraRequest,
   DijkstraResult,
+  DijkstraStreamHandlers,
   CreateGraphForm,
+  GraphImportResult,
+  GraphImportFormat,
+  GraphExportFormat,
   CreateNodeForm,
   CreateEdgeForm,
   AllPathsRequest,
@@ -77,6 +81,29 @@ export const graphsApi = {
     const response = await apiClient.post(`/graphs/${id}/activate/`);
     return response.data;
   },
+
+  // Importar un grafo completo desde un fichero JSON, CSV o DIMACS (.gr)
+  importFile: async (
+    file: File,
+    name: string,
+    format?: GraphImportFormat
+  ): Promise<GraphImportResult> => {
+    const form = new FormData();
+    form.append('file', file);
+    form.append('name', name);
+    if (format) {
+      form.append('format', format);
+    }
+    const response = await apiClient.post('/graphs/import/', form, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+      timeout: 0,
+    });
+    return response.data;
+  },
+
+  // URL de descarga del grafo completo (se genera en streaming en el servidor)
+  exportUrl: (id: number, format: GraphExportFormat = 'ndjson'): string =>
+    `${API_BASE_URL}/api/graphs/${id}/export/?export_format=${format}`,
 };
 
 // API de Nodos
@@ -155,6 +182,30 @@ export const dijkstraApi = {
     return response.data;
   },
 
+  // Recibir los pasos en vivo (Server-Sent Events); cerrar el EventSource cancela la búsqueda
+  streamSteps: (data: DijkstraRequest, handlers: DijkstraStreamHandlers): EventSource => {
+    const params = new URLSearchParams({
+      graph_id: String(data.graph_id),
+      start_node_id: String(data.start_node_id),
+      end_node_id: String(data.end_node_id),
+    });
+    const source = new EventSource(`${API_BASE_URL}/api/dijkstra/stream_steps/?${params}`);
+    const parse = (event: Event) => JSON.parse((event as MessageEvent).data);
+
+    source.addEventListener('init', (event) => handlers.onInit?.(parse(event)));
+    source.addEventListener('steps', (event) => handlers.onSteps(parse(event)));
+    source.addEventListener('summary', (event) => {
+      // Cerrar para que EventSource no vuelva a conectarse
+      source.close();
+      handlers.onSummary?.(parse(event));
+    });
+    source.addEventListener('error', (event) => {
+      source.close();
+      handlers.onError?.(event instanceof MessageEvent ? parse(event).message : 'Conexión interrumpida');
+    });
+    return source;
+  },
+
   // Validar grafo para Dijkstra
   validateGraph: async (graphId: number): Promise<{
     graph_id: number;
@@ -0,0 +1,126 @@
+// Pasos de Dijkstra para el visualizador, tanto con pasos completos
+// (trace_format 'full') como con la traza compacta ('compact', la que
+// devuelve 'auto' en grafos grandes)
+import { DijkstraResult, DijkstraStep, DijkstraTrace } from '../types';
+
+export interface DijkstraStepSource {
+  length: number;
+  get: (index: number) => DijkstraStep | undefined;
+}
+
+const EMPTY_STEPS: DijkstraStepSource = { length: 0, get: () => undefined };
+
+// Mismo formato que los números de Python en las descripciones (3.0, no 3)
+const formatNumber = (value: number): string =>
+  Number.isInteger(value) ? value.toFixed(1) : String(value);
+
+// Cada paso de la traza: eventos ya aplicados y cómo describirlo
+interface TraceStep {
+  applied: number;
+  kind: 'init' | 'event' | 'arrived' | 'path';
+}
+
+const traceSteps = (trace: DijkstraTrace, success: boolean): TraceStep[] => {
+  // Mismos pasos que el formato 'full': inicio, uno por evento, la llegada
+  // al destino tras su visita y el camino reconstruido si lo hay
+  const steps: TraceStep[] = [{ applied: 0, kind: 'init' }];
+  trace.events.forEach((event, index) => {
+    steps.push({ applied: index + 1, kind: 'event' });
+    if (event[0] === 'v' && event[1] === trace.end) {
+      steps.push({ applied: index + 1, kind: 'arrived' });
+    }
+  });
+  if (success) {
+    steps.push({ applied: trace.events.length, kind: 'path' });
+  }
+  return steps;
+};
+
+const replayStep = (
+  trace: DijkstraTrace,
+  result: DijkstraResult,
+  step: TraceStep
+): DijkstraStep => {
+  const { names, events, start, end } = trace;
+  const distances: (number | null)[] = names.map(() => null);
+  const previous: number[] = names.map(() => -1);
+  const visitOrder: number[] = [];
+  distances[start] = 0;
+
+  for (let index = 0; index < step.applied; index++) {
+    const event = events[index];
+    if (event[0] === 'v') {
+      visitOrder.push(event[1]);
+    } else {
+      distances[event[2]] = event[4];
+      previous[event[2]] = event[1];
+    }
+  }
+
+  let currentNode = start;
+  let description = `Iniciando algoritmo desde el nodo ${names[start]}`;
+  if (step.kind === 'event') {
+    const event = events[step.applied - 1];
+    if (event[0] === 'v') {
+      currentNode = event[1];
+      description = `Visitando nodo ${names[event[1]]} con distancia ${formatNumber(event[2])}`;
+    } else {
+      currentNode = event[1];
+      const old = event[3] === null ? 'infinito' : formatNumber(event[3]);
+      description = `Actualizando distancia a ${names[event[2]]}: ${formatNumber(event[4])} (anterior: ${old})`;
+    }
+  } else if (step.kind === 'arrived') {
+    currentNode = end;
+    description = `¡Llegamos al nodo destino ${names[end]}!`;
+  } else if (step.kind === 'path') {
+    currentNode = end;
+    description = `Camino reconstruido: ${result.shortest_path.join(' → ')}`;
+  }
+
+  const visited = new Set(visitOrder);
+  const distancesByName: { [name: string]: number } = {};
+  const previousByName: { [name: string]: string | null } = {};
+  names.forEach((name, index) => {
+    distancesByName[name] = distances[index] as number;
+    previousByName[name] = previous[index] === -1 ? null : names[previous[index]];
+  });
+
+  return {
+    current_node: names[currentNode],
+    distances: distancesByName,
+    previous: previousByName,
+    visited: visitOrder.map(index => names[index]),
+    unvisited: names.filter((_, index) => !visited.has(index)),
+    description,
+  };
+};
+
+// Fuente de pasos de un resultado: con traza compacta cada paso se
+// reconstruye al pedirlo, sin guardar una copia del estado por paso
+export const dijkstraStepSource = (result?: DijkstraResult | null): DijkstraStepSource => {
+  if (!result) {
+    return EMPTY_STEPS;
+  }
+  const trace = result.trace;
+  if (!trace || trace.format !== 'compact') {
+    const steps = result.steps || [];
+    return { length: steps.length, get: (index) => steps[index] };
+  }
+
+  const steps = traceSteps(trace, result.success);
+  let cachedIndex = -1;
+  let cachedStep: DijkstraStep | undefined;
+  return {
+    length: steps.length,
+    get: (index) => {
+      if (index < 0 || index >= steps.length) {
+        return undefined;
+      }
+      if (index !== cachedIndex) {
+        cachedStep = replayStep(trace, result, steps[index]);
+        cachedIndex = index;
+      }
+      return cachedStep;
+    },
+  };
+};
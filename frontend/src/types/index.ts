@@ -29,6 +29,7 @@ export interface Graph {
   created_at: string;
   updated_at: string;
   is_active: boolean;
+  version: number;
   nodes: Node[];
   edges: Edge[];
   nodes_count: number;
@@ -43,6 +44,7 @@ export interface GraphSummary {
   created_at: string;
   updated_at: string;
   is_active: boolean;
+  version: number;
   nodes_count: number;
   edges_count: number;
   source_node_name?: string;
@@ -57,12 +59,45 @@ export interface DijkstraStep {
   description: string;
 }
 
+// Traza compacta: estado inicial implícito y eventos por índice de nodo
+export type DijkstraTraceEvent =
+  | ['v', number, number]
+  | ['r', number, number, number | null, number];
+
+export interface DijkstraTrace {
+  format: 'compact';
+  names: string[];
+  node_ids: number[];
+  start: number;
+  end: number;
+  events: DijkstraTraceEvent[];
+}
+
+export interface DijkstraStreamSummary {
+  start_node: string;
+  end_node: string;
+  shortest_path: string[];
+  total_distance: number | null;
+  success: boolean;
+  message: string;
+  execution_time: number;
+  settled_nodes: number;
+}
+
+export interface DijkstraStreamHandlers {
+  onInit?: (trace: Omit<DijkstraTrace, 'events'>) => void;
+  onSteps: (events: DijkstraTraceEvent[]) => void;
+  onSummary?: (summary: DijkstraStreamSummary) => void;
+  onError?: (message: string) => void;
+}
+
 export interface DijkstraResult {
   start_node: string;
   end_node: string;
   shortest_path: string[];
   total_distance: number;
   steps: DijkstraStep[];
+  trace?: DijkstraTrace | null;
   success: boolean;
   message: string;
   execution_time?: number;
@@ -73,6 +108,7 @@ export interface DijkstraRequest {
   start_node_id: number;
   end_node_id: number;
   include_steps?: boolean;
+  trace_format?: 'auto' | 'full' | 'compact';
 }
 
 export interface ApiResponse<T = any> {
@@ -82,6 +118,24 @@ export interface ApiResponse<T = any> {
   error?: string;
 }
 
+export type GraphImportFormat = 'json' | 'ndjson' | 'csv' | 'dimacs' | 'binary';
+
+export type GraphExportFormat = 'ndjson' | 'csv' | 'dimacs' | 'binary';
+
+export interface GraphImportResult {
+  graph_id: number;
+  graph_name: string;
+  format: GraphImportFormat;
+  nodes_created: number;
+  edges_created: number;
+  duplicate_edges: number;
+  split_edges: number;
+  parse_time: number;
+  write_time: number;
+  execution_time: number;
+  edges_per_second: number | null;
+}
+
 // Tipos para formularios
 export interface CreateGraphForm {
   name: string;